@@ -1,110 +1,261 @@
+import argparse
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import urllib3
 from selenium import webdriver # type: ignore
-from selenium.webdriver.common.by import By 
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 # from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup # type: ignore
 from dotenv import load_dotenv
 from os import environ
 
-load_dotenv() 
+load_dotenv()
+
+USER_AGENT = environ.get("REDDIT_USER_AGENT", "Mozilla/5.0 (X11; Linux x86_64) AutoreelScraper/1.0")
+
+# Returns the feed's text posts that earlier calls haven't returned, and
+# marks every post it has looked at, so each scroll only touches new nodes.
+_NEW_POSTS_JS = """
+const posts = document.querySelectorAll('shreddit-feed shreddit-post:not([data-autoreel-seen])');
+const found = [];
+for (const post of posts) {
+    post.setAttribute('data-autoreel-seen', '');
+    if (post.getAttribute('post-type') !== 'text') continue;
+    found.push({
+        title: post.getAttribute('post-title'),
+        post_link: post.getAttribute('content-href'),
+        feed_index: Number(post.getAttribute('feedindex')),
+    });
+}
+return found;
+"""
+
+_HAS_UNSEEN_POST_JS = "return document.querySelector('shreddit-feed shreddit-post:not([data-autoreel-seen])') !== null;"
 
+_POST_BODY_JS = """
+return Array.from(document.querySelectorAll('shreddit-post [slot="text-body"] p'))
+    .map(p => p.textContent.trim())
+    .filter(text => text.length > 0);
+"""
 
 
+def new_driver():
+    """
+    new_driver:
+        Starts a headless Chrome with the options used for scraping.
+
+        Returns a Chrome web driver
+    """
+    option = Options()
+    option.add_argument("--disable-extensions")
+    option.add_argument("--disable-infobars")
+    option.add_argument("--start-maximized")
+    option.add_argument("--disable-notifications")
+    option.add_argument('--headless')
+    option.add_argument('--no-sandbox')
+    option.add_argument('--disable-dev-shm-usage')
+    # service = Service("/usr/bin/chromedriver")
+    return webdriver.Chrome(options=option)
+
 
 def reddit_login(driver):
     """
     login:
         driver - web driver used to navigate web
 
-        Uses credentials from enviorment to sign into reddit. 
+        Uses credentials from enviorment to sign into reddit.
     """
     driver.get("https://www.reddit.com/login/")
     wait = WebDriverWait(driver, timeout=10, poll_frequency=.2)
-    # wait.until(EC.visibility_of_element_located((By.ID, "login-button")))
-    print(driver.page_source)
-    # login_button = driver.find_element(By.ID, "login-button")
-
-    # if login_button:
-        # login_button.click()
     wait.until(EC.visibility_of_element_located((By.ID, "login-username")))
     driver.find_element(By.ID, "login-username").send_keys(environ.get("REDDIT_USER"))
     driver.find_element(By.ID, "login-password").send_keys(environ.get("REDDIT_PASSWORD"))
     driver.find_element(By.ID, "login-password").send_keys(Keys.RETURN)
 
 
-def gather_posts(driver, amount):
+def gather_posts(driver, amount, scroll_timeout=20):
     """
-    gather_posts: 
-        Browses Reddit feed and gathers set number of post.
+    gather_posts:
+        Browses Reddit feed and gathers set number of text posts, without
+        their content.
 
         driver - web driver used to navigate web
         amount - int - amount of posts to be gathered
+        scroll_timeout - seconds to wait for new posts after a scroll
+
+        Only posts added to the page since the previous scroll are read,
+        and posts are deduplicated by feed index, so each scroll costs the
+        same however long the feed gets.
 
-        Returns list of post objects 
-        posts: {"title":str, "post_link":str, "feed_idx":int, "content":str}
+        Returns list of post objects
+        posts: {"title":str, "post_link":str, "feed_index":int}
     """
     post_list = []
-    post_index = 0
-
-    # Get scroll height
-    last_height = driver.execute_script("return document.body.scrollHeight")
+    seen = set()
+    wait = WebDriverWait(driver, timeout=scroll_timeout, poll_frequency=.2)
+    wait.until(EC.presence_of_element_located((By.TAG_NAME, "shreddit-post")))
 
     while len(post_list) < amount:
-        # Scroll down to bottom
+        for post in driver.execute_script(_NEW_POSTS_JS):
+            if post["feed_index"] in seen or not post["post_link"]:
+                continue
+            seen.add(post["feed_index"])
+            post_list.append(post)
+
+        if len(post_list) >= amount:
+            break
+
+        # Scroll down to bottom and wait for the feed to load more posts.
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-    
-        # Wait to load page
-        wait = WebDriverWait(driver, timeout=20, poll_frequency=.2)
-        wait.until(EC.visibility_of_element_located((By.XPATH, f"//shreddit-post[@feedindex='{post_index}']")))
-        
-        reddit_feed_html = BeautifulSoup(driver.page_source, 'html.parser')
-
-        #Search for text posts
-        posts = reddit_feed_html.select_one("shreddit-feed").find_all(attrs={"post-type":"text"})
-        if len(post_list) + len(posts) >= amount: 
-            posts = posts[:(len(post_list) + len(posts) - amount +2)]
-
-        for post in posts:
-            post_list.append({"title": post.get("post-title", "None"), "post_link": post.get("content-href", None), "feed_index": post.get("feedindex", None)})
-        
-        post_index = post_list[-1].get("feed_index", 0)
-
-        # Calculate new scroll height and compare with last scroll height
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        if new_height == last_height:
+        try:
+            wait.until(lambda d: d.execute_script(_HAS_UNSEEN_POST_JS))
+        except TimeoutException:
+            logging.warning("Feed stopped loading after %d posts", len(post_list))
             break
-        last_height = new_height
-        
-    for post in post_list:
-        driver.get(post["post_link"])
-        post_page_html = BeautifulSoup(driver.page_source, 'html.parser')
-        
-        post_body = post_page_html.select_one("shreddit-post").find(attrs={"slot":"text-body"})
-        content = post_body.select("p")
-        formatted_contents = [item.contents[0].strip() for item in content]
-        post["content"] = formatted_contents
-    
-    return post_list
-
-
-option = Options()
-option.add_argument("--disable-extensions") 
-option.add_argument("--disable-infobars") 
-option.add_argument("--start-maximized") 
-option.add_argument("--disable-notifications") 
-option.add_argument('--headless') 
-option.add_argument('--no-sandbox') 
-option.add_argument('--disable-dev-shm-usage') 
-# service = Service("/usr/bin/chromedriver")
-browser = webdriver.Chrome(options=option)
-
-
-reddit_login(driver=browser)
-browser.get("https://www.reddit.com/r/AmItheAsshole/")
-
-posts = gather_posts(driver=browser,amount=5)
-print("POST LEN:", len(posts), "\n Posts", posts)
 
+    return post_list[:amount]
+
+
+def _paragraphs(selftext):
+    return [paragraph.strip() for paragraph in selftext.split("\n\n") if paragraph.strip()]
+
+
+def _session_cookie_header(driver):
+    # Reuse the browser's login so the JSON requests get the account's limits.
+    return "; ".join(f"{cookie['name']}={cookie['value']}" for cookie in driver.get_cookies())
+
+
+def fetch_content_http(http, post_link, headers):
+    """
+    fetch_content_http:
+        Reads a post's body from its JSON representation, without a browser.
+
+        http - urllib3.PoolManager to send the request with
+        post_link - str - link to the post
+        headers - dict - request headers
+
+        Returns list of paragraphs
+    """
+    response = http.request("GET", post_link.rstrip("/") + ".json?raw_json=1", headers=headers, retries=False, timeout=10)
+    if response.status != 200:
+        raise RuntimeError(f"HTTP {response.status} for {post_link}")
+    listing = json.loads(response.data)
+    return _paragraphs(listing[0]["data"]["children"][0]["data"].get("selftext", ""))
+
+
+def fetch_content_tabs(driver, posts, tabs=4, timeout=20):
+    """
+    fetch_content_tabs:
+        Loads posts in batches of browser tabs that load concurrently, then
+        reads each tab's body. Used when the JSON endpoint is refused.
+
+        driver - web driver used to navigate web
+        posts - list of post objects to fill "content" on
+        tabs - int - tabs open at once
+        timeout - seconds to wait for a post body
+    """
+    main_window = driver.current_window_handle
+    for start in range(0, len(posts), tabs):
+        batch = posts[start:start + tabs]
+        handles = []
+        for post in batch:
+            # window.open returns immediately, so the tabs load in parallel.
+            before = set(driver.window_handles)
+            driver.execute_script("window.open(arguments[0], '_blank');", post["post_link"])
+            handles.append((set(driver.window_handles) - before).pop())
+
+        for post, handle in zip(batch, handles):
+            driver.switch_to.window(handle)
+            try:
+                WebDriverWait(driver, timeout=timeout, poll_frequency=.2).until(
+                    EC.presence_of_element_located((By.TAG_NAME, "shreddit-post"))
+                )
+                post["content"] = driver.execute_script(_POST_BODY_JS)
+            except TimeoutException:
+                logging.warning("Timed out loading %s", post["post_link"])
+                post["content"] = None
+            driver.close()
+        driver.switch_to.window(main_window)
+
+
+def fetch_post_contents(driver, posts, workers=8, tabs=4):
+    """
+    fetch_post_contents:
+        Fills "content" on every post. Bodies are fetched concurrently over
+        HTTP, and posts whose request fails are loaded in browser tabs.
+
+        driver - logged in web driver, for its cookies and the tab fallback
+        posts - list of post objects from gather_posts
+        workers - int - concurrent HTTP requests
+        tabs - int - browser tabs open at once for the fallback
+
+        Returns the posts
+        posts: {"title":str, "post_link":str, "feed_index":int, "content":list[str]}
+    """
+    http = urllib3.PoolManager(maxsize=workers)
+    headers = {"User-Agent": USER_AGENT, "Cookie": _session_cookie_header(driver)}
+
+    def fetch(post):
+        try:
+            post["content"] = fetch_content_http(http, post["post_link"], headers)
+            return True
+        except Exception as ex:
+            logging.info("HTTP fetch of %s failed, using a tab: %s", post["post_link"], ex)
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        fetched = list(pool.map(fetch, posts))
+
+    # The driver is not thread safe, so the fallback runs on this thread.
+    fallback = [post for post, ok in zip(posts, fetched) if not ok]
+    if fallback:
+        fetch_content_tabs(driver, fallback, tabs=tabs)
+    return posts
+
+
+def scrape_subreddit(driver, subreddit, amount, workers=8, tabs=4):
+    """
+    scrape_subreddit:
+        Gathers text posts from a subreddit's feed along with their content.
+
+        driver - logged in web driver
+        subreddit - str - subreddit name, without "r/"
+        amount - int - amount of posts to be gathered
+        workers - int - concurrent HTTP requests for post bodies
+        tabs - int - browser tabs open at once for the fallback
+
+        Returns list of post objects
+        posts: {"title":str, "post_link":str, "feed_index":int, "content":list[str]}
+    """
+    driver.get(f"https://www.reddit.com/r/{subreddit}/")
+    posts = gather_posts(driver=driver, amount=amount)
+    return fetch_post_contents(driver=driver, posts=posts, workers=workers, tabs=tabs)
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Scrape text posts from a subreddit feed with Chrome.")
+    parser.add_argument("--subreddit", default="AmItheAsshole", help="Subreddit to scrape.")
+    parser.add_argument("--amount", type=int, default=5, help="Number of posts to gather.")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent HTTP requests for post bodies.")
+    parser.add_argument("--tabs", type=int, default=4, help="Browser tabs open at once when HTTP is refused.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    browser = new_driver()
+    try:
+        reddit_login(driver=browser)
+        posts = scrape_subreddit(browser, args.subreddit, args.amount, workers=args.workers, tabs=args.tabs)
+    finally:
+        browser.quit()
+    print("POST LEN:", len(posts), "\n Posts", posts)
+
+
+if __name__ == "__main__":
+    main()
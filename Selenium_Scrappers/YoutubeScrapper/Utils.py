@@ -1,8 +1,57 @@
 
-from random import choice
+import os
+from random import choice, sample
+
+# Games searched by default, one per line.
+GAMES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "videogames.txt")
+
+# path -> (modification time, lines), so repeated picks don't reread the file.
+_line_cache = {}
+
+
+def read_lines(path):
+    """
+    read_lines:
+        path - str - text file to read
+
+        Reads the non-empty lines of a file, rereading it only after it
+        changes.
+
+        Returns list of lines, stripped
+    """
+    mtime = os.path.getmtime(path)
+    cached = _line_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path) as file:
+            lines = [line.strip() for line in file if line.strip()]
+        cached = _line_cache[path] = (mtime, lines)
+    return cached[1]
+
+
+def read_games(path=GAMES_FILE):
+    """
+    read_games:
+        path - str - games file, one game per line
+
+        Lines are written in URL query style ("Grand+Theft+Auto"), so '+'
+        is read as a space.
+
+        Returns list of games, without duplicates, in file order
+    """
+    return list(dict.fromkeys(line.replace("+", " ") for line in read_lines(path)))
+
 
 def read_file_and_select(path):
-    file = open(path)
-    lines = file.readlines()
-    file.close() 
-    return choice(lines)
+    return choice(read_lines(path))
+
+
+def read_file_and_select_many(path, amount):
+    """
+    read_file_and_select_many:
+        path - str - text file to read
+        amount - int - lines to pick; all of them if larger than the file
+
+        Returns list of distinct random lines
+    """
+    lines = list(dict.fromkeys(read_lines(path)))
+    return sample(lines, min(amount, len(lines)))
@@ -1,5 +1,10 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from random import sample
+from urllib.parse import parse_qs, quote_plus, urlparse
+
 from bucket_upload import upload_downloaded_files
-from Utils import read_file_and_select
+from Utils import GAMES_FILE, read_games
 from selenium import webdriver # type: ignore
 from selenium.webdriver.common.by import By 
 from bs4 import BeautifulSoup # type: ignore
@@ -7,15 +12,29 @@ from yt_dlp import YoutubeDL
 from selenium.webdriver.chrome.options import Options
 
 
+def video_id(href):
+    """
+    video_id:
+        href - str - result link like "/watch?v=ID&pp=..." or "/shorts/ID"
+
+        Returns the video ID, or None
+    """
+    parsed = urlparse(href)
+    if parsed.path.startswith("/shorts/"):
+        return parsed.path.split("/")[2] or None
+    return parse_qs(parsed.query).get("v", [None])[0]
+
 
 def grab_videos(driver):
     page_soup = BeautifulSoup(driver.page_source, 'html.parser')
     video_soup = page_soup.find(id="contents")
     videos = video_soup.find_all(id="video-title")
 
-    videos = [{"title": video.get("title", None), "link": f"https://www.youtube.com/{video.get("href")}"} 
+    videos = [{"title": video.get("title"), "id": video_id(video.get("href", ""))}
               for video in videos 
-              if "gameplay" in video.get("title", None).lower()]
+              if "gameplay" in (video.get("title") or "").lower()]
+    # Canonical links drop the tracking parameters YouTube appends.
+    videos = [{**video, "link": f"https://www.youtube.com/watch?v={video['id']}"} for video in videos if video["id"]]
     if len(videos) > 5:
         return videos[:5]
     return videos
@@ -41,23 +60,88 @@ def download_videos(videos):
             print(f"Failed to download {video["link"]}")
 
 
-option = Options()
-option.add_argument("--disable-extensions") 
-option.add_argument("--disable-infobars") 
-option.add_argument("--start-maximized") 
-option.add_argument("--disable-notifications") 
-option.add_argument('--headless') 
-option.add_argument('--no-sandbox') 
-option.add_argument('--disable-dev-shm-usage') 
-# service = Service("/usr/bin/chromedriver")
-browser = webdriver.Chrome(options=option)
-game = read_file_and_select("./videogames.txt")
-print(game)
-browser.get(f"https://www.youtube.com/results?search_query={game}+gameplay++no+copyright")
-videos = grab_videos(driver=browser)
-download_videos(videos=videos)
-upload_downloaded_files()
+def new_browser():
+    option = Options()
+    option.add_argument("--disable-extensions") 
+    option.add_argument("--disable-infobars") 
+    option.add_argument("--start-maximized") 
+    option.add_argument("--disable-notifications") 
+    option.add_argument('--headless') 
+    option.add_argument('--no-sandbox') 
+    option.add_argument('--disable-dev-shm-usage') 
+    # service = Service("/usr/bin/chromedriver")
+    return webdriver.Chrome(options=option)
+
+
+def search_game_batch(games):
+    """
+    search_game_batch:
+        games - list[str] - games to search, one after another
+
+        Searches the games on one browser of its own.
+
+        Returns dict of game to the videos found for it
+    """
+    browser = new_browser()
+    found = {}
+    try:
+        for game in games:
+            try:
+                browser.get(f"https://www.youtube.com/results?search_query={quote_plus(game)}+gameplay++no+copyright")
+                found[game] = grab_videos(driver=browser)
+            except Exception as err:
+                print(f"Failed to search {game}: {err}")
+    finally:
+        browser.quit()
+    return found
+
+
+def search_games(games, workers=4):
+    """
+    search_games:
+        games - list[str] - games to search
+        workers - int - browsers searching at once
+
+        Splits the games across a small pool of browsers searching
+        concurrently, then merges the results by video ID so a video found
+        for several games downloads once.
+
+        Returns list of videos, in game order
+    """
+    batches = [games[i::workers] for i in range(min(workers, len(games)))]
+    found = {}
+    with ThreadPoolExecutor(max_workers=max(len(batches), 1)) as pool:
+        for results in pool.map(search_game_batch, batches):
+            found.update(results)
+
+    videos = {}
+    for game in games:
+        for video in found.get(game, []):
+            videos.setdefault(video["id"], video)
+    return list(videos.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download gameplay footage from YouTube and upload it to GCS.")
+    parser.add_argument("--game", action="append", help="Game to search for; repeatable. Defaults to random games from the games file.")
+    parser.add_argument("--random", type=int, default=1, help="Random games to pick from the games file.")
+    parser.add_argument("--all-games", action="store_true", help="Search every game in the games file.")
+    parser.add_argument("--games-file", default=GAMES_FILE)
+    parser.add_argument("--search-workers", type=int, default=4, help="Browsers searching at once.")
+    args = parser.parse_args()
 
+    if args.all_games:
+        games = read_games(args.games_file)
+    elif args.game:
+        games = list(dict.fromkeys(args.game))
+    else:
+        all_games = read_games(args.games_file)
+        games = sample(all_games, min(args.random, len(all_games)))
 
+    videos = search_games(games, workers=args.search_workers)
+    download_videos(videos=videos)
+    upload_downloaded_files()
 
 
+if __name__ == "__main__":
+    main()
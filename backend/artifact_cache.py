@@ -0,0 +1,313 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing.util import Finalize
+from typing import Callable, Iterator
+
+from config import ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_MAX_BYTES
+from metrics import register_cache
+
+
+# Hit and miss counts are kept in memory and merged into stats.json at most
+# this often, so lookups don't serialize on the stats file.
+STATS_FLUSH_SECONDS = 10
+
+_LOCK_SUFFIX = ".lock"
+_TMP_SUFFIX = ".tmp"
+
+
+@contextmanager
+def _flock(path: str, blocking: bool = True, shared: bool = False) -> Iterator[bool]:
+    """
+    Hold an advisory lock on `path`, creating the file if needed; yields
+    False if not acquired. Exclusive unless `shared`.
+    """
+    mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    if not blocking:
+        mode |= fcntl.LOCK_NB
+    while True:
+        with open(path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, mode)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                # Eviction deletes lock files; a lock taken on a deleted one guards nothing.
+                if os.fstat(lock_file.fileno()).st_ino != os.stat(path).st_ino:
+                    continue
+            except FileNotFoundError:
+                continue
+            try:
+                yield True
+                return
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class ArtifactCache:
+    """
+    Content-addressed on-disk cache for intermediate files.
+
+    Entries are keyed by a hash of the artifact kind, its source and the
+    transform parameters. Writers producing the same key serialize on a
+    per-key file lock and publish with an atomic rename, so this is safe
+    across threads and processes sharing `root`. Readers holding an entry
+    through entry() keep a shared lock on it. Once the cache exceeds
+    `max_bytes`, the least recently used entries that are not locked are
+    evicted together with their lock files. Hit and miss counts are
+    merged into `root` so they cover every process.
+    """
+
+    def __init__(self, root: str = ARTIFACT_CACHE_DIR, max_bytes: int = ARTIFACT_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._stats_path = os.path.join(root, "stats.json")
+        self._pending = {"hits": 0, "misses": 0}
+        self._pending_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        # Runs at interpreter exit, including in multiprocessing workers.
+        Finalize(self, self.flush, exitpriority=10)
+
+    @staticmethod
+    def key(kind: str, source: str, params: dict) -> str:
+        payload = json.dumps({"kind": kind, "source": source, "params": params}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get_or_create(
+        self,
+        kind: str,
+        source: str,
+        params: dict,
+        producer: Callable[[str], None],
+        suffix: str = "",
+    ) -> str:
+        """
+        Return the path of the cached artifact, producing it on a miss.
+
+        Nothing stops the entry from being evicted once this returns; use
+        entry() to hold it while it is read.
+
+        :param kind: Artifact type, e.g. "source" or "segment".
+        :param source: Identity of the input, e.g. a content hash.
+        :param params: Transform parameters; any change yields a new entry.
+        :param producer: Called with a temporary path to write the artifact to.
+        :param suffix: File extension for the artifact, e.g. ".mp4".
+        :return: Path to the cached file. Treat it as read-only.
+        """
+        path, produced = self._ensure(kind, source, params, producer, suffix)
+        if produced:
+            self.evict()
+        return path
+
+    @contextmanager
+    def entry(
+        self,
+        kind: str,
+        source: str,
+        params: dict,
+        producer: Callable[[str], None],
+        suffix: str = "",
+    ) -> Iterator[str]:
+        """
+        get_or_create() that keeps the entry from being evicted until the
+        `with` block exits.
+
+        :return: Context manager yielding the path to the cached file.
+        """
+        while True:
+            path, produced = self._ensure(kind, source, params, producer, suffix)
+            with _flock(path + _LOCK_SUFFIX, shared=True):
+                # Evicted between being produced and being locked; make it again.
+                if not self._touch(path):
+                    continue
+                if produced:
+                    self.evict()
+                yield path
+                return
+
+    def _ensure(
+        self,
+        kind: str,
+        source: str,
+        params: dict,
+        producer: Callable[[str], None],
+        suffix: str,
+    ) -> tuple[str, bool]:
+        key = self.key(kind, source, params)
+        directory = os.path.join(self.root, kind, key[:2])
+        path = os.path.join(directory, key + suffix)
+        lock_path = path + _LOCK_SUFFIX
+
+        if self._touch(path):
+            self._record("hits")
+            return path, False
+
+        os.makedirs(directory, exist_ok=True)
+        with _flock(lock_path):
+            # Another writer may have finished while we waited for the lock.
+            if self._touch(path):
+                self._record("hits")
+                return path, False
+
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}{_TMP_SUFFIX}{suffix}"
+            try:
+                producer(tmp_path)
+                os.replace(tmp_path, path)
+            except BaseException:
+                # No entry will own the lock file; waiters notice and retry.
+                self._remove(lock_path)
+                raise
+            finally:
+                self._remove(tmp_path)
+        self._record("misses")
+        return path, True
+
+    def evict(self) -> int:
+        """
+        Remove least recently used entries until the cache fits in
+        `max_bytes`. Entries being produced or held through entry() are
+        skipped. Skipped entirely if another process is already evicting.
+
+        :return: Bytes freed.
+        """
+        with _flock(os.path.join(self.root, ".evict" + _LOCK_SUFFIX), blocking=False) as acquired:
+            if not acquired:
+                return 0
+
+            entries = list(self._entries())
+            total = sum(size for _, size, _ in entries)
+            freed = 0
+            for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+                if total - freed <= self.max_bytes:
+                    break
+                with _flock(path + _LOCK_SUFFIX, blocking=False) as unused:
+                    if not unused:
+                        continue
+                    if self._remove(path):
+                        freed += size
+                    self._remove(path + _LOCK_SUFFIX)
+            self._remove_orphan_locks()
+            if freed:
+                logging.info("Artifact cache evicted %d bytes", freed)
+            return freed
+
+    def stats(self) -> dict:
+        """
+        Entry count, size on disk, and hit/miss counts across processes.
+        """
+        entries = list(self._entries())
+        counts = self.counts()
+        lookups = counts["hits"] + counts["misses"]
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": counts["hits"],
+            "misses": counts["misses"],
+            "hit_rate": counts["hits"] / lookups if lookups else 0.0,
+        }
+
+    def counts(self) -> dict:
+        """
+        Hit and miss counts across processes, without scanning entries.
+        Other processes' counts may lag by up to STATS_FLUSH_SECONDS.
+        """
+        self.flush()
+        with _flock(self._stats_path + _LOCK_SUFFIX):
+            return self._read_counts()
+
+    def flush(self) -> None:
+        """Merge this process's unrecorded hit and miss counts into the stats file."""
+        with self._pending_lock:
+            pending = self._pending
+            self._pending = {"hits": 0, "misses": 0}
+            self._flushed_at = time.monotonic()
+        if not any(pending.values()):
+            return
+        with _flock(self._stats_path + _LOCK_SUFFIX):
+            counts = self._read_counts()
+            for outcome, count in pending.items():
+                counts[outcome] += count
+            with open(self._stats_path + _TMP_SUFFIX, "w") as stats_file:
+                json.dump(counts, stats_file)
+            os.replace(self._stats_path + _TMP_SUFFIX, self._stats_path)
+
+    def _entries(self) -> Iterator[tuple[str, int, float]]:
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(_LOCK_SUFFIX) or _TMP_SUFFIX in name or directory == self.root:
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _remove_orphan_locks(self) -> None:
+        # Lock files left by a crashed writer, with no entry to evict them with.
+        for directory, _, files in os.walk(self.root):
+            if directory == self.root:
+                continue
+            for name in files:
+                if not name.endswith(_LOCK_SUFFIX):
+                    continue
+                lock_path = os.path.join(directory, name)
+                entry_path = lock_path[: -len(_LOCK_SUFFIX)]
+                if os.path.exists(entry_path):
+                    continue
+                with _flock(lock_path, blocking=False) as unused:
+                    if unused and not os.path.exists(entry_path):
+                        self._remove(lock_path)
+
+    @staticmethod
+    def _touch(path: str) -> bool:
+        # mtime doubles as the last-used time for LRU eviction.
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _read_counts(self) -> dict:
+        try:
+            with open(self._stats_path) as stats_file:
+                return json.load(stats_file)
+        except (FileNotFoundError, ValueError):
+            return {"hits": 0, "misses": 0}
+
+    def _record(self, outcome: str) -> None:
+        with self._pending_lock:
+            self._pending[outcome] += 1
+            due = time.monotonic() - self._flushed_at >= STATS_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+
+_cache: ArtifactCache | None = None
+
+
+def get_artifact_cache() -> ArtifactCache:
+    """Return this process's handle on the shared on-disk cache."""
+    global _cache
+    if _cache is None:
+        _cache = ArtifactCache()
+    return _cache
+
+
+register_cache("artifact", lambda: get_artifact_cache().counts())
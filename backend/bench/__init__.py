@@ -0,0 +1,6 @@
+"""
+Offline benchmark suite for the API.
+
+Runs the FastAPI app against local stand-ins for Reddit, YouTube, yt-dlp
+and GCS. Run from the backend directory with `python -m bench --help`.
+"""
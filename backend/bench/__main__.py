@@ -0,0 +1,299 @@
+import argparse
+import functools
+import inspect
+import itertools
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of `samples`; 0 when empty."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class StageTimer:
+    """
+    Records call durations for wrapped functions, keyed by stage name.
+    """
+
+    def __init__(self):
+        self._samples: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, module, attr: str, stage: str) -> None:
+        """Replace `module.attr` with a wrapper that times each call."""
+        original = getattr(module, attr)
+
+        if inspect.iscoroutinefunction(original):
+            @functools.wraps(original)
+            async def timed_async(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await original(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - start)
+
+            setattr(module, attr, timed_async)
+            return
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+
+        setattr(module, attr, timed)
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+
+    def drain(self) -> dict[str, list[float]]:
+        with self._lock:
+            samples, self._samples = self._samples, {}
+        return samples
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m bench",
+        description="Benchmark the API against local Reddit, YouTube, yt-dlp and GCS stand-ins.",
+    )
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated client concurrency levels.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint per concurrency level.")
+    parser.add_argument("--scrape-requests", type=int, default=8, help="POST /videos requests per concurrency level.")
+    parser.add_argument(
+        "--scenarios",
+        default="reddit,reddit-live,posts-save,posts-list,posts-filter,videos-list,scrape",
+        help="Comma-separated scenarios to run.",
+    )
+    parser.add_argument("--reddit-latency", type=float, default=0.15, help="Fake Reddit API latency in seconds.")
+    parser.add_argument("--download-seconds", type=float, default=0.5, help="Fake yt-dlp time per video.")
+    parser.add_argument("--download-mb", type=float, default=4, help="Fake video size in MiB.")
+    parser.add_argument("--gcs-mbps", type=float, default=50, help="Fake GCS bandwidth in MiB/s per request.")
+    parser.add_argument(
+        "--stream-uploads",
+        action="store_true",
+        help="Scrape by piping yt-dlp straight into GCS instead of staging files on disk.",
+    )
+    parser.add_argument("--json", dest="json_path", help="Also write raw results to this JSON file.")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args: argparse.Namespace, workdir: str) -> None:
+    """Point the app at throwaway local resources before it is imported."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ["SQL_ECHO"] = "false"
+    os.environ["YOUTUBE_SEARCH_BACKEND"] = "http"
+    os.environ["REDDIT_CLIENT_ID"] = "bench"
+    os.environ["REDDIT_CLIENT_SECRET"] = "bench"
+    os.environ["REDDIT_USER_AGENT"] = "autoreel-bench"
+    os.environ["REDDIT_USERNAME"] = "bench_user"
+    os.environ["REDDIT_PASSWORD"] = "bench"
+    os.environ["SCRAPE_STREAM_UPLOADS"] = "true" if args.stream_uploads else "false"
+    os.environ["YTDLP_BIN"] = f"{sys.executable} {os.path.join(BACKEND_DIR, 'bench', 'fake_ytdlp.py')}"
+    os.environ["BENCH_DOWNLOAD_SECONDS"] = str(args.download_seconds)
+    os.environ["BENCH_DOWNLOAD_BYTES"] = str(int(args.download_mb * 1024 * 1024))
+
+
+def install_fakes(args: argparse.Namespace, fake_url: str, timer: StageTimer) -> None:
+    """Swap the external clients for local stand-ins and time each stage."""
+    import bucket_upload
+    import reddit_posts
+    import youtube_scrapper
+    import youtube_search
+    from bench.fakes import FakeStorageClient, FakeYoutubeDL
+    from reddit_client import reddit_client
+
+    reddit_client.reddit = reddit_client.connect(
+        client_id="bench",
+        client_secret="bench",
+        user_agent="autoreel-bench",
+        username="bench_user",
+        password="bench",
+        oauth_url=fake_url,
+        reddit_url=fake_url,
+    )
+    youtube_search.SEARCH_URL = f"{fake_url}/results"
+
+    FakeYoutubeDL.seconds = args.download_seconds
+    FakeYoutubeDL.size = int(args.download_mb * 1024 * 1024)
+    youtube_scrapper.YoutubeDL = FakeYoutubeDL
+
+    storage_client = FakeStorageClient(bandwidth=args.gcs_mbps * 1024 * 1024)
+    bucket_upload.get_storage_client = lambda: storage_client
+
+    timer.wrap(reddit_posts, "fetch_posts_from_subreddit", "reddit.listing")
+    timer.wrap(youtube_scrapper, "search_gameplay_videos", "scrape.search")
+    timer.wrap(youtube_scrapper, "download_video", "scrape.download")
+    timer.wrap(youtube_scrapper, "upload_file_to_bucket", "scrape.upload")
+    timer.wrap(youtube_scrapper, "stream_video_to_bucket", "scrape.stream")
+    timer.wrap(youtube_scrapper, "save_video_to_db", "scrape.db_save")
+
+
+def start_app():
+    """Serve the app with uvicorn on a free local port, in a daemon thread."""
+    import uvicorn
+
+    import main
+
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=0, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def build_scenarios(args: argparse.Namespace) -> dict[str, tuple[Callable[[int], tuple], int]]:
+    """
+    Map scenario name to (request builder, request count). A builder takes
+    the request index and returns (method, path, params).
+    """
+    post_ids = itertools.count(1)
+    id_lock = threading.Lock()
+
+    def next_post_id(_: int) -> tuple:
+        with id_lock:
+            return ("POST", "/posts", {"post_id": f"b{next(post_ids):05x}"})
+
+    return {
+        "reddit": (lambda i: ("GET", "/reddit", {"limit": 15}), args.requests),
+        "reddit-live": (lambda i: ("GET", "/reddit", {"limit": 15, "refresh": "true"}), args.requests),
+        "posts-save": (next_post_id, args.requests),
+        "posts-list": (lambda i: ("GET", "/posts", {"limit": 15}), args.requests),
+        "posts-filter": (lambda i: ("GET", "/posts", {"limit": 15, "used": "false", "has_audio": "false"}), args.requests),
+        "videos-list": (lambda i: ("GET", "/videos", {"limit": 15}), args.requests),
+        "scrape": (lambda i: ("POST", "/videos", {"game": "Minecraft"}), args.scrape_requests),
+        # One request fanning out over several games.
+        "scrape-games": (
+            lambda i: ("POST", "/videos", {"games": ["Minecraft", "Pokemon", "Terraria", "Fortnite"]}),
+            args.scrape_requests,
+        ),
+    }
+
+
+def run_scenario(base_url: str, builder: Callable[[int], tuple], count: int, concurrency: int) -> dict:
+    import requests
+
+    local = threading.local()
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i: int) -> None:
+        nonlocal errors
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        method, path, params = builder(i)
+        start = time.perf_counter()
+        try:
+            response = session.request(method, base_url + path, params=params, timeout=600)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            errors += 0 if ok else 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(count)))
+    wall = time.perf_counter() - start
+
+    return {
+        "requests": count,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "throughput_rps": count / wall if wall else 0.0,
+    }
+
+
+def summarize_stages(samples: dict[str, list[float]]) -> dict[str, dict]:
+    return {
+        stage: {
+            "calls": len(values),
+            "p50_ms": percentile(values, 50) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+        for stage, values in sorted(samples.items())
+    }
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+    selected = [name for name in args.scenarios.split(",") if name]
+
+    sys.path.insert(0, BACKEND_DIR)
+    logging.basicConfig(level=logging.WARNING)
+    from bench.fakes import FakeServer
+
+    fake = FakeServer(reddit_latency=args.reddit_latency).start()
+    workdir = tempfile.mkdtemp(prefix="autoreel-bench-")
+    # Downloads land in ./video_downloads, so keep them in the scratch dir.
+    os.chdir(workdir)
+    configure_environment(args, workdir)
+
+    timer = StageTimer()
+    install_fakes(args, fake.url, timer)
+    server, thread, base_url = start_app()
+    scenarios = build_scenarios(args)
+
+    results = []
+    print(f"{'scenario':<14}{'conc':>5}{'reqs':>6}{'errs':>6}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+    try:
+        for name in selected:
+            if name not in scenarios:
+                print(f"Unknown scenario '{name}', skipping.", file=sys.stderr)
+                continue
+            builder, count = scenarios[name]
+            for concurrency in levels:
+                timer.drain()
+                stats = run_scenario(base_url, builder, count, concurrency)
+                stages = summarize_stages(timer.drain())
+                results.append({"scenario": name, "concurrency": concurrency, **stats, "stages": stages})
+
+                print(
+                    f"{name:<14}{concurrency:>5}{stats['requests']:>6}{stats['errors']:>6}"
+                    f"{stats['p50_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['throughput_rps']:>9.1f}"
+                )
+                for stage, stage_stats in stages.items():
+                    print(
+                        f"  {stage:<24}{stage_stats['calls']:>7} calls"
+                        f"{stage_stats['p50_ms']:>10.1f}{stage_stats['p99_ms']:>10.1f}"
+                    )
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+        fake.stop()
+
+    if json_path:
+        with open(json_path, "w") as out:
+            json.dump(results, out, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,27 @@
+"""
+Stand-in for the yt-dlp CLI when it streams to stdout (`-o -`).
+
+Writes BENCH_DOWNLOAD_BYTES bytes spread over BENCH_DOWNLOAD_SECONDS.
+"""
+import os
+import sys
+import time
+
+
+def main(argv: list[str]) -> int:
+    if argv[argv.index("-o") + 1] != "-":
+        print("fake_ytdlp only supports -o -", file=sys.stderr)
+        return 2
+    size = int(os.environ.get("BENCH_DOWNLOAD_BYTES", 4 * 1024 * 1024))
+    seconds = float(os.environ.get("BENCH_DOWNLOAD_SECONDS", 0.5))
+    block = os.urandom(1024) * 1024
+    blocks = max(1, size // len(block))
+    for _ in range(blocks):
+        time.sleep(seconds / blocks)
+        sys.stdout.buffer.write(block)
+    sys.stdout.buffer.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
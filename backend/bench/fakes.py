@@ -0,0 +1,320 @@
+import base64
+import hashlib
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def _submission(index: int, subreddit: str = "AmItheAsshole") -> dict:
+    post_id = f"b{index:05x}"
+    return {
+        "kind": "t3",
+        "data": {
+            "id": post_id,
+            "name": f"t3_{post_id}",
+            "title": f"AITA for benchmark post {index}? ",
+            "selftext": "So this happened. " * 40,
+            "url": f"https://www.reddit.com/r/{subreddit}/comments/{post_id}/",
+            "permalink": f"/r/{subreddit}/comments/{post_id}/",
+            "subreddit": subreddit,
+            "author": "bench_user",
+            "created_utc": 1_700_000_000 + index,
+            "is_self": True,
+        },
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeServer"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.startswith("/api/v1/access_token"):
+            self._json({"access_token": "bench", "token_type": "bearer", "expires_in": 86400, "scope": "*"})
+        else:
+            self._json({}, status=404)
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        path = url.path.rstrip("/")
+
+        if path == "/results":
+            self._html(self.server.youtube_page())
+            return
+
+        time.sleep(self.server.reddit_latency)
+        if re.fullmatch(r"/user/[^/]+/m/[^/]+/(hot|new)", path):
+            limit = int(query.get("limit", ["25"])[0])
+            children = [_submission(i) for i in range(min(limit, self.server.reddit_posts))]
+            self._json({"kind": "Listing", "data": {"children": children, "after": None, "before": None}})
+        elif path == "/api/info":
+            ids = query.get("id", [""])[0].split(",")
+            self.server.info_requests.append(ids)
+            children = [_submission(int(name[4:], 16)) for name in ids if name.startswith("t3_b")]
+            self._json({"kind": "Listing", "data": {"children": children, "after": None, "before": None}})
+        elif match := re.fullmatch(r"/comments/b([0-9a-f]+)", path):
+            self._json([
+                {"kind": "Listing", "data": {"children": [_submission(int(match.group(1), 16))], "after": None}},
+                {"kind": "Listing", "data": {"children": [], "after": None}},
+            ])
+        else:
+            self._json({"message": "Not Found", "error": 404}, status=404)
+
+    def _json(self, payload, status: int = 200) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        # Mirror Reddit's rate-limit headers. A window that is about to reset
+        # keeps prawcore from pacing requests, so Reddit is never the bottleneck.
+        self.send_header("x-ratelimit-remaining", "996.0")
+        self.send_header("x-ratelimit-used", "4")
+        self.send_header("x-ratelimit-reset", "1")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _html(self, body: str) -> None:
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeServer(ThreadingHTTPServer):
+    """
+    Local HTTP stand-in for the Reddit OAuth API and the YouTube results page.
+
+    Reddit: token endpoint, multireddit listings, /api/info and
+    /comments/{id}. Every submission ID of the form "b<hex>" resolves.
+
+    YouTube: /results serves the saved search fixture. Video IDs are made
+    unique per response so repeated scrapes always find new footage.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, reddit_latency: float = 0.0, reddit_posts: int = 100):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.reddit_latency = reddit_latency
+        self.reddit_posts = reddit_posts
+        # Fullnames asked for by each /api/info request, in arrival order.
+        self.info_requests: list[list[str]] = []
+        with open(os.path.join(FIXTURES_DIR, "youtube_search.html")) as fixture:
+            self._youtube_fixture = fixture.read()
+        self._page_counter = itertools.count()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def youtube_page(self) -> str:
+        page = next(self._page_counter)
+        return re.sub(r'"videoId": "bench(\d+)"', rf'"videoId": "b{page:04d}\1"', self._youtube_fixture)
+
+    def start(self) -> "FakeServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class FakeYoutubeDL:
+    """
+    Drop-in for yt_dlp.YoutubeDL that writes a file of `size` bytes after
+    sleeping `seconds`, instead of downloading.
+    """
+
+    seconds = 0.5
+    size = 4 * 1024 * 1024
+
+    def __init__(self, params: dict | None = None):
+        self.params = params or {}
+
+    def __enter__(self) -> "FakeYoutubeDL":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def extract_info(self, url: str, download: bool = True) -> dict:
+        video_id = parse_qs(urlparse(url).query).get("v", ["video"])[0]
+        info = {"id": video_id, "title": video_id, "ext": "mp4", "webpage_url": url}
+        path = self.prepare_filename(info)
+        if download:
+            time.sleep(self.seconds)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as out:
+                out.write(os.urandom(1024) * (self.size // 1024))
+            info["requested_downloads"] = [{"filepath": path}]
+        return info
+
+    def prepare_filename(self, info: dict) -> str:
+        home = self.params.get("paths", {}).get("home", ".")
+        return os.path.join(home, f"{info['title']} [{info['id']}].{info['ext']}")
+
+
+def _md5_base64(data: bytes) -> str:
+    return base64.b64encode(hashlib.md5(data).digest()).decode()
+
+
+class FakeBlob:
+    def __init__(self, bucket: "FakeBucket", name: str, chunk_size: int | None = None):
+        self.bucket = bucket
+        self.name = name
+        self.chunk_size = chunk_size
+        self._expected_md5: str | None = None
+
+    @property
+    def _stored(self) -> bytes | None:
+        return self.bucket.objects.get(self.name)
+
+    @property
+    def size(self) -> int | None:
+        data = self._stored
+        return None if data is None else len(data)
+
+    @property
+    def md5_hash(self) -> str | None:
+        data = self._stored
+        return None if data is None else _md5_base64(data)
+
+    @md5_hash.setter
+    def md5_hash(self, value: str | None) -> None:
+        # Like GCS, verify the checksum sent with the next upload.
+        self._expected_md5 = value
+
+    @property
+    def generation(self) -> int | None:
+        return self.bucket.generations.get(self.name) if self._stored is not None else None
+
+    def exists(self, *args, **kwargs) -> bool:
+        return self._stored is not None
+
+    def reload(self, *args, **kwargs) -> None:
+        if self._stored is None:
+            raise FileNotFoundError(self.name)
+
+    def upload_from_filename(self, filename: str, *args, **kwargs) -> None:
+        with open(filename, "rb") as source:
+            self.upload_from_file(source)
+
+    def upload_from_file(self, file_obj, *args, **kwargs) -> None:
+        data = file_obj.read()
+        self.bucket.client.transfer(len(data))
+        if self._expected_md5 is not None and self._expected_md5 != _md5_base64(data):
+            raise ValueError(f"MD5 mismatch uploading {self.name}")
+        self.bucket.store(self.name, data)
+
+    def open(self, mode: str = "r", *args, **kwargs) -> "FakeBlobWriter":
+        if mode != "wb":
+            raise ValueError(f"FakeBlob only supports mode 'wb', got '{mode}'")
+        return FakeBlobWriter(self, kwargs.get("chunk_size") or self.chunk_size)
+
+    def delete(self, *args, **kwargs) -> None:
+        if self.bucket.objects.pop(self.name, None) is None:
+            raise FileNotFoundError(self.name)
+
+    def download_to_filename(self, filename: str, *args, **kwargs) -> None:
+        data = self._stored
+        if data is None:
+            raise FileNotFoundError(self.name)
+        self.bucket.client.transfer(len(data))
+        with open(filename, "wb") as out:
+            out.write(data)
+
+
+class FakeBlobWriter:
+    """
+    Resumable-upload writer: data is transferred `chunk_size` bytes at a
+    time and only becomes visible on close. Leaving the `with` block on an
+    exception cancels the upload.
+    """
+
+    def __init__(self, blob: FakeBlob, chunk_size: int | None):
+        self.blob = blob
+        self.chunk_size = chunk_size or 8 * 1024 * 1024
+        self._pending = bytearray()
+        self._sent: list[bytes] = []
+
+    def __enter__(self) -> "FakeBlobWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+
+    def write(self, data: bytes) -> int:
+        self._pending += data
+        while len(self._pending) >= self.chunk_size:
+            self._send(self.chunk_size)
+        return len(data)
+
+    def close(self) -> None:
+        self._send(len(self._pending))
+        self.blob.bucket.store(self.blob.name, b"".join(self._sent))
+
+    def _send(self, size: int) -> None:
+        chunk = bytes(self._pending[:size])
+        del self._pending[:size]
+        self.blob.bucket.client.transfer(len(chunk))
+        self._sent.append(chunk)
+
+
+class FakeBucket:
+    def __init__(self, client: "FakeStorageClient", name: str):
+        self.client = client
+        self.name = name
+        self.objects: dict[str, bytes] = {}
+        # Like GCS, every write of an object gets a new generation number.
+        self.generations: dict[str, int] = {}
+        self._next_generation = itertools.count(1)
+
+    def store(self, blob_name: str, data: bytes) -> None:
+        self.objects[blob_name] = data
+        self.generations[blob_name] = next(self._next_generation)
+
+    def blob(self, blob_name: str, chunk_size: int | None = None, **kwargs) -> FakeBlob:
+        return FakeBlob(self, blob_name, chunk_size=chunk_size)
+
+    def get_blob(self, blob_name: str, *args, **kwargs) -> FakeBlob | None:
+        blob = FakeBlob(self, blob_name)
+        return blob if blob.exists() else None
+
+
+class FakeStorageClient:
+    """
+    In-process GCS emulator holding objects in memory. Transfers sleep to
+    model `bandwidth` bytes per second per request.
+    """
+
+    def __init__(self, bandwidth: float = 50 * 1024 * 1024):
+        self.bandwidth = bandwidth
+        self._buckets: dict[str, FakeBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, bucket_name: str) -> FakeBucket:
+        with self._lock:
+            if bucket_name not in self._buckets:
+                self._buckets[bucket_name] = FakeBucket(self, bucket_name)
+            return self._buckets[bucket_name]
+
+    def transfer(self, size: int) -> None:
+        if self.bandwidth:
+            time.sleep(size / self.bandwidth)
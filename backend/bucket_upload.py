@@ -1,68 +1,271 @@
+import base64
+import hashlib
 import os
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO
+
 from google.cloud import storage
 from google.api_core.retry import Retry
 
+from config import GCS_BUCKET_NAME, GCS_CHUNK_SIZE, GCS_UPLOAD_WORKERS
+from metrics import record_bytes, timed
+
+
+_client_lock = threading.Lock()
+_client: storage.Client | None = None
+_client_pid: int | None = None
+
+
+def get_storage_client() -> storage.Client:
+    """
+    Return the process-wide GCS client, creating it on first use.
+
+    The client is rebuilt after a fork, since its HTTP session must not be
+    shared between processes.
+
+    :return: A shared `storage.Client`.
+    """
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = storage.Client()
+            _client_pid = os.getpid()
+        return _client
+
+
+def get_bucket(bucket_name: str = GCS_BUCKET_NAME) -> storage.Bucket:
+    """
+    Return a bucket handle on the shared client. No API call is made.
+
+    :param bucket_name: Name of the GCS bucket.
+    :return: A `storage.Bucket`.
+    """
+    return get_storage_client().bucket(bucket_name)
+
 
 def upload_downloaded_files(
     download_dir: str = "./video_downloads", 
-    bucket_name: str = "yt-videos-bucket"
+    bucket_name: str = GCS_BUCKET_NAME,
+    max_workers: int = GCS_UPLOAD_WORKERS,
 ) -> list[str]:
     """
-    Finds all files in `download_dir` and uploads them to the specified
-    Google Cloud Storage bucket under the "videos/" prefix.
+    Finds all files in `download_dir` and uploads them concurrently to the
+    specified Google Cloud Storage bucket under the "videos/" prefix.
 
     :param download_dir: Path to the local directory containing files to upload.
     :param bucket_name: Name of the GCS bucket.
+    :param max_workers: Max concurrent uploads.
     :return: A list of file paths (GCS) that were successfully uploaded.
     """
-    files = os.listdir(download_dir)
-    uploads = []
+    files = sorted(os.listdir(download_dir))
+    if not files:
+        return []
 
-    for file_name in files:
+    def _upload(file_name: str) -> str | None:
         try:
-            uploaded_path = upload_file_to_bucket(
+            return upload_file_to_bucket(
                 file_name=file_name,
                 bucket_name=bucket_name,
                 local_dir=download_dir
             )
-            uploads.append(uploaded_path)
         except Exception as ex:
             logging.error("Error uploading file '%s' to GCP: %s", file_name, ex)
+            return None
 
-    return uploads
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload") as pool:
+        uploads = list(pool.map(_upload, files))
 
+    return [path for path in uploads if path]
+
+@timed("gcs.upload")
 def upload_file_to_bucket(
     file_name: str, 
-    bucket_name: str, 
+    bucket_name: str = GCS_BUCKET_NAME, 
     local_dir: str = "./video_downloads",
     gcs_subdir: str = "videos",
     retry: Retry = Retry(deadline=300),
-    timeout: int = 300
+    timeout: int = 300,
+    chunk_size: int = GCS_CHUNK_SIZE,
+    skip_if_unchanged: bool = True,
 ) -> str:
     """
     Upload a single file to the specified GCS bucket.
 
+    If `skip_if_unchanged` is set and the blob already exists with the same
+    MD5 checksum, the upload is skipped. Otherwise the local checksum is
+    sent with the upload so GCS rejects corrupted transfers.
+
+    Files larger than 8 MiB are sent as a resumable upload in `chunk_size`
+    pieces. A dropped connection only retries the current chunk, resuming
+    from the offset GCS acknowledged, rather than restarting the file.
+
     :param file_name: Name of the local file.
     :param bucket_name: Name of the GCS bucket.
     :param local_dir: Path to the local directory containing the file.
     :param gcs_subdir: Subdirectory within GCS to store the file.
-    :param retry: Optional Retry object.
-    :param timeout: Timeout for the upload.
+    :param retry: Optional Retry object, applied per chunk.
+    :param timeout: Timeout for each upload request.
+    :param chunk_size: Resumable chunk size in bytes (multiple of 256 KiB).
+    :param skip_if_unchanged: Skip the upload when an identical blob exists.
     :return: The full GCS path to the uploaded file.
     """
-    client = storage.Client()
-    bucket = client.bucket(bucket_name)
+    bucket = get_bucket(bucket_name)
     blob_path = f"{gcs_subdir}/{file_name}"
-    blob = bucket.blob(blob_path)
+    gcs_path = f"gs://{bucket_name}/{blob_path}"
 
     local_path = os.path.join(local_dir, file_name)
 
     try:
+        local_md5 = file_md5_base64(local_path)
+        if skip_if_unchanged:
+            existing = bucket.get_blob(blob_path, retry=retry, timeout=timeout)
+            if existing is not None and existing.md5_hash == local_md5:
+                logging.info("Skipping upload of '%s'; identical blob exists", gcs_path)
+                os.remove(local_path)
+                return gcs_path
+
+        blob = bucket.blob(blob_path, chunk_size=chunk_size)
+        blob.md5_hash = local_md5
         blob.upload_from_filename(local_path, retry=retry, timeout=timeout)
+        record_bytes("gcs.upload", os.path.getsize(local_path))
         os.remove(local_path)  # remove local file after successful upload
-        gcs_path = f"gs://{bucket_name}/{blob_path}"
         return gcs_path
     except Exception as err:
         logging.error("Failed to upload file '%s': %s", local_path, err)
-        raise
\ No newline at end of file
+        raise
+
+
+@timed("gcs.stream_upload")
+def upload_stream_to_bucket(
+    source: BinaryIO,
+    file_name: str,
+    bucket_name: str = GCS_BUCKET_NAME,
+    gcs_subdir: str = "videos",
+    retry: Retry = Retry(deadline=300),
+    timeout: int = 300,
+    chunk_size: int = GCS_CHUNK_SIZE,
+    read_size: int = 1024 * 1024,
+) -> str:
+    """
+    Upload everything read from `source` to GCS as a resumable upload,
+    without staging it on disk.
+
+    At most one `chunk_size` chunk plus one `read_size` read are held in
+    memory. While GCS is slower than the source, writes block and the
+    producer is backpressured. The MD5 is computed while streaming and
+    checked against the stored object. If `source` raises, the upload is
+    cancelled and nothing is created.
+
+    :param source: Binary file-like object, read until EOF.
+    :param file_name: Object name under `gcs_subdir`.
+    :param bucket_name: Name of the GCS bucket.
+    :param gcs_subdir: Subdirectory within GCS to store the file.
+    :param retry: Optional Retry object, applied per chunk.
+    :param timeout: Timeout for each upload request.
+    :param chunk_size: Resumable chunk size in bytes (multiple of 256 KiB).
+    :param read_size: Bytes read from `source` at a time.
+    :return: The full GCS path to the uploaded object.
+    :raises ValueError: If the stored object's checksum does not match.
+    """
+    blob_path = f"{gcs_subdir}/{file_name}"
+    gcs_path = f"gs://{bucket_name}/{blob_path}"
+    blob = get_bucket(bucket_name).blob(blob_path, chunk_size=chunk_size)
+    digest = hashlib.md5()
+    total = 0
+
+    try:
+        with blob.open("wb", chunk_size=chunk_size, retry=retry, timeout=timeout, checksum="md5") as writer:
+            for block in iter(lambda: source.read(read_size), b""):
+                digest.update(block)
+                writer.write(block)
+                total += len(block)
+
+        record_bytes("gcs.stream_upload", total)
+        local_md5 = base64.b64encode(digest.digest()).decode()
+        blob.reload(retry=retry, timeout=timeout)
+        if blob.md5_hash != local_md5:
+            blob.delete(retry=retry, timeout=timeout)
+            raise ValueError(f"MD5 mismatch after streaming upload of '{gcs_path}'")
+        return gcs_path
+    except Exception as err:
+        logging.error("Failed to stream upload '%s': %s", gcs_path, err)
+        raise
+
+
+def file_md5_base64(path: str, block_size: int = 1024 * 1024) -> str:
+    """
+    Base64-encoded MD5 of a file, in the format GCS reports as `md5Hash`.
+
+    :param path: Local file path.
+    :param block_size: Read size in bytes.
+    :return: The checksum string.
+    """
+    digest = hashlib.md5()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(block_size), b""):
+            digest.update(block)
+    return base64.b64encode(digest.digest()).decode()
+
+
+def parse_gcs_path(gcs_path: str) -> tuple[str, str]:
+    """
+    Split "gs://bucket/path/to/blob" into its bucket name and blob path.
+
+    :param gcs_path: Full GCS path.
+    :return: Tuple of (bucket_name, blob_path).
+    :raises ValueError: If the path is not a gs:// URL.
+    """
+    if not gcs_path.startswith("gs://"):
+        raise ValueError(f"Not a GCS path: '{gcs_path}'")
+    bucket_name, _, blob_path = gcs_path[len("gs://"):].partition("/")
+    if not bucket_name or not blob_path:
+        raise ValueError(f"Not a GCS path: '{gcs_path}'")
+    return bucket_name, blob_path
+
+
+def blob_version(gcs_path: str) -> str:
+    """
+    Identify the current content of a GCS object, for cache keys. Costs one
+    metadata request.
+
+    :param gcs_path: Full "gs://bucket/blob" path.
+    :return: "md5:<hash>", or "generation:<n>" for objects without an MD5
+        (composite uploads).
+    :raises FileNotFoundError: If the object does not exist.
+    """
+    bucket_name, blob_path = parse_gcs_path(gcs_path)
+    blob = get_bucket(bucket_name).get_blob(blob_path)
+    if blob is None:
+        raise FileNotFoundError(f"No such GCS object: '{gcs_path}'")
+    if blob.md5_hash:
+        return f"md5:{blob.md5_hash}"
+    return f"generation:{blob.generation}"
+
+
+@timed("gcs.download")
+def download_from_bucket(
+    gcs_path: str,
+    local_path: str,
+    retry: Retry = Retry(deadline=300),
+    timeout: int = 300,
+) -> str:
+    """
+    Download a GCS object to a local file.
+
+    :param gcs_path: Full "gs://bucket/blob" path.
+    :param local_path: Destination file path.
+    :param retry: Optional Retry object.
+    :param timeout: Timeout for the download.
+    :return: `local_path`.
+    """
+    bucket_name, blob_path = parse_gcs_path(gcs_path)
+    blob = get_bucket(bucket_name).blob(blob_path)
+    try:
+        blob.download_to_filename(local_path, retry=retry, timeout=timeout)
+        record_bytes("gcs.download", os.path.getsize(local_path))
+        return local_path
+    except Exception as err:
+        logging.error("Failed to download '%s': %s", gcs_path, err)
+        raise
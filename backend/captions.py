@@ -0,0 +1,313 @@
+import logging
+import re
+import wave
+from contextlib import contextmanager
+from typing import Iterator
+
+import numpy as np
+from fastapi import HTTPException
+from sqlmodel import Session
+
+from artifact_cache import get_artifact_cache
+from bucket_upload import blob_version
+from config import FFMPEG_BIN, engine
+from models import Post
+from tts import split_sentences
+from video_generator import REEL_HEIGHT, REEL_WIDTH, cached_source, run_ffmpeg
+
+
+# Envelope resolution: one RMS value per 10 ms of audio.
+FRAME_SECONDS = 0.01
+# Frames quieter than this, relative to the loud end of the track, are silence.
+SILENCE_DB = -35.0
+# Shorter silences are treated as part of a word, not as a pause.
+MIN_PAUSE_SECONDS = 0.12
+
+# Analysis rate; captions don't need more than telephone quality.
+_ANALYSIS_RATE = 16000
+
+
+def load_pcm(path: str) -> tuple[np.ndarray, int]:
+    """
+    Read a 16-bit PCM WAV as mono float samples in [-1, 1].
+
+    :param path: Local WAV file.
+    :return: (samples, sample rate).
+    :raises ValueError: If the file is not 16-bit PCM.
+    """
+    with wave.open(path, "rb") as audio:
+        if audio.getsampwidth() != 2:
+            raise ValueError(f"Expected 16-bit PCM in '{path}'")
+        channels = audio.getnchannels()
+        rate = audio.getframerate()
+        frames = audio.readframes(audio.getnframes())
+    samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples, rate
+
+
+def energy_envelope(samples: np.ndarray, rate: int, frame_seconds: float = FRAME_SECONDS) -> np.ndarray:
+    """
+    RMS energy per frame, in dB relative to full scale.
+
+    :param samples: Mono samples in [-1, 1].
+    :param rate: Sample rate.
+    :param frame_seconds: Frame length.
+    :return: One dB value per frame.
+    """
+    frame_length = max(1, int(rate * frame_seconds))
+    n_frames = len(samples) // frame_length
+    frames = samples[: n_frames * frame_length].reshape(n_frames, frame_length)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def voiced_frames(
+    envelope_db: np.ndarray,
+    silence_db: float = SILENCE_DB,
+    min_pause_frames: int = int(MIN_PAUSE_SECONDS / FRAME_SECONDS),
+) -> np.ndarray:
+    """
+    Classify frames as speech, filling silences too short to be pauses.
+
+    :param envelope_db: Output of energy_envelope().
+    :param silence_db: Threshold below the track's 95th percentile level.
+    :param min_pause_frames: Shortest silence kept as a pause.
+    :return: Boolean array, True where speech is present.
+    """
+    if not len(envelope_db):
+        return np.zeros(0, dtype=bool)
+    voiced = envelope_db > np.percentile(envelope_db, 95) + silence_db
+    starts, ends = _runs(~voiced)
+    # Leading and trailing silence is never filled; it isn't between words.
+    short = (ends - starts < min_pause_frames) & (starts > 0) & (ends < len(voiced))
+    fill = np.zeros(len(voiced) + 1, dtype=np.int32)
+    np.add.at(fill, starts[short], 1)
+    np.add.at(fill, ends[short], -1)
+    return voiced | (np.cumsum(fill[:-1]) > 0)
+
+
+def _runs(mask: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Start (inclusive) and end (exclusive) indices of each run of True."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def _word_weights(words: list[str]) -> np.ndarray:
+    # Spoken length tracks letters plus a fixed cost per word.
+    return np.array([len(re.sub(r"\W", "", word)) + 2 for word in words], dtype=np.float64)
+
+
+def align_sentences(sentences: list[str], voiced: np.ndarray) -> list[tuple[int, int]]:
+    """
+    Assign each sentence a frame span, cutting at the longest pauses.
+
+    TTS leaves its longest silences between sentences, so the n-1 longest
+    pauses are taken as sentence boundaries. When the audio has fewer
+    pauses than that, spans are split by text length at the average
+    speech rate instead.
+
+    :param sentences: Sentences, in narration order.
+    :param voiced: Output of voiced_frames().
+    :return: (start frame, end frame) per sentence.
+    """
+    speech = np.flatnonzero(voiced)
+    if not len(speech) or not sentences:
+        return [(0, 0)] * len(sentences)
+    first, last = speech[0], speech[-1] + 1
+
+    pause_starts, pause_ends = _runs(~voiced[first:last])
+    pause_starts += first
+    pause_ends += first
+    needed = len(sentences) - 1
+    if len(pause_starts) >= needed:
+        longest = np.sort(np.argsort(pause_ends - pause_starts, kind="stable")[::-1][:needed])
+        starts = np.concatenate(([first], pause_ends[longest]))
+        ends = np.concatenate((pause_starts[longest], [last]))
+    else:
+        voiced_total = np.cumsum(voiced[first:last])
+        lengths = np.array([len(sentence) for sentence in sentences], dtype=np.float64)
+        targets = np.cumsum(lengths) / lengths.sum() * voiced_total[-1]
+        cuts = first + np.searchsorted(voiced_total, targets[:-1])
+        starts = np.concatenate(([first], cuts))
+        ends = np.concatenate((cuts, [last]))
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def align_words(words: list[str], voiced: np.ndarray, start: int, end: int) -> list[tuple[int, int]]:
+    """
+    Spread a sentence's words over its voiced frames in proportion to
+    their length, so pauses inside the sentence fall between words.
+
+    :param words: The sentence's words.
+    :param voiced: Output of voiced_frames().
+    :param start: First frame of the sentence.
+    :param end: Frame after the sentence.
+    :return: (start frame, end frame) per word.
+    """
+    if not words:
+        return []
+    voiced_total = np.cumsum(voiced[start:end])
+    if not len(voiced_total) or not voiced_total[-1]:
+        return [(start, end)] * len(words)
+
+    weights = _word_weights(words)
+    bounds = np.concatenate(([0.0], np.cumsum(weights) / weights.sum())) * voiced_total[-1]
+    # Frame index at which the cumulative voiced time first reaches each bound.
+    frames = start + np.searchsorted(voiced_total, bounds, side="left")
+    frames[0] = start
+    frames[-1] = end
+    return list(zip(frames[:-1].tolist(), frames[1:].tolist()))
+
+
+def caption_timings(text: str, samples: np.ndarray, rate: int) -> list[dict]:
+    """
+    Sentence and word timings for narrated text.
+
+    :param text: The narrated text.
+    :param samples: Mono samples of the narration.
+    :param rate: Sample rate.
+    :return: One dict per sentence with 'text', 'start', 'end' (seconds)
+        and 'words', a list of dicts with 'text', 'start' and 'end'.
+    """
+    sentences = split_sentences(text)
+    voiced = voiced_frames(energy_envelope(samples, rate))
+    timings = []
+    for sentence, (start, end) in zip(sentences, align_sentences(sentences, voiced)):
+        words = sentence.split()
+        timings.append({
+            "text": sentence,
+            "start": start * FRAME_SECONDS,
+            "end": end * FRAME_SECONDS,
+            "words": [
+                {"text": word, "start": word_start * FRAME_SECONDS, "end": word_end * FRAME_SECONDS}
+                for word, (word_start, word_end) in zip(words, align_words(words, voiced, start, end))
+            ],
+        })
+    return timings
+
+
+def build_cues(timings: list[dict], level: str = "word", words_per_cue: int = 3) -> list[tuple[float, float, str]]:
+    """
+    Group timings into subtitle cues.
+
+    :param timings: Output of caption_timings().
+    :param level: "sentence" for one cue per sentence, or "word" for
+        cues of `words_per_cue` words.
+    :param words_per_cue: Words shown at once at word level.
+    :return: (start, end, text) per cue.
+    """
+    if level == "sentence":
+        return [(sentence["start"], sentence["end"], sentence["text"]) for sentence in timings]
+
+    cues = []
+    for sentence in timings:
+        words = sentence["words"]
+        for i in range(0, len(words), words_per_cue):
+            group = words[i:i + words_per_cue]
+            cues.append((group[0]["start"], group[-1]["end"], " ".join(word["text"] for word in group)))
+    return cues
+
+
+def _timestamp(seconds: float, separator: str = ",", hour_digits: int = 2, fraction_digits: int = 3) -> str:
+    units = round(seconds * 10 ** fraction_digits)
+    fraction = units % 10 ** fraction_digits
+    whole = units // 10 ** fraction_digits
+    return (
+        f"{whole // 3600:0{hour_digits}d}:{whole // 60 % 60:02d}:{whole % 60:02d}"
+        f"{separator}{fraction:0{fraction_digits}d}"
+    )
+
+
+def to_srt(cues: list[tuple[float, float, str]]) -> str:
+    """
+    Render cues as SubRip.
+    """
+    return "\n".join(
+        f"{i}\n{_timestamp(start)} --> {_timestamp(end)}\n{text}\n"
+        for i, (start, end, text) in enumerate(cues, start=1)
+    )
+
+
+def to_ass(cues: list[tuple[float, float, str]]) -> str:
+    """
+    Render cues as Advanced SubStation Alpha, styled for a 9:16 reel
+    (large bold outlined text, centered in the lower third).
+    """
+    header = (
+        "[Script Info]\n"
+        "ScriptType: v4.00+\n"
+        f"PlayResX: {REEL_WIDTH}\n"
+        f"PlayResY: {REEL_HEIGHT}\n"
+        "WrapStyle: 0\n"
+        "\n"
+        "[V4+ Styles]\n"
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding\n"
+        "Style: Default,Arial,96,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,"
+        "-1,0,0,0,100,100,0,0,1,6,2,2,80,80,480,1\n"
+        "\n"
+        "[Events]\n"
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+    )
+    events = "".join(
+        f"Dialogue: 0,{_timestamp(start, '.', 1, 2)},{_timestamp(end, '.', 1, 2)},Default,,0,0,0,,"
+        f"{text.replace('{', '(').replace('}', ')')}\n"
+        for start, end, text in cues
+    )
+    return header + events
+
+
+@contextmanager
+def _cached_pcm(gcs_path: str) -> Iterator[str]:
+    """Fetch narration audio as 16-bit mono WAV through the artifact cache, held until exit."""
+    cache = get_artifact_cache()
+    # Narration is rewritten in place, so key on its content, not its path.
+    version = blob_version(gcs_path)
+    if gcs_path.endswith(".wav"):
+        with cached_source(cache, gcs_path, version) as source:
+            yield source
+        return
+
+    def convert(tmp_path: str) -> None:
+        with cached_source(cache, gcs_path, version) as source:
+            run_ffmpeg([
+                FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-y",
+                "-i", source, "-ac", "1", "-ar", str(_ANALYSIS_RATE), "-c:a", "pcm_s16le", "-f", "wav", tmp_path,
+            ])
+
+    with cache.entry("pcm", version, {"rate": _ANALYSIS_RATE}, convert, suffix=".wav") as path:
+        yield path
+
+
+def post_captions(post_id: str, caption_format: str = "srt", level: str = "word", words_per_cue: int = 3) -> str:
+    """
+    Generate subtitles for a post from its text and narration audio.
+
+    :param post_id: ID of a saved post with audio.
+    :param caption_format: "srt" or "ass".
+    :param level: "word" or "sentence" cues.
+    :param words_per_cue: Words per cue at word level.
+    :return: The subtitle file contents.
+    :raises HTTPException: 404 if the post is missing, 400 if it has no audio.
+    """
+    with Session(engine) as session:
+        post = session.get(Post, post_id)
+    if post is None:
+        raise HTTPException(status_code=404, detail=f"Post {post_id} not found.")
+    if not post.audio_file_url:
+        raise HTTPException(status_code=400, detail=f"Post {post_id} has no audio.")
+
+    try:
+        with _cached_pcm(post.audio_file_url) as pcm_path:
+            samples, rate = load_pcm(pcm_path)
+    except Exception as ex:
+        logging.error("Failed to load audio for post %s: %s", post_id, ex)
+        raise HTTPException(status_code=500, detail=f"Could not read audio for post {post_id}.")
+
+    # Narration reads the title then the body, the same order as tts.narrate_post.
+    timings = caption_timings(f"{post.title}\n{post.content}", samples, rate)
+    cues = build_cues(timings, level=level, words_per_cue=words_per_cue)
+    return to_ass(cues) if caption_format == "ass" else to_srt(cues)
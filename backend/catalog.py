@@ -0,0 +1,221 @@
+import json
+import logging
+from typing import BinaryIO, Iterator, Optional
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import Boolean, Integer, Numeric, String, select
+from sqlmodel import Session, SQLModel
+
+from config import EXPORT_BATCH_SIZE, IMPORT_BATCH_SIZE, engine
+from metrics import stage
+from models import Post, Video
+from response_cache import post_pages, video_pages
+from util import upsert_rows
+
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Columns identifying an imported row. Video ids are assigned per database,
+# so videos are matched on their URL and imported ids are ignored.
+_IMPORT_KEYS = {Post: ["id"], Video: ["video_url"]}
+_IMPORT_SKIP = {Post: set(), Video: {"id"}}
+_PAGES = {Post: post_pages, Video: video_pages}
+
+# Rejected rows reported back by an import, beyond which they're only counted.
+MAX_REPORTED_ERRORS = 20
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Parquet support requires the 'pyarrow' package.")
+    return pyarrow
+
+
+def export_rows(model: type[SQLModel], where: Optional[list] = None, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[list[dict]]:
+    """
+    Read every row of a table in primary key order, `batch_size` rows at a
+    time, from a server-side cursor. Only one batch is held in memory.
+
+    :param model: Table model to export.
+    :param where: Optional filter clauses.
+    :param batch_size: Rows fetched per round trip.
+    :return: Iterator of row batches, each a list of column dicts.
+    """
+    table = model.__table__
+    statement = (
+        select(table)
+        .where(*(where or []))
+        .order_by(*table.primary_key.columns)
+        .execution_options(yield_per=batch_size)
+    )
+    with Session(engine) as session:
+        for partition in session.execute(statement).mappings().partitions():
+            yield [dict(row) for row in partition]
+
+
+def to_ndjson(batches: Iterator[list[dict]]) -> Iterator[bytes]:
+    """Encode row batches as newline-delimited JSON, one chunk per batch."""
+    for rows in batches:
+        yield "".join(json.dumps(row) + "\n" for row in rows).encode()
+
+
+class _ChunkSink:
+    """Write-only file collecting what pyarrow writes until it's drained."""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def parquet_schema(model: type[SQLModel]):
+    """Arrow schema matching a table model's columns."""
+    pa = _require_pyarrow()
+    types = [(Boolean, pa.bool_()), (Integer, pa.int64()), (Numeric, pa.float64()), (String, pa.string())]
+
+    def arrow_type(column):
+        # The affinity sees through wrappers such as SQLModel's AutoString.
+        return next(arrow for sql_type, arrow in types if issubclass(column.type._type_affinity, sql_type))
+
+    return pa.schema(
+        [pa.field(column.name, arrow_type(column), nullable=column.nullable) for column in model.__table__.columns]
+    )
+
+
+def to_parquet(model: type[SQLModel], batches: Iterator[list[dict]]) -> Iterator[bytes]:
+    """
+    Encode row batches as a Parquet file, one row group per batch. Each row
+    group is yielded as soon as it is written, and the footer last.
+    """
+    pa = _require_pyarrow()
+    schema = parquet_schema(model)
+    sink = _ChunkSink()
+    with pa.parquet.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for rows in batches:
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def export_catalog(model: type[SQLModel], export_format: str, where: Optional[list] = None) -> Iterator[bytes]:
+    """
+    Stream a table as NDJSON or Parquet.
+
+    :param model: Post or Video.
+    :param export_format: "ndjson" or "parquet".
+    :param where: Optional filter clauses.
+    :return: Iterator of encoded chunks, for a StreamingResponse.
+    """
+    if export_format == "parquet":
+        # Fail before the response starts rather than mid-stream.
+        _require_pyarrow()
+        return to_parquet(model, export_rows(model, where))
+    return to_ndjson(export_rows(model, where))
+
+
+def _read_ndjson(source: BinaryIO) -> Iterator[tuple[int, object]]:
+    for line_number, line in enumerate(source, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as ex:
+            yield line_number, ex
+
+
+def _read_parquet(source: BinaryIO, batch_size: int) -> Iterator[tuple[int, object]]:
+    pa = _require_pyarrow()
+    try:
+        parquet_file = pa.parquet.ParquetFile(source)
+    except pa.ArrowException as ex:
+        raise HTTPException(status_code=400, detail=f"Invalid Parquet file: {ex}")
+    row_number = 0
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        for row in batch.to_pylist():
+            row_number += 1
+            yield row_number, row
+
+
+def import_catalog(model: type[SQLModel], import_format: str, source: BinaryIO, batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """
+    Validate rows read from an NDJSON or Parquet file and upsert them in
+    batches, one transaction per batch. Rows that fail validation are
+    skipped and reported; the rest are still imported.
+
+    :param model: Post or Video.
+    :param import_format: "ndjson" or "parquet".
+    :param source: Binary file positioned at the start of the data.
+    :param batch_size: Rows per upsert statement.
+    :return: Dict with the 'imported' and 'rejected' counts, and 'errors'
+        for the first rejected rows (line or row number and reason).
+    """
+    keys = _IMPORT_KEYS[model]
+    columns = [column.name for column in model.__table__.columns if column.name not in _IMPORT_SKIP[model]]
+    rows = _read_parquet(source, batch_size) if import_format == "parquet" else _read_ndjson(source)
+    summary = {"imported": 0, "rejected": 0, "errors": []}
+
+    def reject(row_number: int, reason: str) -> None:
+        summary["rejected"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"row": row_number, "error": reason})
+
+    def flush(batch: dict) -> None:
+        with Session(engine) as session:
+            try:
+                with stage("db.import_batch"):
+                    upsert_rows(session, model, list(batch.values()), keys)
+                    session.commit()
+                # Upserts don't report which rows changed, so drop every cached page.
+                _PAGES[model].clear()
+            except Exception as ex:
+                logging.error("import_catalog error saving %s rows: %s", model.__name__, ex)
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Failed to import rows after {summary['imported']} were saved.",
+                )
+        summary["imported"] += len(batch)
+
+    # Keyed by the conflict columns: a statement may not upsert a row twice.
+    batch: dict[tuple, dict] = {}
+    for row_number, data in rows:
+        if isinstance(data, Exception):
+            reject(row_number, f"Invalid JSON: {data}")
+            continue
+        if not isinstance(data, dict):
+            reject(row_number, "Expected an object.")
+            continue
+        try:
+            record = model.model_validate({name: value for name, value in data.items() if name not in _IMPORT_SKIP[model]})
+        except ValidationError as ex:
+            reject(row_number, "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in ex.errors()))
+            continue
+        values = {name: getattr(record, name) for name in columns}
+        batch[tuple(values[key] for key in keys)] = values
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = {}
+    if batch:
+        flush(batch)
+    return summary
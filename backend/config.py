@@ -1,14 +1,55 @@
 from dotenv import load_dotenv
-from os import environ
-import models
-from sqlmodel import SQLModel, create_engine
+from os import cpu_count, environ
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from games import GAMES_FILE
 
 
 load_dotenv()
 DATABASE_URL = environ.get("DATABASE_URL", None)
 
-engine = create_engine(DATABASE_URL, echo=True)
-SQLModel.metadata.create_all(engine)
+# Log every SQL statement. Off by default; it is costly under load.
+SQL_ECHO = environ.get("SQL_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(environ.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(environ.get("DB_POOL_RECYCLE", 1800))
+
+_ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def _async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}'; set ASYNC_DATABASE_URL.")
+    return parsed.set(drivername=_ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def _pool_options(url: str) -> dict:
+    # SQLite keeps SQLAlchemy's default pools: aiosqlite's NullPool (files) and
+    # StaticPool (in-memory) reject sizing options, for file databases too.
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+ASYNC_DATABASE_URL = environ.get("ASYNC_DATABASE_URL") or _async_database_url(DATABASE_URL)
+
+# The one sync engine, used by threadpool routes and background workers.
+engine = create_engine(DATABASE_URL, echo=SQL_ECHO, **_pool_options(DATABASE_URL))
+# Async engine for `async def` routes.
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=SQL_ECHO, **_pool_options(DATABASE_URL))
+async_session = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
 
 REDDIT_CLIENT_ID = environ.get("REDDIT_CLIENT_ID", None)
 REDDIT_CLIENT_SECRET = environ.get("REDDIT_CLIENT_SECRET", None)
@@ -16,3 +57,96 @@ REDDIT_USER_AGENT = environ.get("REDDIT_USER_AGENT", None)
 REDDIT_USERNAME = environ.get("REDDIT_USERNAME", None)
 REDDIT_PASSWORD = environ.get("REDDIT_PASSWORD", None)
 
+# Worker counts for the scrape pipeline's download and upload stages.
+SCRAPE_DOWNLOAD_WORKERS = int(environ.get("SCRAPE_DOWNLOAD_WORKERS", 3))
+SCRAPE_UPLOAD_WORKERS = int(environ.get("SCRAPE_UPLOAD_WORKERS", 3))
+# Downloads plus uploads in flight across every scrape in the process.
+SCRAPE_TRANSFER_LIMIT = int(environ.get("SCRAPE_TRANSFER_LIMIT", 0)) or (SCRAPE_DOWNLOAD_WORKERS + SCRAPE_UPLOAD_WORKERS)
+# Concurrent YouTube searches when one scrape covers several games.
+SCRAPE_SEARCH_WORKERS = int(environ.get("SCRAPE_SEARCH_WORKERS", 4))
+# Games scraped by `POST /videos?all_games=true`, one per line.
+VIDEOGAMES_FILE = environ.get("VIDEOGAMES_FILE", GAMES_FILE)
+# Pipe yt-dlp output straight into a resumable GCS upload instead of staging
+# files in ./video_downloads. Piping needs a single-file format; reels only
+# use the video track, so video-only streams are preferred.
+SCRAPE_STREAM_UPLOADS = environ.get("SCRAPE_STREAM_UPLOADS", "false").lower() == "true"
+SCRAPE_STREAM_FORMAT = environ.get("SCRAPE_STREAM_FORMAT", "bestvideo[ext=mp4]/best[ext=mp4]/best")
+YTDLP_BIN = environ.get("YTDLP_BIN", "yt-dlp")
+
+GCS_BUCKET_NAME = environ.get("GCS_BUCKET_NAME", "yt-videos-bucket")
+GCS_UPLOAD_WORKERS = int(environ.get("GCS_UPLOAD_WORKERS", 4))
+# Resumable upload chunk size; GCS requires a multiple of 256 KiB.
+GCS_CHUNK_SIZE = int(environ.get("GCS_CHUNK_SIZE_MB", 16)) * 1024 * 1024
+
+# Trace every request into a Server-Timing header, not just those sending X-Trace.
+METRICS_TRACE = environ.get("METRICS_TRACE", "false").lower() == "true"
+
+# Catalog export/import: rows fetched per cursor batch and upserted per statement.
+EXPORT_BATCH_SIZE = int(environ.get("EXPORT_BATCH_SIZE", 1000))
+IMPORT_BATCH_SIZE = int(environ.get("IMPORT_BATCH_SIZE", 500))
+
+# Background jobs: max running at once per job kind, and how many to keep
+# for polling. Each kind queues separately, so a long render never holds up
+# a scrape; MAX_CONCURRENT_JOBS caps kinds without a setting of their own.
+MAX_CONCURRENT_JOBS = int(environ.get("MAX_CONCURRENT_JOBS", 2))
+MAX_CONCURRENT_SCRAPE_JOBS = int(environ.get("MAX_CONCURRENT_SCRAPE_JOBS", MAX_CONCURRENT_JOBS))
+MAX_CONCURRENT_NARRATE_JOBS = int(environ.get("MAX_CONCURRENT_NARRATE_JOBS", MAX_CONCURRENT_JOBS))
+MAX_CONCURRENT_ANALYZE_JOBS = int(environ.get("MAX_CONCURRENT_ANALYZE_JOBS", MAX_CONCURRENT_JOBS))
+# A render job already spreads its reels over RENDER_WORKERS processes.
+MAX_CONCURRENT_RENDER_JOBS = int(environ.get("MAX_CONCURRENT_RENDER_JOBS", 1))
+JOB_HISTORY_LIMIT = int(environ.get("JOB_HISTORY_LIMIT", 200))
+
+# Warm headless Chrome pool used for YouTube search.
+CHROME_POOL_SIZE = int(environ.get("CHROME_POOL_SIZE", 2))
+CHROME_MAX_USES = int(environ.get("CHROME_MAX_USES", 50))
+CHROME_CHECKOUT_TIMEOUT = float(environ.get("CHROME_CHECKOUT_TIMEOUT", 60))
+
+# "http" parses search results without a browser and falls back to Selenium
+# on failure; "selenium" always renders the page in Chrome.
+YOUTUBE_SEARCH_BACKEND = environ.get("YOUTUBE_SEARCH_BACKEND", "http")
+YOUTUBE_SEARCH_TIMEOUT = float(environ.get("YOUTUBE_SEARCH_TIMEOUT", 10))
+
+# Background ingestion of new multireddit posts into the candidate table.
+# Comma-separated multireddit names; empty disables the poller. Each API
+# worker process runs its own poller, so enable it on one.
+REDDIT_INGEST_MULTIREDDITS = [name.strip() for name in environ.get("REDDIT_INGEST_MULTIREDDITS", "").split(",") if name.strip()]
+REDDIT_INGEST_INTERVAL = float(environ.get("REDDIT_INGEST_INTERVAL", 120))
+# Most posts read per multireddit per poll; bounds the first poll's backfill.
+REDDIT_INGEST_LIMIT = int(environ.get("REDDIT_INGEST_LIMIT", 500))
+REDDIT_INGEST_RETENTION_DAYS = float(environ.get("REDDIT_INGEST_RETENTION_DAYS", 14))
+
+# Reddit API governor: requests held back from each rate-limit window, and
+# the longest a caller waits for the window to reset before getting a 429.
+REDDIT_RATE_RESERVE = int(environ.get("REDDIT_RATE_RESERVE", 5))
+REDDIT_RATE_MAX_WAIT = float(environ.get("REDDIT_RATE_MAX_WAIT", 10))
+
+# Cached GET /posts and GET /videos pages, served with ETags. Writes made
+# through this process invalidate them; the TTL bounds how long writes
+# from other processes (other API workers, scripts) go unseen.
+RESPONSE_CACHE_TTL = float(environ.get("RESPONSE_CACHE_TTL", 30))
+RESPONSE_CACHE_MAX_ENTRIES = int(environ.get("RESPONSE_CACHE_MAX_ENTRIES", 512))
+
+# Cache for multireddit listings served by GET /reddit, in seconds.
+REDDIT_CACHE_TTL = float(environ.get("REDDIT_CACHE_TTL", 300))
+REDDIT_CACHE_STALE_TTL = float(environ.get("REDDIT_CACHE_STALE_TTL", 900))
+REDDIT_CACHE_MAX_ENTRIES = int(environ.get("REDDIT_CACHE_MAX_ENTRIES", 64))
+
+# Reel rendering. Workers default to one ffmpeg process per CPU core.
+FFMPEG_BIN = environ.get("FFMPEG_BIN", "ffmpeg")
+RENDER_WORKERS = int(environ.get("RENDER_WORKERS", 0)) or (cpu_count() or 1)
+RENDER_MAX_SECONDS = float(environ.get("RENDER_MAX_SECONDS", 60))
+RENDER_PRESET = environ.get("RENDER_PRESET", "veryfast")
+
+# Best-segment analysis: worker processes and segments kept per video.
+SEGMENT_WORKERS = int(environ.get("SEGMENT_WORKERS", 0)) or (cpu_count() or 1)
+SEGMENT_TOP_N = int(environ.get("SEGMENT_TOP_N", 3))
+
+# On-disk cache for render intermediates (fetched clips, segments, audio).
+ARTIFACT_CACHE_DIR = environ.get("ARTIFACT_CACHE_DIR", "./artifact_cache")
+ARTIFACT_CACHE_MAX_BYTES = int(float(environ.get("ARTIFACT_CACHE_MAX_GB", 20)) * 1024 ** 3)
+
+# Offline text-to-speech (espeak-ng compatible CLI).
+TTS_COMMAND = environ.get("TTS_COMMAND", "espeak-ng")
+TTS_VOICE = environ.get("TTS_VOICE", "en-us")
+TTS_RATE = int(environ.get("TTS_RATE", 175))
+TTS_WORKERS = int(environ.get("TTS_WORKERS", 0)) or (cpu_count() or 1)
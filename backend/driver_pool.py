@@ -0,0 +1,175 @@
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from selenium import webdriver  # type: ignore
+from selenium.webdriver.chrome.options import Options  # type: ignore
+from selenium.common.exceptions import WebDriverException  # type: ignore
+
+from config import CHROME_CHECKOUT_TIMEOUT, CHROME_MAX_USES, CHROME_POOL_SIZE
+from metrics import stage, timed
+
+
+@timed("chrome.start")
+def new_chrome_driver() -> webdriver.Chrome:
+    """
+    Start a headless Chrome with the options used for YouTube scraping.
+
+    :return: A new Chrome WebDriver.
+    """
+    option = Options()
+    option.add_argument("--disable-extensions")
+    option.add_argument("--disable-infobars")
+    option.add_argument("--start-maximized")
+    option.add_argument("--disable-notifications")
+    option.add_argument('--headless')
+    option.add_argument('--no-sandbox')
+    option.add_argument('--disable-dev-shm-usage')
+    return webdriver.Chrome(options=option)
+
+
+class _PooledDriver:
+    def __init__(self, driver: webdriver.Chrome):
+        self.driver = driver
+        self.uses = 0
+
+
+class DriverPool:
+    """
+    Bounded pool of warm WebDrivers.
+
+    At most `size` drivers are alive at once. A driver is health checked on
+    checkout, and quit instead of returned once it has served `max_uses`
+    checkouts or raised a WebDriverException while checked out.
+    """
+
+    def __init__(
+        self,
+        size: int = CHROME_POOL_SIZE,
+        max_uses: int = CHROME_MAX_USES,
+        factory: Callable[[], webdriver.Chrome] = new_chrome_driver,
+    ):
+        self.size = size
+        self.max_uses = max_uses
+        self._factory = factory
+        self._idle: list[_PooledDriver] = []
+        self._total = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def start(self) -> None:
+        """
+        Pre-warm the pool up to `size` drivers. Failures are logged, not
+        raised, so a missing Chrome does not stop the app from starting.
+        """
+        while True:
+            with self._cond:
+                if self._closed or self._total >= self.size:
+                    return
+                self._total += 1
+            try:
+                pooled = _PooledDriver(self._factory())
+            except Exception as ex:
+                logging.error("Failed to start pooled Chrome driver: %s", ex)
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                return
+            with self._cond:
+                self._idle.append(pooled)
+                self._cond.notify()
+
+    @contextmanager
+    def checkout(self, timeout: float = CHROME_CHECKOUT_TIMEOUT) -> Iterator[webdriver.Chrome]:
+        """
+        Borrow a driver for the duration of the `with` block.
+
+        :param timeout: Seconds to wait for a free driver.
+        :raises TimeoutError: If no driver frees up in time.
+        """
+        with stage("chrome.checkout"):
+            pooled = self._acquire(timeout)
+        crashed = False
+        try:
+            yield pooled.driver
+        except WebDriverException:
+            crashed = True
+            raise
+        finally:
+            pooled.uses += 1
+            self._release(pooled, discard=crashed or pooled.uses >= self.max_uses)
+
+    def close(self) -> None:
+        """Quit all idle drivers. Checked-out drivers are quit on return."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            self._quit(pooled)
+
+    def _acquire(self, timeout: float) -> _PooledDriver:
+        with self._cond:
+            has_slot = self._cond.wait_for(
+                lambda: self._closed or self._idle or self._total < self.size,
+                timeout=timeout,
+            )
+            if self._closed:
+                raise RuntimeError("Driver pool is closed.")
+            if not has_slot:
+                raise TimeoutError("Timed out waiting for a Chrome driver.")
+            # Reuse the most recently returned driver first so that idle
+            # extras age out through max_uses instead of all staying warm.
+            pooled = self._idle.pop() if self._idle else None
+            if pooled is None:
+                self._total += 1
+
+        if pooled is not None and self._is_healthy(pooled):
+            return pooled
+        if pooled is not None:
+            self._quit(pooled)
+        try:
+            return _PooledDriver(self._factory())
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, pooled: _PooledDriver, discard: bool) -> None:
+        if not discard:
+            try:
+                # Drop the previous page so idle drivers hold little memory.
+                pooled.driver.get("about:blank")
+            except Exception:
+                discard = True
+
+        with self._cond:
+            if discard or self._closed:
+                self._total -= 1
+            else:
+                self._idle.append(pooled)
+            self._cond.notify()
+
+        if discard or self._closed:
+            self._quit(pooled)
+
+    @staticmethod
+    def _is_healthy(pooled: _PooledDriver) -> bool:
+        try:
+            pooled.driver.execute_script("return 1;")
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(pooled: _PooledDriver) -> None:
+        try:
+            pooled.driver.quit()
+        except Exception as ex:
+            logging.warning("Failed to quit Chrome driver: %s", ex)
+
+
+driver_pool = DriverPool()
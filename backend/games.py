@@ -0,0 +1,28 @@
+import os
+
+
+# Games listed for scraping, one per line.
+GAMES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "videogames.txt")
+
+_games_cache: dict[str, tuple[float, list[str]]] = {}
+
+
+def read_games(path: str = GAMES_FILE) -> list[str]:
+    """
+    Games listed in a file, one per line. The file is only read again
+    after it changes.
+
+    Lines are written in URL query style ("Grand+Theft+Auto"), so '+' is
+    read as a space.
+
+    :param path: Path of the games file.
+    :return: Game names, without duplicates, in file order.
+    :raises OSError: If the file can't be read.
+    """
+    mtime = os.path.getmtime(path)
+    cached = _games_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path) as games_file:
+            games = [line.strip().replace("+", " ") for line in games_file if line.strip()]
+        cached = _games_cache[path] = (mtime, list(dict.fromkeys(games)))
+    return cached[1]
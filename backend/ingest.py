@@ -0,0 +1,202 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, exists, or_
+from sqlmodel import Session, delete, select
+
+from config import (
+    REDDIT_INGEST_INTERVAL,
+    REDDIT_INGEST_LIMIT,
+    REDDIT_INGEST_MULTIREDDITS,
+    REDDIT_INGEST_RETENTION_DAYS,
+    REDDIT_USERNAME,
+    async_session,
+    engine,
+)
+from metrics import stage
+from models import IngestCursor, Post, PostCandidate
+from reddit_client import reddit_client
+from reddit_posts import post_fields
+from util import upsert_rows
+
+
+def ingest_multireddit(name: str, limit: int = REDDIT_INGEST_LIMIT) -> int:
+    """
+    Store posts submitted to a multireddit since the last poll as candidates.
+
+    The "new" listing is read newest first and only until it reaches the
+    stored cursor, so a quiet multireddit costs one small request. PRAW
+    pages lazily, and stopping early skips the remaining pages.
+
+    :param name: Name of the multireddit.
+    :param limit: Most posts to read; bounds the first poll's backfill.
+    :return: Number of posts upserted.
+    """
+    with Session(engine) as session:
+        cursor = session.get(IngestCursor, name)
+    # Posts older than the retention window would only be pruned again.
+    oldest = time.time() - REDDIT_INGEST_RETENTION_DAYS * 86400
+    if cursor is not None:
+        oldest = max(oldest, cursor.newest_created_utc)
+
+    def read_new(reddit) -> list[dict]:
+        rows = []
+        for submission in reddit.multireddit(redditor=REDDIT_USERNAME, name=name).new(limit=limit):
+            # Posts sharing the cursor's second are re-read; the upsert dedupes them.
+            if submission.created_utc < oldest:
+                break
+            rows.append({**post_fields(submission), "multireddit": name, "created_utc": submission.created_utc})
+        return rows
+
+    with stage("reddit.ingest"):
+        rows = reddit_client.call(read_new, key=("new", name, limit))
+
+    if not rows:
+        return 0
+
+    # Everything read is at least as new as the old cursor.
+    latest = max(rows, key=lambda row: row["created_utc"])
+    cursor_row = {
+        "multireddit": name,
+        "newest_created_utc": latest["created_utc"],
+        "newest_id": latest["id"],
+        "polled_at": time.time(),
+    }
+    with Session(engine) as session:
+        with stage("db.ingest_upsert"):
+            upsert_rows(session, PostCandidate, rows, ["id"])
+            upsert_rows(session, IngestCursor, [cursor_row], ["multireddit"])
+            session.commit()
+    return len(rows)
+
+
+def prune_candidates(retention_days: float = REDDIT_INGEST_RETENTION_DAYS) -> int:
+    """
+    Delete candidates created more than `retention_days` ago.
+
+    :return: Number of candidates deleted.
+    """
+    cutoff = time.time() - retention_days * 86400
+    with Session(engine) as session:
+        deleted = session.exec(delete(PostCandidate).where(PostCandidate.created_utc < cutoff)).rowcount
+        session.commit()
+    return deleted
+
+
+class RedditIngester:
+    """
+    Background thread polling multireddits for new posts every `interval`
+    seconds. A failing multireddit is logged and retried on the next poll.
+    """
+
+    def __init__(self, multireddits: list[str] = REDDIT_INGEST_MULTIREDDITS, interval: float = REDDIT_INGEST_INTERVAL):
+        self.multireddits = multireddits
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._status: dict[str, dict] = {}
+
+    def start(self) -> None:
+        """Start polling. Does nothing when no multireddits are configured."""
+        if not self.multireddits or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="reddit-ingest", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stop polling and wait for the current poll to finish."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def poll(self) -> None:
+        """Poll every multireddit once, then prune old candidates."""
+        for name in self.multireddits:
+            try:
+                ingested = ingest_multireddit(name)
+                self._report(name, ingested=ingested, error=None)
+            except Exception as ex:
+                logging.error("Failed to ingest multireddit '%s': %s", name, ex)
+                self._report(name, error=str(ex))
+        try:
+            prune_candidates()
+        except Exception as ex:
+            logging.error("Failed to prune post candidates: %s", ex)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.poll()
+            self._stop.wait(self.interval)
+
+    def _report(self, name: str, **fields) -> None:
+        with self._lock:
+            self._status.setdefault(name, {}).update(fields, checked_at=time.time())
+
+    def status(self) -> dict:
+        """Whether the poller runs, and each multireddit's last poll result."""
+        with self._lock:
+            return {
+                "running": self._thread is not None,
+                "interval": self.interval,
+                "multireddits": {name: dict(fields) for name, fields in self._status.items()},
+            }
+
+
+reddit_ingester = RedditIngester()
+
+
+def _parse_cursor(cursor: str) -> tuple[float, str]:
+    created_utc, _, post_id = cursor.partition(":")
+    try:
+        return float(created_utc), post_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+async def get_candidates_db(
+    limit: int = 25,
+    cursor: Optional[str] = None,
+    multireddit: Optional[str] = None,
+    include_saved: bool = False,
+) -> tuple[list[PostCandidate], Optional[str]]:
+    """
+    Retrieve ingested candidate posts, newest first.
+
+    :param limit: Number of candidates to retrieve.
+    :param cursor: Return candidates after this one (the previous page's `next_cursor`).
+    :param multireddit: Only candidates from this multireddit.
+    :param include_saved: Include candidates already saved as posts.
+    :return: A list of PostCandidate objects, and the cursor for the next page (None on the last page).
+    """
+    statement = select(PostCandidate)
+    if multireddit is not None:
+        statement = statement.where(PostCandidate.multireddit == multireddit)
+    if not include_saved:
+        statement = statement.where(~exists().where(Post.id == PostCandidate.id))
+    if cursor is not None:
+        created_utc, post_id = _parse_cursor(cursor)
+        statement = statement.where(
+            or_(
+                PostCandidate.created_utc < created_utc,
+                and_(PostCandidate.created_utc == created_utc, PostCandidate.id < post_id),
+            )
+        )
+    # Fetch one extra row to know whether another page exists.
+    statement = statement.order_by(PostCandidate.created_utc.desc(), PostCandidate.id.desc()).limit(limit + 1)
+
+    async with async_session() as session:
+        try:
+            candidates = (await session.exec(statement)).all()
+        except Exception as ex:
+            logging.error("get_candidates_db error: %s", ex)
+            raise HTTPException(status_code=500, detail="Failed to retrieve candidates.")
+    next_cursor = None
+    if len(candidates) > limit:
+        last = candidates[limit - 1]
+        next_cursor = f"{last.created_utc}:{last.id}"
+    return candidates[:limit], next_cursor
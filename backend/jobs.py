@@ -0,0 +1,166 @@
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+from config import (
+    JOB_HISTORY_LIMIT,
+    MAX_CONCURRENT_ANALYZE_JOBS,
+    MAX_CONCURRENT_JOBS,
+    MAX_CONCURRENT_NARRATE_JOBS,
+    MAX_CONCURRENT_RENDER_JOBS,
+    MAX_CONCURRENT_SCRAPE_JOBS,
+)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class Job:
+    """
+    Progress record for a single background job.
+
+    `stage` tracks the job as a whole, while `items` tracks per-item
+    progress (e.g. one entry per video link).
+    """
+
+    def __init__(self, kind: str, params: dict):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = "queued"
+        self.stage = "queued"
+        self.items: dict[str, dict] = {}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = _now()
+        self.updated_at = self.created_at
+        self._lock = threading.Lock()
+
+    def report(self, stage: Optional[str] = None, item: Optional[str] = None, **fields) -> None:
+        """
+        Record progress. Safe to call from worker threads.
+
+        :param stage: New stage for the job as a whole.
+        :param item: Key of the item to update, e.g. a video link.
+        :param fields: Fields to merge into the item's progress record.
+        """
+        with self._lock:
+            if stage is not None:
+                self.stage = stage
+            if item is not None:
+                self.items.setdefault(item, {}).update(fields)
+            self.updated_at = _now()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "params": self.params,
+                "status": self.status,
+                "stage": self.stage,
+                "items": {key: dict(value) for key, value in self.items.items()},
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "updated_at": self.updated_at,
+            }
+
+
+class JobStore:
+    """
+    In-process job queue and registry.
+
+    Each job kind has its own queue and runs at most `limits[kind]` jobs at
+    once (`max_concurrent` for kinds without a limit), so slow kinds don't
+    hold up the others. Only the `history_limit` most recent jobs are kept
+    for status polling.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT_JOBS,
+        limits: Optional[dict[str, int]] = None,
+        history_limit: int = JOB_HISTORY_LIMIT,
+    ):
+        self._max_concurrent = max_concurrent
+        self._limits = limits or {}
+        self._executors: dict[str, ThreadPoolExecutor] = {}
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._history_limit = history_limit
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[..., Any], **params) -> Job:
+        """
+        Queue `fn(job=job, **params)` to run in the background.
+
+        :param kind: Short name of the job type, e.g. "scrape_videos".
+        :param fn: Callable doing the work. Its return value becomes the job result.
+        :param params: Keyword arguments passed to `fn`, echoed in the job status.
+        :return: The queued Job.
+        """
+        job = Job(kind=kind, params=params)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+            executor = self._executors.get(kind)
+            if executor is None:
+                executor = self._executors[kind] = ThreadPoolExecutor(
+                    max_workers=self._limits.get(kind, self._max_concurrent),
+                    thread_name_prefix=f"job-{kind}",
+                )
+        executor.submit(self._run, job, fn, params)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executors = list(self._executors.values())
+        for executor in executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: Job, fn: Callable[..., Any], params: dict) -> None:
+        with job._lock:
+            job.status = "running"
+            job.updated_at = _now()
+        try:
+            result = fn(job=job, **params)
+            with job._lock:
+                job.result = result
+                job.status = "succeeded"
+                job.stage = "done"
+                job.updated_at = _now()
+        except Exception as ex:
+            logging.error("Job %s (%s) failed: %s", job.id, job.kind, ex)
+            with job._lock:
+                job.error = getattr(ex, "detail", None) or str(ex)
+                job.status = "failed"
+                job.updated_at = _now()
+
+    def _prune(self) -> None:
+        # Drop the oldest finished jobs once over the history limit.
+        overflow = len(self._jobs) - self._history_limit
+        if overflow <= 0:
+            return
+        for job_id in list(self._jobs):
+            if overflow <= 0:
+                break
+            if self._jobs[job_id].status in ("succeeded", "failed"):
+                del self._jobs[job_id]
+                overflow -= 1
+
+
+job_store = JobStore(limits={
+    "scrape_videos": MAX_CONCURRENT_SCRAPE_JOBS,
+    "narrate_posts": MAX_CONCURRENT_NARRATE_JOBS,
+    "analyze_videos": MAX_CONCURRENT_ANALYZE_JOBS,
+    "render_reels": MAX_CONCURRENT_RENDER_JOBS,
+})
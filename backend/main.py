@@ -1,45 +1,156 @@
-from typing import Annotated
+from tempfile import SpooledTemporaryFile
+from typing import Annotated, Literal, Optional
 
-from fastapi import FastAPI, Path, Query
-from fastapi.concurrency import asynccontextmanager
+from fastapi import Body, FastAPI, HTTPException, Path, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.concurrency import asynccontextmanager, run_in_threadpool
 
-from models import Post
+from models import Post, ReelPair, Video
 from reddit_posts import (
     get_posts_from_subreddit,
     patch_post_audio_db,
     save_post_db,
+    save_posts_batch_db,
     get_saved_posts_db,
+    search_posts_db,
     delete_saved_post_db,
+    post_filters,
+    post_matches,
     use_post_db,
 )
+from artifact_cache import get_artifact_cache
+from captions import post_captions
+from catalog import MEDIA_TYPES, export_catalog, import_catalog
+from config import YOUTUBE_SEARCH_BACKEND, async_engine
+from driver_pool import driver_pool
+from ingest import get_candidates_db, reddit_ingester
+from reddit_client import reddit_client
+from response_cache import PageScope, post_pages, video_pages
+from jobs import job_store
+from metrics import observe_request, render_metrics
+from segments import analyze_videos, get_video_segments_db
+from tts import narrate_posts
 from util import create_db_and_tables
-from youtube_scrapper import get_videos_db, scrape_videos, save_video_to_db
+from video_generator import load_render_jobs, render_reels
+from youtube_scrapper import get_videos_db, load_games, scrape_and_save_videos
 
 # Metadata for OpenAPI docs.
 tags_metadata = [
     {"name": "Reddit", "description": "Routes for handling reddit posts."},
     {"name": "Posts", "description": "Routes for posts."},
     {"name": "Videos", "description": "Video related routes."},
+    {"name": "Reels", "description": "Rendering reels from posts and videos."},
+    {"name": "Metrics", "description": "Prometheus metrics for the API and pipeline stages."},
 ]
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Load the Database
     create_db_and_tables()
+    # Start Chrome ahead of the first scrape when searches need it.
+    if YOUTUBE_SEARCH_BACKEND == "selenium":
+        await run_in_threadpool(driver_pool.start)
+    # Poll multireddits for new posts when REDDIT_INGEST_MULTIREDDITS is set.
+    reddit_ingester.start()
     yield
+    await run_in_threadpool(reddit_ingester.close)
+    job_store.shutdown()
+    await async_engine.dispose()
+    await run_in_threadpool(driver_pool.close)
 
 app = FastAPI(openapi_tags=tags_metadata, lifespan=lifespan)
+app.middleware("http")(observe_request)
+
+
+def _job_status(job_id: str) -> dict:
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return {"job": job.to_dict()}
+
+
+def _export_response(rows, name: str, export_format: str) -> StreamingResponse:
+    return StreamingResponse(
+        rows,
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{export_format}"'},
+    )
+
+
+async def _spool_body(request: Request) -> SpooledTemporaryFile:
+    # Parquet is read from its footer, so uploads are spooled rather than
+    # parsed as they arrive; large ones spill to disk.
+    body = SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+    async for chunk in request.stream():
+        body.write(chunk)
+    body.seek(0)
+    return body
 
 # Reddit Routes
 
 @app.get("/reddit", tags=["Reddit"])
-def get_posts(
+async def get_posts(
     limit: Annotated[int, Query(title="Amount of posts to retrieve.")] = 15,
     subreddit: Annotated[str, Query(title="Subreddit to search for posts.")] = "Autoreel",
+    refresh: Annotated[bool, Query(title="Bypass the listing cache.")] = False,
 ):
-    posts = get_posts_from_subreddit(subreddit=subreddit, limit=limit)
+    posts = await get_posts_from_subreddit(subreddit=subreddit, limit=limit, refresh=refresh)
     return {"posts": posts}
 
+@app.get("/reddit/limits", tags=["Reddit"])
+def get_reddit_limits():
+    """
+    Reddit API quota as last reported by Reddit, and requests in flight.
+
+    :return: The shared rate governor's state.
+    """
+    return {"limits": reddit_client.governor.status()}
+
+@app.get("/reddit/candidates", tags=["Reddit"])
+async def get_candidate_posts(
+    limit: Annotated[int, Query(title="Amount of candidates to retrieve.", ge=1, le=500)] = 25,
+    cursor: Annotated[Optional[str], Query(title="Cursor from the previous page's next_cursor.")] = None,
+    multireddit: Annotated[Optional[str], Query(title="Filter by multireddit.")] = None,
+    include_saved: Annotated[bool, Query(title="Include candidates already saved as posts.")] = False,
+):
+    """
+    Browse posts the ingest poller found, newest first, without calling Reddit.
+
+    :param limit: Number of candidates to retrieve.
+    :param cursor: Cursor from the previous page's `next_cursor`.
+    :param multireddit: Only candidates from this multireddit.
+    :param include_saved: Include candidates already saved as posts.
+    :return: A list of candidates, and the next page's cursor.
+    """
+    candidates, next_cursor = await get_candidates_db(
+        limit=limit,
+        cursor=cursor,
+        multireddit=multireddit,
+        include_saved=include_saved,
+    )
+    return {"candidates": candidates, "next_cursor": next_cursor}
+
+@app.get("/reddit/ingest", tags=["Reddit"])
+def get_ingest_status():
+    """
+    Status of the multireddit ingest poller.
+
+    :return: Whether it runs, and each multireddit's last poll result.
+    """
+    return {"ingest": reddit_ingester.status()}
+
+@app.post("/reddit/ingest", tags=["Reddit"])
+def run_ingest():
+    """
+    Poll the configured multireddits now, without waiting for the next cycle.
+
+    :return: The poller's status after the poll.
+    """
+    if not reddit_ingester.multireddits:
+        raise HTTPException(status_code=400, detail="No multireddits configured in REDDIT_INGEST_MULTIREDDITS.")
+    reddit_ingester.poll()
+    return {"ingest": reddit_ingester.status()}
+
 # Post Routes
 
 @app.post("/posts", tags=["Posts"])
@@ -47,34 +158,196 @@ def save_post(post_id: str):
     post = save_post_db(post_id=post_id)
     return {"post": post}
 
+@app.post("/posts/batch", tags=["Posts"])
+def save_posts_batch(
+    post_ids: Annotated[
+        list[str],
+        Body(title="IDs of the posts to save.", embed=True, max_length=1000),
+    ],
+):
+    """
+    Save many posts at once. Duplicates are skipped instead of failing.
+
+    :param post_ids: Reddit post IDs.
+    :return: The saved, duplicate, and not-found post IDs.
+    """
+    return save_posts_batch_db(post_ids=post_ids)
+
+@app.post("/posts/audio", tags=["Posts"])
+def narrate_saved_posts(
+    post_ids: Annotated[
+        list[str],
+        Body(title="IDs of the posts to narrate.", embed=True, max_length=1000),
+    ],
+    background: Annotated[
+        bool,
+        Query(title="Queue the narration as a job and return its id immediately."),
+    ] = False,
+):
+    """
+    Generate narration audio for saved posts with the offline TTS engine,
+    upload it, and set each post's audio_file_url.
+
+    :param post_ids: IDs of saved posts.
+    :param background: Return a job id instead of waiting for the audio.
+    :return: Audio paths per post and any failures, or the job id.
+    """
+    if background:
+        job = job_store.submit("narrate_posts", narrate_posts, post_ids=post_ids)
+        return {"job_id": job.id, "status_url": f"/posts/audio/jobs/{job.id}"}
+
+    return narrate_posts(post_ids=post_ids)
+
+@app.get("/posts/audio/jobs/{job_id}", tags=["Posts"])
+def get_narration_job(job_id: Annotated[str, Path(title="ID of the narration job.")]):
+    """
+    Retrieve the status of a background narration job, with per-post progress.
+
+    :param job_id: ID returned by `POST /posts/audio?background=true`.
+    :return: The job's status record.
+    """
+    return _job_status(job_id)
+
 @app.get("/posts", tags=["Posts"])
-def get_saved_posts(
-    limit: Annotated[int, Query(title="Amount of posts to retrieve.")] = 15,
-    offset: Annotated[int, Query(title="Pagination offset.")] = 0,
+async def get_saved_posts(
+    request: Request,
+    limit: Annotated[int, Query(title="Amount of posts to retrieve.", ge=1, le=500)] = 15,
+    offset: Annotated[int, Query(title="Pagination offset.", ge=0)] = 0,
+    cursor: Annotated[Optional[str], Query(title="Cursor from the previous page's next_cursor.")] = None,
+    used: Annotated[Optional[bool], Query(title="Filter by used status.")] = None,
+    subreddit: Annotated[Optional[str], Query(title="Filter by subreddit.")] = None,
+    has_audio: Annotated[Optional[bool], Query(title="Filter by whether audio exists.")] = None,
 ):
-    posts = get_saved_posts_db(offset=offset, limit=limit)
-    return {"posts": posts}
+    """
+    Retrieve saved posts, ordered by ID, with pagination and filters.
+
+    Pages are cached until a write touches them and carry an ETag; send it
+    back in `If-None-Match` to get an empty 304 while the page is unchanged.
+
+    :return: A list of posts, and the next page's cursor.
+    """
+    async def load():
+        posts, next_cursor = await get_saved_posts_db(
+            offset=offset,
+            limit=limit,
+            cursor=cursor,
+            used=used,
+            subreddit=subreddit,
+            has_audio=has_audio,
+        )
+        scope = PageScope(
+            keys=[post.id for post in posts],
+            lower=cursor,
+            upper=next_cursor,
+            matches=lambda post: post_matches(post, used=used, subreddit=subreddit, has_audio=has_audio),
+        )
+        return {"posts": posts, "next_cursor": next_cursor}, scope
+
+    return await post_pages.respond(request, (limit, offset, cursor, used, subreddit, has_audio), load)
+
+@app.get("/posts/search", tags=["Posts"])
+async def search_saved_posts(
+    q: Annotated[str, Query(title="Words to search post titles and content for.", min_length=1, max_length=200)],
+    limit: Annotated[int, Query(title="Amount of results to retrieve.", ge=1, le=100)] = 15,
+    offset: Annotated[int, Query(title="Pagination offset.", ge=0)] = 0,
+    used: Annotated[Optional[bool], Query(title="Filter by used status.")] = None,
+    subreddit: Annotated[Optional[str], Query(title="Filter by subreddit.")] = None,
+    has_audio: Annotated[Optional[bool], Query(title="Filter by whether audio exists.")] = None,
+):
+    """
+    Full-text search over saved posts, ranked by relevance.
+
+    :param q: Search text; every word must match.
+    :param limit: Number of results to retrieve.
+    :param offset: Pagination offset.
+    :return: Matching posts with their score and a highlighted snippet.
+    """
+    results = await search_posts_db(
+        query=q,
+        limit=limit,
+        offset=offset,
+        used=used,
+        subreddit=subreddit,
+        has_audio=has_audio,
+    )
+    return {"results": results}
+
+@app.get("/posts/export", tags=["Posts"])
+def export_posts(
+    format: Annotated[Literal["ndjson", "parquet"], Query(title="File format.")] = "ndjson",
+    used: Annotated[Optional[bool], Query(title="Filter by used status.")] = None,
+    subreddit: Annotated[Optional[str], Query(title="Filter by subreddit.")] = None,
+    has_audio: Annotated[Optional[bool], Query(title="Filter by whether audio exists.")] = None,
+):
+    """
+    Stream every saved post, ordered by ID, as NDJSON or Parquet.
+
+    :param format: "ndjson" or "parquet" (needs pyarrow).
+    :return: The file, streamed from a database cursor.
+    """
+    rows = export_catalog(Post, format, post_filters(used=used, subreddit=subreddit, has_audio=has_audio))
+    return _export_response(rows, "posts", format)
+
+@app.post("/posts/import", tags=["Posts"])
+async def import_posts(
+    request: Request,
+    format: Annotated[Literal["ndjson", "parquet"], Query(title="File format of the request body.")] = "ndjson",
+):
+    """
+    Insert or update posts from an NDJSON or Parquet request body, such as
+    the output of `GET /posts/export`.
+
+    :param format: "ndjson" or "parquet" (needs pyarrow).
+    :return: Counts of imported and rejected rows, with the first errors.
+    """
+    body = await _spool_body(request)
+    with body:
+        return await run_in_threadpool(import_catalog, Post, format, body)
 
 @app.delete("/posts/{post_id}", tags=["Posts"])
-def delete_saved_post(post_id: Annotated[str, Path(title="ID of the post to delete.")]):
-    post = delete_saved_post_db(post_id=post_id)
+async def delete_saved_post(post_id: Annotated[str, Path(title="ID of the post to delete.")]):
+    post = await delete_saved_post_db(post_id=post_id)
     return {"deleted": post}
 
 @app.patch("/posts/{post_id}", tags=["Posts"])
-def patch_audio_saved_post(
+async def patch_audio_saved_post(
     post_id: Annotated[str, Path(title="ID of the post to update audio url on.")],
     post: Post
 ):
-    patched_post = patch_post_audio_db(post_id=post_id, post=post)
+    patched_post = await patch_post_audio_db(post_id=post_id, post=post)
     return {"patched": patched_post}
 
 @app.patch("/posts/{post_id}/use", tags=["Posts"])
-def patch_used_post(
+async def patch_used_post(
     post_id: Annotated[str, Path(title="ID of the post to change used status.")]
 ):
-    used_post = use_post_db(post_id=post_id)
+    used_post = await use_post_db(post_id=post_id)
     return {"used": used_post}
 
+@app.get("/posts/{post_id}/captions", tags=["Posts"], response_class=PlainTextResponse)
+def get_post_captions(
+    post_id: Annotated[str, Path(title="ID of the narrated post.")],
+    format: Annotated[Literal["srt", "ass"], Query(title="Subtitle format.")] = "srt",
+    level: Annotated[Literal["word", "sentence"], Query(title="One cue per word group or per sentence.")] = "word",
+    words_per_cue: Annotated[int, Query(title="Words shown at once at word level.", ge=1, le=10)] = 3,
+):
+    """
+    Time the post's text against its narration audio and return subtitles.
+
+    :param post_id: ID of a saved post with audio.
+    :param format: "srt" or "ass".
+    :param level: "word" or "sentence".
+    :param words_per_cue: Words per cue at word level.
+    :return: The subtitle file.
+    """
+    captions = post_captions(post_id=post_id, caption_format=format, level=level, words_per_cue=words_per_cue)
+    media_type = "application/x-subrip" if format == "srt" else "text/x-ssa"
+    return PlainTextResponse(
+        captions,
+        media_type=media_type,
+        headers={"Content-Disposition": f'inline; filename="{post_id}.{format}"'},
+    )
+
 # Video Routes
 
 @app.post("/videos", tags=["Videos"])
@@ -85,34 +358,205 @@ def download_and_save_videos(
             title="Game to download footage of.",
         ),
     ] = "",
+    games: Annotated[
+        Optional[list[str]],
+        Query(title="Games to download footage of, searched concurrently; overrides `game`.", max_length=200),
+    ] = None,
+    all_games: Annotated[
+        bool,
+        Query(title="Download footage of every game in the games file; overrides `games`."),
+    ] = False,
+    background: Annotated[
+        bool,
+        Query(title="Queue the scrape as a job and return its id immediately."),
+    ] = False,
 ):  
-    combined_info = scrape_videos(game=game)
-
-    created_videos = []
-    for item in combined_info:
-        video_json = save_video_to_db(
-            title=item["title"],
-            file_path=item["gcs_path"],
-            video_url=item["link"]
-        )
-        created_videos.append(video_json)
+    """
+    Search, download and save gameplay footage for one or more games.
+    Videos found for several games are only downloaded once.
+
+    :param game: Game to download footage of.
+    :param games: Several games to download footage of.
+    :param all_games: Use every game in the games file.
+    :param background: Queue the scrape as a job.
+    :return: The scrape result, or the job's id and status URL.
+    """
+    if all_games:
+        selected = load_games()
+    else:
+        selected = list(dict.fromkeys(name.strip() for name in games)) if games else [game]
+
+    if background:
+        job = job_store.submit("scrape_videos", scrape_and_save_videos, games=selected)
+        return {"job_id": job.id, "status_url": f"/videos/jobs/{job.id}"}
 
-    return {
-        "downloaded": [x["gcs_path"] for x in combined_info],
-        "saved": created_videos,
-    }
+    return scrape_and_save_videos(games=selected)
+
+@app.get("/videos/jobs/{job_id}", tags=["Videos"])
+def get_video_job(job_id: Annotated[str, Path(title="ID of the scrape job.")]):
+    """
+    Retrieve the status of a background scrape job, with per-video progress.
+
+    :param job_id: ID returned by `POST /videos?background=true`.
+    :return: The job's status record.
+    """
+    return _job_status(job_id)
 
 @app.get("/videos", tags=["Videos"])
-def get_all_videos(
-    limit: Annotated[int, Query(title="Amount of videos to retrieve.")] = 15,
-    offset: Annotated[int, Query(title="Pagination offset.")] = 0,
+async def get_all_videos(
+    request: Request,
+    limit: Annotated[int, Query(title="Amount of videos to retrieve.", ge=1, le=500)] = 15,
+    offset: Annotated[int, Query(title="Pagination offset.", ge=0)] = 0,
+    cursor: Annotated[Optional[int], Query(title="Cursor from the previous page's next_cursor.")] = None,
 ):
     """
     Retrieve all saved videos in the database, with pagination.
 
     :param limit: Number of videos to retrieve.
     :param offset: Pagination offset.
-    :return: A list of video records.
+    :param cursor: Cursor from the previous page's `next_cursor`.
+    :return: A list of video records, and the next page's cursor. Cached
+        with an ETag like `GET /posts`.
+    """
+    async def load():
+        videos, next_cursor = await get_videos_db(offset=offset, limit=limit, cursor=cursor)
+        scope = PageScope(
+            keys=[video.id for video in videos],
+            lower=cursor,
+            upper=next_cursor,
+            matches=lambda video: True,
+        )
+        return {"videos": videos, "next_cursor": next_cursor}, scope
+
+    return await video_pages.respond(request, (limit, offset, cursor), load)
+
+@app.get("/videos/export", tags=["Videos"])
+def export_videos(
+    format: Annotated[Literal["ndjson", "parquet"], Query(title="File format.")] = "ndjson",
+):
+    """
+    Stream every saved video, ordered by ID, as NDJSON or Parquet.
+
+    :param format: "ndjson" or "parquet" (needs pyarrow).
+    :return: The file, streamed from a database cursor.
+    """
+    return _export_response(export_catalog(Video, format), "videos", format)
+
+@app.post("/videos/import", tags=["Videos"])
+async def import_videos(
+    request: Request,
+    format: Annotated[Literal["ndjson", "parquet"], Query(title="File format of the request body.")] = "ndjson",
+):
+    """
+    Insert or update videos from an NDJSON or Parquet request body, such as
+    the output of `GET /videos/export`. Videos are matched by `video_url`;
+    their IDs are assigned by this database.
+
+    :param format: "ndjson" or "parquet" (needs pyarrow).
+    :return: Counts of imported and rejected rows, with the first errors.
+    """
+    body = await _spool_body(request)
+    with body:
+        return await run_in_threadpool(import_catalog, Video, format, body)
+
+@app.post("/videos/segments", tags=["Videos"])
+def analyze_video_segments(
+    video_ids: Annotated[
+        list[int],
+        Body(title="IDs of the videos to analyze.", embed=True, max_length=1000),
+    ],
+    background: Annotated[
+        bool,
+        Query(title="Queue the analysis as a job and return its id immediately."),
+    ] = False,
+):
+    """
+    Score sampled frames of each video for motion and scene changes and
+    store its best segments, which reels then start from by default.
+
+    :param video_ids: IDs of saved videos.
+    :param background: Return a job id instead of waiting for the analysis.
+    :return: Per-video segments or errors, or the job id.
+    """
+    if background:
+        job = job_store.submit("analyze_videos", analyze_videos, video_ids=video_ids)
+        return {"job_id": job.id, "status_url": f"/videos/segments/jobs/{job.id}"}
+
+    return {"videos": analyze_videos(video_ids)}
+
+@app.get("/videos/segments/jobs/{job_id}", tags=["Videos"])
+def get_segment_job(job_id: Annotated[str, Path(title="ID of the analysis job.")]):
+    """
+    Retrieve the status of a background segment analysis job.
+
+    :param job_id: ID returned by `POST /videos/segments?background=true`.
+    :return: The job's status record.
+    """
+    return _job_status(job_id)
+
+@app.get("/videos/{video_id}/segments", tags=["Videos"])
+async def get_video_segments(video_id: Annotated[int, Path(title="ID of the video.")]):
+    """
+    Retrieve a video's analyzed segments, best first.
+
+    :param video_id: ID of the video.
+    :return: The stored segments; empty if the video hasn't been analyzed.
+    """
+    segments = await get_video_segments_db(video_id=video_id)
+    return {"segments": segments}
+
+# Reel Routes
+
+@app.post("/reels", tags=["Reels"])
+def render_reels_route(
+    pairs: Annotated[list[ReelPair], Body(title="Post and video pairs to render.", embed=True)],
+    background: Annotated[
+        bool,
+        Query(title="Queue the render as a job and return its id immediately."),
+    ] = False,
+):
+    """
+    Render a vertical reel for every (post, video) pair, concurrently on a
+    CPU process pool, and upload them to GCS under "reels/".
+
+    :param pairs: Posts (with audio) and videos to combine.
+    :param background: Return a job id instead of waiting for the renders.
+    :return: Per-reel GCS paths or errors, or the job id.
+    """
+    pair_dicts = [pair.model_dump() for pair in pairs]
+    if background:
+        # Fail fast on unknown ids rather than inside the job.
+        load_render_jobs(pair_dicts)
+        job = job_store.submit("render_reels", render_reels, pairs=pair_dicts)
+        return {"job_id": job.id, "status_url": f"/reels/jobs/{job.id}"}
+
+    return {"reels": render_reels(pair_dicts)}
+
+@app.get("/reels/cache", tags=["Reels"])
+def get_render_cache_stats():
+    """
+    Report usage and hit/miss rates of the render artifact cache.
+
+    :return: Entry count, bytes used and hit/miss counts.
+    """
+    return {"cache": get_artifact_cache().stats()}
+
+@app.get("/reels/jobs/{job_id}", tags=["Reels"])
+def get_reel_job(job_id: Annotated[str, Path(title="ID of the render job.")]):
+    """
+    Retrieve the status of a background render job, with per-reel progress.
+
+    :param job_id: ID returned by `POST /reels?background=true`.
+    :return: The job's status record.
+    """
+    return _job_status(job_id)
+
+# Metrics Routes
+
+@app.get("/metrics", tags=["Metrics"])
+def get_metrics():
+    """
+    Per-stage timing histograms, byte counts, cache hit rates, error
+    counters and request latency, in Prometheus text format.
     """
-    videos = get_videos_db(offset=offset, limit=limit)
-    return {"videos": videos}
\ No newline at end of file
+    return render_metrics()
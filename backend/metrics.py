@@ -0,0 +1,177 @@
+import functools
+import inspect
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Callable, Iterator, Optional
+
+from fastapi import Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily
+
+from config import METRICS_TRACE
+
+
+# Stages range from millisecond DB commits to multi-minute downloads.
+_STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_SECONDS = Histogram(
+    "autoreel_stage_seconds",
+    "Time spent in each pipeline stage.",
+    ["stage"],
+    buckets=_STAGE_BUCKETS,
+)
+STAGE_ERRORS = Counter("autoreel_stage_errors", "Calls to a pipeline stage that raised.", ["stage"])
+STAGE_BYTES = Counter("autoreel_stage_bytes", "Bytes moved by a pipeline stage.", ["stage"])
+HTTP_SECONDS = Histogram(
+    "autoreel_http_request_seconds",
+    "API request latency by route.",
+    ["method", "route", "status"],
+    buckets=_STAGE_BUCKETS,
+)
+
+# Spans of the request being traced, or None when it isn't traced.
+_spans: ContextVar[Optional[list[tuple[str, float]]]] = ContextVar("spans", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time the `with` block as pipeline stage `name`, count it as an error
+    if it raises, and add it to the current request's trace.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(name).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        spans = _spans.get()
+        if spans is not None:
+            spans.append((name, elapsed))
+
+
+def timed(name: str) -> Callable:
+    """Decorator timing every call of the function as stage `name`."""
+    def decorator(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_bytes(name: str, size: int) -> None:
+    """Count `size` bytes moved by stage `name`."""
+    STAGE_BYTES.labels(name).inc(size)
+
+
+def in_context(fn: Callable) -> Callable:
+    """
+    Bind `fn` to the caller's context so work it does on a pool thread is
+    traced as part of the caller's request.
+    """
+    context = copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # A context can only be entered by one thread at a time.
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+class _CacheCollector:
+    """Reads hit and miss counts from registered caches at scrape time."""
+
+    def __init__(self):
+        self._sources: dict[str, Callable[[], dict]] = {}
+
+    def register(self, name: str, counts: Callable[[], dict]) -> None:
+        self._sources[name] = counts
+
+    def collect(self):
+        family = CounterMetricFamily("autoreel_cache_lookups", "Cache lookups by result.", labels=["cache", "result"])
+        for name, counts in self._sources.items():
+            try:
+                current = counts()
+            except Exception as ex:
+                logging.warning("Could not read %s cache counts: %s", name, ex)
+                continue
+            family.add_metric([name, "hit"], current["hits"])
+            family.add_metric([name, "miss"], current["misses"])
+        yield family
+
+
+_caches = _CacheCollector()
+REGISTRY.register(_caches)
+
+
+def register_cache(name: str, counts: Callable[[], dict]) -> None:
+    """
+    Export a cache's hit rate.
+
+    :param name: Value of the `cache` label.
+    :param counts: Returns a dict with cumulative 'hits' and 'misses'.
+    """
+    _caches.register(name, counts)
+
+
+async def observe_request(request: Request, call_next) -> Response:
+    """
+    HTTP middleware recording request latency by route. Requests are traced
+    when METRICS_TRACE is on or they send an `X-Trace` header; their stage
+    timings are returned in a `Server-Timing` header.
+    """
+    spans = [] if METRICS_TRACE or "x-trace" in request.headers else None
+    token = _spans.set(spans)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        _spans.reset(token)
+        route = request.scope.get("route")
+        HTTP_SECONDS.labels(
+            request.method,
+            route.path if route is not None else "unmatched",
+            str(status),
+        ).observe(time.perf_counter() - start)
+
+    if spans:
+        response.headers["Server-Timing"] = server_timing(spans)
+        logging.info("Trace %s %s: %s", request.method, request.url.path, response.headers["Server-Timing"])
+    return response
+
+
+def server_timing(spans: list[tuple[str, float]]) -> str:
+    """
+    Summarize spans as a Server-Timing header value, one entry per stage
+    with its total duration and call count, in first-seen order.
+    """
+    totals: dict[str, list] = {}
+    for name, elapsed in spans:
+        total = totals.setdefault(name, [0.0, 0])
+        total[0] += elapsed
+        total[1] += 1
+    return ", ".join(
+        f'{name};dur={seconds * 1000:.1f};desc="{calls} call{"s" if calls > 1 else ""}"'
+        for name, (seconds, calls) in totals.items()
+    )
+
+
+def render_metrics() -> Response:
+    """The default registry in Prometheus text format."""
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
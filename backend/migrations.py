@@ -0,0 +1,157 @@
+import logging
+from typing import Callable
+
+from sqlalchemy import Connection, Engine, text
+
+from models import Post, Video
+from youtube_search import video_id_from_href, youtube_link
+
+
+def _create_index(conn: Connection, model, name: str) -> None:
+    index = next(index for index in model.__table__.indexes if index.name == name)
+    index.create(conn, checkfirst=True)
+
+
+def _add_listing_indexes(conn: Connection) -> None:
+    _create_index(conn, Post, "ix_post_used_id")
+    _create_index(conn, Post, "ix_post_subreddit_id")
+    _create_index(conn, Post, "ix_post_unused_with_audio_id")
+
+
+def _dedupe_video_urls(conn: Connection) -> None:
+    # Older scrapes stored links as "https://www.youtube.com//watch?v=ID&pp=..."
+    # Rewrite them to the canonical form, keep the oldest row per video,
+    # then enforce uniqueness.
+    rows = conn.execute(text("SELECT id, video_url FROM video ORDER BY id")).all()
+    seen = set()
+    for row_id, video_url in rows:
+        video_id = video_id_from_href(video_url)
+        canonical = youtube_link(video_id) if video_id else video_url
+        if canonical in seen:
+            conn.execute(text("DELETE FROM video WHERE id = :id"), {"id": row_id})
+            continue
+        seen.add(canonical)
+        if canonical != video_url:
+            conn.execute(text("UPDATE video SET video_url = :url WHERE id = :id"), {"url": canonical, "id": row_id})
+    _create_index(conn, Video, "ix_video_video_url")
+
+
+def _add_post_search(conn: Connection) -> None:
+    # Title matches outrank body matches. Each dialect keeps its index
+    # current on insert, update and delete without application code.
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(
+            "ALTER TABLE post ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(content, '')), 'B')"
+            ") STORED"
+        ))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_post_search_vector ON post USING GIN (search_vector)"))
+    elif conn.dialect.name == "sqlite":
+        # Not an external-content table: post has no INTEGER PRIMARY KEY, so
+        # VACUUM may renumber its rowids and desync an index keyed on them.
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5("
+            "post_id UNINDEXED, title, content, tokenize = 'porter unicode61')"
+        ))
+        conn.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS post_fts_insert AFTER INSERT ON post BEGIN "
+            "INSERT INTO post_fts (post_id, title, content) VALUES (new.id, new.title, new.content); "
+            "END"
+        ))
+        conn.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS post_fts_delete AFTER DELETE ON post BEGIN "
+            "DELETE FROM post_fts WHERE post_id = old.id; "
+            "END"
+        ))
+        # Only text edits reindex; marking a post used or adding audio doesn't.
+        conn.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS post_fts_update AFTER UPDATE OF id, title, content ON post BEGIN "
+            "DELETE FROM post_fts WHERE post_id = old.id; "
+            "INSERT INTO post_fts (post_id, title, content) VALUES (new.id, new.title, new.content); "
+            "END"
+        ))
+        conn.execute(text("DELETE FROM post_fts"))
+        conn.execute(text("INSERT INTO post_fts (post_id, title, content) SELECT id, title, content FROM post"))
+
+
+def _key_post_search_by_rowid(conn: Connection) -> None:
+    # FTS5 can only find migration 3's rows by post_id with a full scan, so
+    # every update or delete of a post scanned the index. Rows are now keyed
+    # by a rowid from post_fts_rowid, whose INTEGER PRIMARY KEY survives
+    # VACUUM, so triggers reach a post's row with key lookups.
+    if conn.dialect.name != "sqlite":
+        return
+    for trigger in ("post_fts_insert", "post_fts_delete", "post_fts_update"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    conn.execute(text("DROP TABLE IF EXISTS post_fts"))
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS post_fts_rowid (rowid INTEGER PRIMARY KEY, post_id TEXT NOT NULL UNIQUE)"
+    ))
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE post_fts USING fts5("
+        "post_id UNINDEXED, title, content, tokenize = 'porter unicode61')"
+    ))
+    fts_rowid = "(SELECT rowid FROM post_fts_rowid WHERE post_id = {})"
+    conn.execute(text(
+        "CREATE TRIGGER post_fts_insert AFTER INSERT ON post BEGIN "
+        "INSERT INTO post_fts_rowid (post_id) VALUES (new.id); "
+        "INSERT INTO post_fts (rowid, post_id, title, content) "
+        f"VALUES ({fts_rowid.format('new.id')}, new.id, new.title, new.content); "
+        "END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER post_fts_delete AFTER DELETE ON post BEGIN "
+        f"DELETE FROM post_fts WHERE rowid = {fts_rowid.format('old.id')}; "
+        "DELETE FROM post_fts_rowid WHERE post_id = old.id; "
+        "END"
+    ))
+    # Only text edits reindex; marking a post used or adding audio doesn't.
+    conn.execute(text(
+        "CREATE TRIGGER post_fts_update AFTER UPDATE OF id, title, content ON post BEGIN "
+        f"DELETE FROM post_fts WHERE rowid = {fts_rowid.format('old.id')}; "
+        "UPDATE post_fts_rowid SET post_id = new.id WHERE post_id = old.id; "
+        "INSERT INTO post_fts (rowid, post_id, title, content) "
+        f"VALUES ({fts_rowid.format('new.id')}, new.id, new.title, new.content); "
+        "END"
+    ))
+    conn.execute(text("DELETE FROM post_fts_rowid"))
+    conn.execute(text("INSERT INTO post_fts_rowid (post_id) SELECT id FROM post"))
+    conn.execute(text(
+        "INSERT INTO post_fts (rowid, post_id, title, content) "
+        "SELECT post_fts_rowid.rowid, post.id, post.title, post.content "
+        "FROM post JOIN post_fts_rowid ON post_fts_rowid.post_id = post.id"
+    ))
+
+
+# (version, description, upgrade). Append only; never renumber.
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Add post listing indexes", _add_listing_indexes),
+    (2, "Canonicalize and dedupe video URLs, add unique index", _dedupe_video_urls),
+    (3, "Add full-text search over post title and content", _add_post_search),
+    (4, "Key post search rows by rowid", _key_post_search_by_rowid),
+]
+
+
+def run_migrations(engine: Engine) -> None:
+    """
+    Apply every migration newer than the database's recorded schema
+    version, each in its own transaction.
+
+    Tables are created by `SQLModel.metadata.create_all` beforehand; these
+    migrations bring tables created by older releases up to date, and
+    must be safe to run against a freshly created schema.
+
+    :param engine: Engine for the target database.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+        current = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+    for version, description, upgrade in MIGRATIONS:
+        if version <= current:
+            continue
+        logging.info("Applying migration %d: %s", version, description)
+        with engine.begin() as conn:
+            upgrade(conn)
+            conn.execute(text("INSERT INTO schema_version (version) VALUES (:version)"), {"version": version})
@@ -1,8 +1,22 @@
 from typing import Optional
 
+from sqlalchemy import Index, UniqueConstraint, text
 from sqlmodel import Field, SQLModel
 
 class Post(SQLModel, table=True):
+    # Listings are keyset-paginated by id, so every index ends with it.
+    __table_args__ = (
+        Index("ix_post_used_id", "used", "id"),
+        Index("ix_post_subreddit_id", "subreddit", "id"),
+        # The UI's default view: unused posts that already have audio.
+        Index(
+            "ix_post_unused_with_audio_id",
+            "id",
+            postgresql_where=text("NOT used AND audio_file_url IS NOT NULL"),
+            sqlite_where=text("NOT used AND audio_file_url IS NOT NULL"),
+        ),
+    )
+
     id: str = Field(primary_key=True)
     title: str
     url: str
@@ -17,4 +31,56 @@ class Video(SQLModel, table=True):
     title: str
     # GCS path.
     file_path: str
-    video_url: str
+    # Canonical watch URL; unique so the same video is only stored once.
+    video_url: str = Field(unique=True, index=True)
+
+
+class VideoSegment(SQLModel, table=True):
+    """A high-action window of a gameplay video, ranked by segments.py."""
+    __table_args__ = (
+        UniqueConstraint("video_id", "rank", name="uq_videosegment_video_id_rank"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    video_id: int = Field(foreign_key="video.id", index=True)
+    # 0 is the best segment.
+    rank: int
+    # Offset into the video, in seconds; always a keyframe.
+    start: float
+    duration: float
+    score: float
+
+
+class PostCandidate(SQLModel, table=True):
+    """A multireddit post found by the ingest poller, browsable before it is saved."""
+    # Browsed newest first per multireddit, keyset-paginated on (created_utc, id).
+    __table_args__ = (
+        Index("ix_postcandidate_multireddit_created_id", "multireddit", "created_utc", "id"),
+        Index("ix_postcandidate_created_id", "created_utc", "id"),
+    )
+
+    id: str = Field(primary_key=True)
+    multireddit: str
+    title: str
+    url: str
+    content: str
+    subreddit: str
+    # Reddit's creation time, in Unix seconds.
+    created_utc: float
+
+
+class IngestCursor(SQLModel, table=True):
+    """Newest post the ingest poller has stored for a multireddit."""
+    multireddit: str = Field(primary_key=True)
+    newest_created_utc: float
+    newest_id: str
+    # Unix time of the last successful poll.
+    polled_at: float
+
+
+class ReelPair(SQLModel):
+    """A saved post to narrate over a saved gameplay video."""
+    post_id: str
+    video_id: int
+    # Offset into the video; defaults to the video's best analyzed segment.
+    start: Optional[float] = None
@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+from concurrent.futures import Future
+from contextvars import copy_context
+from typing import Any, Callable, Hashable, Mapping, Optional
+
+import praw
+import prawcore
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from prawcore.exceptions import RequestException, ServerError, TooManyRequests
+
+from config import (
+    REDDIT_CLIENT_ID,
+    REDDIT_CLIENT_SECRET,
+    REDDIT_PASSWORD,
+    REDDIT_RATE_MAX_WAIT,
+    REDDIT_RATE_RESERVE,
+    REDDIT_USER_AGENT,
+    REDDIT_USERNAME,
+)
+from metrics import register_cache
+
+
+class RedditRateLimited(HTTPException):
+    """Reddit's rate limit is exhausted for longer than a caller may wait."""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(
+            status_code=429,
+            detail="Reddit rate limit reached; retry later.",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+
+class RateGovernor:
+    """
+    Token bucket shared by every thread calling Reddit, refilled from the
+    X-Ratelimit-* headers of Reddit's responses.
+
+    Reddit reports how many requests remain in the current window and when
+    it resets. Requests still in flight are counted against that, and
+    `reserve` requests are held back. When the bucket is empty, callers
+    wait for the reset if it is less than `max_wait` seconds away and
+    otherwise fail fast with RedditRateLimited.
+    """
+
+    def __init__(self, reserve: int = REDDIT_RATE_RESERVE, max_wait: float = REDDIT_RATE_MAX_WAIT):
+        self.reserve = reserve
+        self.max_wait = max_wait
+        # None until a response reports the quota, and again once the window resets.
+        self._remaining: Optional[float] = None
+        self._reset_at = 0.0
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        """
+        Take a token for one request. Must be paired with release().
+
+        :raises RedditRateLimited: If no token frees up within `max_wait`.
+        """
+        deadline = time.monotonic() + self.max_wait
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self._remaining is not None and now >= self._reset_at:
+                    self._remaining = None
+                if self._remaining is None or self._remaining - self._in_flight > self.reserve:
+                    self._in_flight += 1
+                    return
+                if self._reset_at > deadline:
+                    raise RedditRateLimited(self._reset_at - now)
+                self._cond.wait(self._reset_at - now)
+
+    def release(self, headers: Optional[Mapping[str, str]] = None) -> None:
+        """
+        Return a request's token, updating the quota from its response.
+
+        :param headers: Response headers; None if the request failed without one.
+        """
+        with self._cond:
+            self._in_flight -= 1
+            if headers is not None:
+                self._update(headers, time.monotonic())
+            self._cond.notify_all()
+
+    def _update(self, headers: Mapping[str, str], now: float) -> None:
+        if "retry-after" in headers:
+            self._remaining = 0.0
+            self._reset_at = now + float(headers["retry-after"])
+        elif "x-ratelimit-remaining" in headers:
+            remaining = float(headers["x-ratelimit-remaining"])
+            reset_at = now + float(headers.get("x-ratelimit-reset", 0))
+            # Responses can arrive out of order; within a window the lowest count is the latest.
+            if self._remaining is not None and reset_at < self._reset_at + 1:
+                remaining = min(remaining, self._remaining)
+            self._remaining = remaining
+            self._reset_at = reset_at
+
+    def status(self) -> dict:
+        """Remaining quota as last reported, seconds to its reset, and requests in flight."""
+        with self._cond:
+            return {
+                "remaining": self._remaining,
+                "reset_in": max(0.0, self._reset_at - time.monotonic()) if self._remaining is not None else None,
+                "in_flight": self._in_flight,
+                "reserve": self.reserve,
+            }
+
+
+class GovernedRequestor(prawcore.Requestor):
+    """prawcore requestor passing every HTTP request through a RateGovernor."""
+
+    def __init__(self, *args, governor: RateGovernor, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.governor = governor
+
+    def request(self, *args, **kwargs):
+        self.governor.acquire()
+        headers = None
+        try:
+            response = super().request(*args, **kwargs)
+            headers = response.headers
+            return response
+        finally:
+            self.governor.release(headers)
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Callers arriving while a call
+    with their key is running wait for it and share its result or error.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._running: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        future, leader = self._join(key)
+        if leader:
+            self._run(key, future, fn)
+        return future.result()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        do() for the event loop: a new call runs `fn` on the threadpool, and
+        callers await the shared result without blocking the loop.
+        """
+        future, leader = self._join(key)
+        if leader:
+            asyncio.get_running_loop().run_in_executor(None, copy_context().run, self._run, key, future, fn)
+        # Shielded, so a cancelled caller doesn't cancel the call others wait on.
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def _join(self, key: Hashable) -> tuple[Future, bool]:
+        with self._lock:
+            future = self._running.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = self._running[key] = Future()
+            self.calls += 1
+            return future, True
+
+    def _run(self, key: Hashable, future: Future, fn: Callable[[], Any]) -> None:
+        try:
+            future.set_result(fn())
+        except BaseException as ex:
+            future.set_exception(ex)
+        finally:
+            with self._lock:
+                del self._running[key]
+
+
+class RedditClient:
+    """
+    The app's shared Reddit API access.
+
+    Every request passes through one RateGovernor, so concurrent threads
+    respect Reddit's quota together. Identical calls in flight are
+    coalesced into one.
+    """
+
+    def __init__(self, governor: Optional[RateGovernor] = None):
+        self.governor = governor or RateGovernor()
+        self.reddit = self.connect()
+        self.flights = SingleFlight()
+
+    def connect(self, **settings) -> praw.Reddit:
+        """
+        Build a praw.Reddit whose requests go through this client's governor.
+
+        :param settings: praw.Reddit settings overriding those from config.
+        :return: The praw.Reddit; assign it to `reddit` to use it.
+        """
+        options = {
+            "client_id": REDDIT_CLIENT_ID,
+            "client_secret": REDDIT_CLIENT_SECRET,
+            "user_agent": REDDIT_USER_AGENT,
+            "username": REDDIT_USERNAME,
+            "password": REDDIT_PASSWORD,
+        }
+        options.update(settings)
+        return praw.Reddit(**options, requestor_class=GovernedRequestor, requestor_kwargs={"governor": self.governor})
+
+    def call(self, fn: Callable[[praw.Reddit], Any], key: Optional[Hashable] = None) -> Any:
+        """
+        Run `fn` with the shared praw.Reddit.
+
+        PRAW objects are lazy, so `fn` should read everything it needs and
+        return plain data. Callers sharing a result must not modify it.
+
+        :param fn: Called with the praw.Reddit.
+        :param key: Identifies the call; calls with the key of one already
+            in flight wait for it and return its result.
+        :return: What `fn` returned.
+        :raises RedditRateLimited: When Reddit's quota is exhausted.
+        :raises HTTPException: 503 when Reddit fails or is unreachable.
+        """
+        if key is None:
+            return self._call(fn)
+        return self.flights.do(key, lambda: self._call(fn))
+
+    async def call_async(self, fn: Callable[[praw.Reddit], Any], key: Optional[Hashable] = None) -> Any:
+        """
+        call() for async routes. The blocking PRAW work runs on the
+        threadpool, under the same governor and single-flight as call(),
+        so sync and async callers with one key share a single request.
+        """
+        if key is None:
+            return await run_in_threadpool(self._call, fn)
+        return await self.flights.do_async(key, lambda: self._call(fn))
+
+    def _call(self, fn: Callable[[praw.Reddit], Any]) -> Any:
+        try:
+            return fn(self.reddit)
+        except TooManyRequests as ex:
+            raise RedditRateLimited(float(ex.retry_after or 60))
+        except (ServerError, RequestException) as ex:
+            logging.error("Reddit request failed: %s", ex)
+            raise HTTPException(status_code=503, detail="Reddit is unavailable; retry later.")
+
+
+reddit_client = RedditClient()
+register_cache("reddit_singleflight", lambda: {"hits": reddit_client.flights.shared, "misses": reddit_client.flights.calls})
@@ -1,42 +1,67 @@
 import json
 import logging
+from typing import Optional
 
-import praw
 from fastapi import HTTPException
 from prawcore.exceptions import NotFound, ResponseException
+from sqlalchemy import column, func, literal_column, table
 from sqlalchemy.exc import IntegrityError, NoResultFound
 from sqlmodel import Session, select
 
 from config import (
-    REDDIT_CLIENT_ID,
-    REDDIT_CLIENT_SECRET,
-    REDDIT_USER_AGENT,
+    REDDIT_CACHE_MAX_ENTRIES,
+    REDDIT_CACHE_STALE_TTL,
+    REDDIT_CACHE_TTL,
     REDDIT_USERNAME,
-    REDDIT_PASSWORD,
+    async_engine,
+    async_session,
     engine,
 )
+from metrics import register_cache, stage, timed
 from models import Post
+from reddit_client import reddit_client
+from response_cache import post_pages
+from ttl_cache import TTLCache
+from util import insert_ignore_duplicates
 
 
-reddit = praw.Reddit(
-    client_id=REDDIT_CLIENT_ID,
-    client_secret=REDDIT_CLIENT_SECRET,
-    user_agent=REDDIT_USER_AGENT,
-    username=REDDIT_USERNAME,
-    password=REDDIT_PASSWORD,
+# Multireddit listings keyed by (multireddit, limit).
+listing_cache = TTLCache(
+    ttl=REDDIT_CACHE_TTL,
+    stale_ttl=REDDIT_CACHE_STALE_TTL,
+    max_entries=REDDIT_CACHE_MAX_ENTRIES,
 )
+register_cache("reddit_listing", lambda: {"hits": listing_cache.hits, "misses": listing_cache.misses})
 
 
-def get_posts_from_subreddit(subreddit: str = "Autoreel", limit: int = 15) -> str:
+async def get_posts_from_subreddit(subreddit: str = "Autoreel", limit: int = 15, refresh: bool = False) -> str:
     """
-    Retrieve posts from a custom feed (multireddit) on Reddit.
+    Retrieve posts from a custom feed (multireddit) on Reddit, served from
+    an in-process cache when possible.
 
     :param subreddit: Name of the multireddit to query.
     :param limit: Maximum number of posts to retrieve.
+    :param refresh: Bypass the cache and fetch the listing live.
     :return: A JSON string representing an array of post data.
     """
-    try:
-        custom_feed = reddit.multireddit(REDDIT_USERNAME, subreddit)
+    return await listing_cache.get_or_load_async(
+        (subreddit, limit),
+        lambda: fetch_posts_from_subreddit(subreddit=subreddit, limit=limit),
+        bypass=refresh,
+    )
+
+
+@timed("reddit.listing")
+async def fetch_posts_from_subreddit(subreddit: str = "Autoreel", limit: int = 15) -> str:
+    """
+    Retrieve posts from a custom feed (multireddit) live from Reddit.
+
+    :param subreddit: Name of the multireddit to query.
+    :param limit: Maximum number of posts to retrieve.
+    :return: A JSON string representing an array of post data.
+    """
+    def load(reddit) -> list[dict]:
+        custom_feed = reddit.multireddit(redditor=REDDIT_USERNAME, name=subreddit)
         post_data = []
 
         for post in custom_feed.hot(limit=limit):
@@ -48,8 +73,12 @@ def get_posts_from_subreddit(subreddit: str = "Autoreel", limit: int = 15) -> st
                 "post_id": post.id,
             }
             post_data.append(post_dict)
+        return post_data
 
-        return json.dumps(post_data)
+    try:
+        return json.dumps(await reddit_client.call_async(load, key=("hot", subreddit, limit)))
+    except HTTPException:
+        raise
     except ResponseException:
         raise HTTPException(status_code=401, detail="Failed to authenticate Reddit Account.")
     except NotFound:
@@ -67,7 +96,14 @@ def save_post_db(post_id: str) -> str:
     :return: JSON representation of the saved Post.
     """
     try:
-        retrieved_post = reddit.submission(id=post_id)
+        # Submissions are lazy; reading the fields makes the request.
+        with stage("reddit.submission"):
+            fields = reddit_client.call(
+                lambda reddit: post_fields(reddit.submission(id=post_id)),
+                key=("submission", post_id),
+            )
+    except HTTPException:
+        raise
     except NotFound:
         raise HTTPException(status_code=404, detail="Post not found.")
     except Exception as ex:
@@ -76,15 +112,12 @@ def save_post_db(post_id: str) -> str:
 
     with Session(engine) as session:
         try:
-            post_model = Post(
-                id=retrieved_post.id,
-                title=retrieved_post.title.strip(),
-                url=retrieved_post.url.strip(),
-                content=retrieved_post.selftext.strip(),
-                subreddit=retrieved_post.subreddit.display_name.strip(),
-            )
+            post_model = Post(**fields)
             session.add(post_model)
-            session.commit()
+            with stage("db.save_post"):
+                session.commit()
+            session.refresh(post_model)
+            post_pages.invalidate(post_model.id, after=post_model.model_dump())
             return post_model.model_dump_json()
         except IntegrityError:
             raise HTTPException(status_code=400, detail="Cannot save duplicate post.")
@@ -93,37 +126,238 @@ def save_post_db(post_id: str) -> str:
             raise HTTPException(status_code=500, detail="Failed to save post.")
 
 
-def get_saved_posts_db(offset: int = 0, limit: int = 15) -> list[Post]:
+def save_posts_batch_db(post_ids: list[str]) -> dict:
     """
-    Retrieve previously saved posts from the database.
+    Fetch many posts by ID in bulk and persist the new ones in a single
+    transaction. IDs already saved are skipped without a Reddit lookup.
 
-    :param offset: Offset for pagination.
-    :param limit: Maximum number of posts to retrieve.
-    :return: List of Post objects.
+    :param post_ids: Reddit post IDs, with or without the "t3_" prefix.
+    :return: Dict of "saved", "duplicate" and "not_found" post ID lists.
     """
+    ids = list(dict.fromkeys(_strip_fullname(post_id) for post_id in post_ids if post_id.strip()))
+    if not ids:
+        return {"saved": [], "duplicate": [], "not_found": []}
+
+    with Session(engine) as session:
+        existing = set(session.exec(select(Post.id).where(Post.id.in_(ids))).all())
+    to_fetch = [post_id for post_id in ids if post_id not in existing]
+
+    try:
+        # PRAW sends one /api/info request per 100 fullnames.
+        with stage("reddit.info"):
+            found = reddit_client.call(
+                lambda reddit: {
+                    submission.id: post_fields(submission)
+                    for submission in reddit.info(fullnames=[f"t3_{post_id}" for post_id in to_fetch])
+                },
+                key=("info", tuple(to_fetch)),
+            ) if to_fetch else {}
+    except HTTPException:
+        raise
+    except ResponseException:
+        raise HTTPException(status_code=401, detail="Failed to authenticate Reddit Account.")
+    except Exception as ex:
+        logging.error("save_posts_batch_db error retrieving posts: %s", ex)
+        raise HTTPException(status_code=500, detail="Problem retrieving posts.")
+
+    rows = [found[post_id] for post_id in to_fetch if post_id in found]
     with Session(engine) as session:
         try:
-            statement = select(Post).offset(offset).limit(limit)
-            posts = session.exec(statement).all()
-            return posts
+            with stage("db.save_posts_batch"):
+                inserted = insert_ignore_duplicates(session, Post, rows)
+                session.commit()
+            post_pages.invalidate_many(
+                (row["id"], None, {**row, "used": False, "audio_file_url": None}) for row in rows if row["id"] in inserted
+            )
+        except Exception as ex:
+            logging.error("save_posts_batch_db error saving posts: %s", ex)
+            raise HTTPException(status_code=500, detail="Failed to save posts.")
+
+    return {
+        "saved": [row["id"] for row in rows if row["id"] in inserted],
+        # Includes rows another request inserted between lookup and insert.
+        "duplicate": [post_id for post_id in ids if post_id in existing]
+        + [row["id"] for row in rows if row["id"] not in inserted],
+        "not_found": [post_id for post_id in to_fetch if post_id not in found],
+    }
+
+
+def _strip_fullname(post_id: str) -> str:
+    post_id = post_id.strip()
+    return post_id[3:] if post_id.startswith("t3_") else post_id
+
+
+def post_fields(submission) -> dict:
+    """Column values for a Post built from a PRAW submission."""
+    return {
+        "id": submission.id,
+        "title": submission.title.strip(),
+        "url": submission.url.strip(),
+        "content": submission.selftext.strip(),
+        "subreddit": submission.subreddit.display_name.strip(),
+    }
+
+
+async def get_saved_posts_db(
+    offset: int = 0,
+    limit: int = 15,
+    cursor: Optional[str] = None,
+    used: Optional[bool] = None,
+    subreddit: Optional[str] = None,
+    has_audio: Optional[bool] = None,
+) -> tuple[list[Post], Optional[str]]:
+    """
+    Retrieve previously saved posts from the database, ordered by ID.
+
+    :param offset: Offset for pagination. Prefer `cursor`, which stays fast on deep pages.
+    :param limit: Maximum number of posts to retrieve.
+    :param cursor: Return posts after this ID (the previous page's `next_cursor`).
+    :param used: Only posts with this used status.
+    :param subreddit: Only posts from this subreddit.
+    :param has_audio: Only posts with (or without) an audio file url.
+    :return: List of Post objects, and the cursor for the next page (None on the last page).
+    """
+    async with async_session() as session:
+        try:
+            statement = select(Post).where(*post_filters(used=used, subreddit=subreddit, has_audio=has_audio))
+            if cursor is not None:
+                statement = statement.where(Post.id > cursor)
+            # Fetch one extra row to know whether another page exists.
+            statement = statement.order_by(Post.id).offset(offset).limit(limit + 1)
+            posts = (await session.exec(statement)).all()
+            next_cursor = posts[limit - 1].id if len(posts) > limit else None
+            return posts[:limit], next_cursor
         except Exception as ex:
             logging.error("get_saved_posts_db error: %s", ex)
             raise HTTPException(status_code=500, detail="Failed to get posts.")
 
 
-def delete_saved_post_db(post_id: str) -> str:
+def post_filters(
+    used: Optional[bool] = None,
+    subreddit: Optional[str] = None,
+    has_audio: Optional[bool] = None,
+) -> list:
+    """
+    Build WHERE clauses for the post listing filters. None means "any".
+    """
+    clauses = []
+    if used is not None:
+        clauses.append(Post.used == used)
+    if subreddit is not None:
+        clauses.append(Post.subreddit == subreddit)
+    if has_audio is not None:
+        clauses.append(Post.audio_file_url.is_not(None) if has_audio else Post.audio_file_url.is_(None))
+    return clauses
+
+
+def post_matches(
+    post: dict,
+    used: Optional[bool] = None,
+    subreddit: Optional[str] = None,
+    has_audio: Optional[bool] = None,
+) -> bool:
+    """
+    Whether a post, as a dict of column values, passes the listing filters.
+    Mirrors post_filters().
+    """
+    return (
+        (used is None or post["used"] == used)
+        and (subreddit is None or post["subreddit"] == subreddit)
+        and (has_audio is None or (post["audio_file_url"] is not None) == has_audio)
+    )
+
+
+def fts5_query(query: str) -> str:
+    """
+    Turn free text into an FTS5 query matching every word, so user input
+    can't inject FTS5 operators or column filters.
+    """
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+async def search_posts_db(
+    query: str,
+    limit: int = 15,
+    offset: int = 0,
+    used: Optional[bool] = None,
+    subreddit: Optional[str] = None,
+    has_audio: Optional[bool] = None,
+) -> list[dict]:
+    """
+    Full-text search over saved posts' titles and content, best match first.
+
+    Uses the FTS5 table on SQLite and the tsvector column on Postgres, both
+    created by migrations 3 and 4.
+
+    :param query: Search text; every word must match.
+    :param limit: Maximum number of results.
+    :param offset: Offset for pagination.
+    :param used: Only posts with this used status.
+    :param subreddit: Only posts from this subreddit.
+    :param has_audio: Only posts with (or without) an audio file url.
+    :return: List of dicts with the 'post', its relevance 'score' (higher
+        is better) and a 'snippet' with matches wrapped in <b></b>.
+    """
+    dialect = async_engine.dialect.name
+    if dialect == "sqlite":
+        match = fts5_query(query)
+        if not match:
+            return []
+        post_fts = table("post_fts", column("post_id"))
+        # bm25 is lower for better matches; weight title hits over body hits.
+        rank = func.bm25(literal_column("post_fts"), 0.0, 10.0, 1.0)
+        snippet = func.snippet(literal_column("post_fts"), 2, "<b>", "</b>", "…", 24)
+        statement = (
+            select(Post, (-rank).label("score"), snippet.label("snippet"))
+            .join(post_fts, post_fts.c.post_id == Post.id)
+            .where(literal_column("post_fts").op("MATCH")(match))
+            .order_by(rank)
+        )
+    elif dialect == "postgresql":
+        ts_query = func.websearch_to_tsquery("english", query)
+        search_vector = literal_column("post.search_vector")
+        rank = func.ts_rank_cd(search_vector, ts_query)
+        snippet = func.ts_headline(
+            "english", Post.content, ts_query, "StartSel=<b>, StopSel=</b>, MinWords=15, MaxWords=35"
+        )
+        statement = (
+            select(Post, rank.label("score"), snippet.label("snippet"))
+            .where(search_vector.op("@@")(ts_query))
+            .order_by(rank.desc())
+        )
+    else:
+        raise HTTPException(status_code=501, detail=f"Search is not supported on {dialect}.")
+
+    statement = (
+        statement.where(*post_filters(used=used, subreddit=subreddit, has_audio=has_audio))
+        .order_by(Post.id)
+        .offset(offset)
+        .limit(limit)
+    )
+    async with async_session() as session:
+        try:
+            rows = (await session.exec(statement)).all()
+        except Exception as ex:
+            logging.error("search_posts_db error: %s", ex)
+            raise HTTPException(status_code=500, detail="Failed to search posts.")
+    return [{"post": post, "score": score, "snippet": snippet} for post, score, snippet in rows]
+
+
+async def delete_saved_post_db(post_id: str) -> str:
     """
     Delete a post from the database.
 
     :param post_id: The post's ID.
     :return: The deleted post's ID.
     """
-    with Session(engine) as session:
+    async with async_session() as session:
         try:
             statement = select(Post).where(Post.id == post_id)
-            post = session.exec(statement).one()
-            session.delete(post)
-            session.commit()
+            post = (await session.exec(statement)).one()
+            before = post.model_dump()
+            await session.delete(post)
+            await session.commit()
+            post_pages.invalidate(post_id, before=before)
             return post.id
         except NoResultFound:
             raise HTTPException(status_code=404, detail="Post not found.")
@@ -132,7 +366,7 @@ def delete_saved_post_db(post_id: str) -> str:
             raise HTTPException(status_code=500, detail="Failed to delete post.")
 
 
-def patch_post_audio_db(post_id: str, post: Post) -> Post:
+async def patch_post_audio_db(post_id: str, post: Post) -> Post:
     """
     Update the audio_file_url field of a specific post.
 
@@ -140,14 +374,16 @@ def patch_post_audio_db(post_id: str, post: Post) -> Post:
     :param post: A Post object with the new audio_file_url.
     :return: The updated Post object.
     """
-    with Session(engine) as session:
+    async with async_session() as session:
         try:
             statement = select(Post).where(Post.id == post_id)
-            saved_post = session.exec(statement).one()
+            saved_post = (await session.exec(statement)).one()
+            before = saved_post.model_dump()
             saved_post.audio_file_url = post.audio_file_url
             session.add(saved_post)
-            session.commit()
-            session.refresh(saved_post)
+            await session.commit()
+            await session.refresh(saved_post)
+            post_pages.invalidate(post_id, before=before, after=saved_post.model_dump())
             return saved_post
         except NoResultFound:
             raise HTTPException(status_code=404, detail="Post not found.")
@@ -156,25 +392,27 @@ def patch_post_audio_db(post_id: str, post: Post) -> Post:
             raise HTTPException(status_code=500, detail="Failed to update post audio url.")
 
 
-def use_post_db(post_id: str) -> Post:
+async def use_post_db(post_id: str) -> Post:
     """
     Mark a specific post's 'used' flag as True.
 
     :param post_id: The target post's ID.
     :return: The updated Post object.
     """
-    with Session(engine) as session:
+    async with async_session() as session:
         try:
             statement = select(Post).where(Post.id == post_id)
-            saved_post = session.exec(statement).one()
+            saved_post = (await session.exec(statement)).one()
 
             if saved_post.used:
                 raise HTTPException(status_code=400, detail="Post already used.")
 
+            before = saved_post.model_dump()
             saved_post.used = True
             session.add(saved_post)
-            session.commit()
-            session.refresh(saved_post)
+            await session.commit()
+            await session.refresh(saved_post)
+            post_pages.invalidate(post_id, before=before, after=saved_post.model_dump())
             return saved_post
         except HTTPException as err:
             raise err
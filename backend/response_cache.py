@@ -0,0 +1,162 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from config import RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL
+from metrics import register_cache
+
+
+class PageScope:
+    """
+    The rows a cached list page depends on: the rows it returned, plus any
+    row matching its filters whose key lies in (`lower`, `upper`], since
+    adding or removing one would change or shift the page.
+
+    :param keys: Keys of the rows on the page.
+    :param lower: The page's cursor; None when it starts at the first row.
+    :param upper: Key of the page's last row; None on the last page, which
+        new rows past the end would join.
+    :param matches: Whether a row, as a dict of column values, passes the
+        page's filters.
+    """
+
+    def __init__(self, keys: Iterable[Any], lower: Any, upper: Any, matches: Callable[[dict], bool]):
+        self.keys = set(keys)
+        self.lower = lower
+        self.upper = upper
+        self.matches = matches
+
+    def affected_by(self, key: Any, before: Optional[dict], after: Optional[dict]) -> bool:
+        if key in self.keys:
+            return True
+        if self.lower is not None and key <= self.lower:
+            return False
+        if self.upper is not None and key > self.upper:
+            return False
+        return any(state is not None and self.matches(state) for state in (before, after))
+
+
+class CachedPage:
+    """A rendered JSON response and its strong ETag."""
+
+    def __init__(self, body: bytes, scope: PageScope):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.scope = scope
+        self.created_at = time.monotonic()
+
+    def respond(self, request: Request) -> Response:
+        """The page, or an empty 304 if the client already has this version."""
+        # no-cache: clients may store the page but must revalidate each use.
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), self.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(self.body, media_type="application/json", headers=headers)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches `etag`, using weak comparison as RFC 9110 requires."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+class ResponseCache:
+    """
+    Thread-safe, size-bounded cache of rendered list pages.
+
+    Writes made through this process invalidate exactly the pages whose
+    scope they touch. Pages also expire after `ttl` seconds, which bounds
+    how long writes by other processes go unseen.
+    """
+
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, CachedPage] = OrderedDict()
+        # Bumped by every invalidation, so a page read before a write can't be stored after it.
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    async def respond(
+        self,
+        request: Request,
+        key: Hashable,
+        load: Callable[[], Awaitable[tuple[Any, PageScope]]],
+    ) -> Response:
+        """
+        Serve the page for `key` from the cache, loading and storing it on a miss.
+
+        :param request: The request, for its If-None-Match header.
+        :param key: The page's query parameters.
+        :param load: Returns the response payload and its PageScope.
+        :return: The page, or a 304 when the client's ETag is current.
+        """
+        page = self._get(key)
+        if page is None:
+            with self._lock:
+                generation = self._generation
+            payload, scope = await load()
+            page = CachedPage(JSONResponse(jsonable_encoder(payload)).body, scope)
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = page
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        return page.respond(request)
+
+    def _get(self, key: Hashable) -> Optional[CachedPage]:
+        with self._lock:
+            page = self._entries.get(key)
+            if page is not None and time.monotonic() - page.created_at < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return page
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def invalidate(self, key: Any, before: Optional[dict] = None, after: Optional[dict] = None) -> None:
+        """
+        Drop the pages a write to one row affects. Call after the write commits.
+
+        :param key: The row's key.
+        :param before: The row's column values before the write; None if it was inserted.
+        :param after: The row's column values after the write; None if it was deleted.
+        """
+        self.invalidate_many([(key, before, after)])
+
+    def invalidate_many(self, changes: Iterable[tuple[Any, Optional[dict], Optional[dict]]]) -> None:
+        """invalidate() for several rows at once, as (key, before, after) tuples."""
+        changes = list(changes)
+        with self._lock:
+            self._generation += 1
+            for page_key in [
+                page_key
+                for page_key, page in self._entries.items()
+                if any(page.scope.affected_by(*change) for change in changes)
+            ]:
+                del self._entries[page_key]
+
+    def clear(self) -> None:
+        """Drop every page, e.g. after a bulk write."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+# GET /posts and GET /videos pages.
+post_pages = ResponseCache()
+video_pages = ResponseCache()
+register_cache("post_pages", lambda: {"hits": post_pages.hits, "misses": post_pages.misses})
+register_cache("video_pages", lambda: {"hits": video_pages.hits, "misses": video_pages.misses})
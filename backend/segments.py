@@ -0,0 +1,277 @@
+import argparse
+import logging
+import multiprocessing
+import re
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+
+import numpy as np
+from fastapi import HTTPException
+from sqlmodel import Session, delete, select
+
+from artifact_cache import get_artifact_cache
+from config import (
+    FFMPEG_BIN,
+    RENDER_MAX_SECONDS,
+    SEGMENT_TOP_N,
+    SEGMENT_WORKERS,
+    async_session,
+    engine,
+)
+from models import Video, VideoSegment
+from video_generator import cached_source
+
+
+# Sampled frames are tiny grayscale thumbnails; enough to see motion and cuts.
+FRAME_WIDTH = 64
+FRAME_HEIGHT = 36
+# At most one sample per this many seconds, even in all-keyframe footage.
+SAMPLE_INTERVAL = 1.0
+# Share of the luma histogram that must change between samples for a cut.
+SCENE_CUT_THRESHOLD = 0.35
+# Up to this many cuts per window raise its score by up to SCENE_BONUS.
+MAX_SCENE_CUTS = 6
+SCENE_BONUS = 0.5
+# Samples this uniform (black screens, fades, menus) count as no motion.
+FLAT_FRAME_STD = 8.0
+
+_PTS_TIME = re.compile(rb"pts_time:\s*([0-9.]+)")
+
+
+def build_sample_command(video_path: str) -> list[str]:
+    """
+    Build the ffmpeg command decoding only keyframes, at most one per
+    SAMPLE_INTERVAL, as raw grayscale thumbnails on stdout. Each frame's
+    timestamp is logged to stderr by `showinfo`.
+
+    Skipping non-key frames avoids decoding almost all of the video, which
+    is what makes hour-long files take seconds.
+
+    :param video_path: Local gameplay video.
+    :return: The argument list for subprocess.
+    """
+    return [
+        FFMPEG_BIN, "-hide_banner", "-nostats", "-loglevel", "info",
+        "-skip_frame", "nokey", "-i", video_path,
+        "-map", "0:v:0", "-an", "-sn", "-dn",
+        "-vf", (
+            f"select='isnan(prev_selected_t)+gte(t-prev_selected_t,{SAMPLE_INTERVAL})',"
+            f"scale={FRAME_WIDTH}:{FRAME_HEIGHT},format=gray,showinfo"
+        ),
+        "-fps_mode", "passthrough",
+        "-f", "rawvideo", "-pix_fmt", "gray",
+        "-",
+    ]
+
+
+def sample_frames(video_path: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Decode sampled keyframes of a video.
+
+    :param video_path: Local gameplay video.
+    :return: (frames, times): uint8 array of shape (n, FRAME_HEIGHT,
+        FRAME_WIDTH) and the timestamp of each frame in seconds.
+    """
+    completed = subprocess.run(build_sample_command(video_path), capture_output=True)
+    if completed.returncode != 0:
+        stderr = completed.stderr.decode(errors="replace").strip()
+        raise RuntimeError(f"ffmpeg exited {completed.returncode}: {stderr[-500:]}")
+
+    frame_size = FRAME_WIDTH * FRAME_HEIGHT
+    n_frames = len(completed.stdout) // frame_size
+    times = np.array([float(match) for match in _PTS_TIME.findall(completed.stderr)], dtype=np.float64)
+    n_frames = min(n_frames, len(times))
+    frames = np.frombuffer(completed.stdout[: n_frames * frame_size], dtype=np.uint8)
+    return frames.reshape(n_frames, FRAME_HEIGHT, FRAME_WIDTH), times[:n_frames]
+
+
+def frame_scores(frames: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Per-sample motion and scene-cut flags.
+
+    :param frames: uint8 array of shape (n, height, width).
+    :return: (motion, cuts): mean absolute luma change from the previous
+        sample (0-255), and whether the luma histogram changed enough to
+        be a scene cut.
+    """
+    n_frames = len(frames)
+    if n_frames < 2:
+        return np.zeros(n_frames), np.zeros(n_frames, dtype=bool)
+
+    pixels = frames.reshape(n_frames, -1)
+    motion = np.concatenate(([0.0], np.abs(np.diff(pixels.astype(np.int16), axis=0)).mean(axis=1)))
+    # Changes into or out of a blank frame are fades, not action.
+    flat = pixels.std(axis=1) < FLAT_FRAME_STD
+    blank = flat | np.concatenate(([True], flat[:-1]))
+    motion[blank] = 0.0
+
+    # 32-bin luma histograms for every frame in one bincount.
+    bins = (pixels >> 3).astype(np.int64) + 32 * np.arange(n_frames)[:, None]
+    hist = np.bincount(bins.ravel(), minlength=32 * n_frames).reshape(n_frames, 32) / pixels.shape[1]
+    change = 0.5 * np.abs(np.diff(hist, axis=0)).sum(axis=1)
+    cuts = np.concatenate(([False], change > SCENE_CUT_THRESHOLD)) & ~blank
+    return motion, cuts
+
+
+def rank_windows(
+    times: np.ndarray,
+    motion: np.ndarray,
+    cuts: np.ndarray,
+    duration: float = RENDER_MAX_SECONDS,
+    top_n: int = SEGMENT_TOP_N,
+) -> list[dict]:
+    """
+    Score every `duration`-second window starting at a sample and return
+    the best non-overlapping ones.
+
+    A window's score is its mean motion, boosted by up to SCENE_BONUS for
+    scene cuts. Windows start on sampled keyframes, so a render seeking to
+    `start` lands exactly on one.
+
+    :param times: Sample timestamps, ascending.
+    :param motion: Output of frame_scores().
+    :param cuts: Output of frame_scores().
+    :param duration: Window length in seconds.
+    :param top_n: Segments to return.
+    :return: Dicts with 'rank', 'start', 'duration' and 'score', best first.
+    """
+    if not len(times):
+        return [{"rank": 0, "start": 0.0, "duration": duration, "score": 0.0}]
+
+    # Only windows that fit; footage shorter than one window gets one from the start.
+    starts = np.flatnonzero(times <= max(times[-1] - duration, times[0]))
+    ends = np.searchsorted(times, times[starts] + duration)
+    motion_sums = np.concatenate(([0.0], np.cumsum(motion)))
+    cut_counts = np.concatenate(([0], np.cumsum(cuts)))
+
+    # motion and cuts at a sample compare it with the one before, which for
+    # the first sample of a window lies outside it.
+    mean_motion = (motion_sums[ends] - motion_sums[starts + 1]) / np.maximum(ends - starts - 1, 1)
+    window_cuts = np.minimum(cut_counts[ends] - cut_counts[starts + 1], MAX_SCENE_CUTS)
+    scores = mean_motion * (1 + SCENE_BONUS * window_cuts / MAX_SCENE_CUTS)
+
+    segments = []
+    for i in np.argsort(-scores, kind="stable"):
+        start = float(times[starts[i]])
+        if any(abs(start - segment["start"]) < duration for segment in segments):
+            continue
+        segments.append({"rank": len(segments), "start": start, "duration": duration, "score": float(scores[i])})
+        if len(segments) == top_n:
+            break
+    return segments
+
+
+def analyze_video(job: dict) -> dict:
+    """
+    Find the best segments of one video. Runs inside a worker process.
+
+    :param job: Dict with 'video_id', 'video_path' (GCS path) and optional
+        'duration' and 'top_n'.
+    :return: Dict with 'segments' set on success or 'error' on failure.
+    """
+    result = {"video_id": job["video_id"], "segments": [], "error": None}
+    try:
+        # Same cache entry the renderer reads, so the download is shared.
+        with cached_source(get_artifact_cache(), job["video_path"]) as video_path:
+            frames, times = sample_frames(video_path)
+        motion, cuts = frame_scores(frames)
+        result["segments"] = rank_windows(
+            times,
+            motion,
+            cuts,
+            duration=job.get("duration", RENDER_MAX_SECONDS),
+            top_n=job.get("top_n", SEGMENT_TOP_N),
+        )
+    except Exception as ex:
+        logging.error("Failed to analyze video %s: %s", job["video_id"], ex)
+        result["error"] = str(ex)
+    return result
+
+
+def save_segments_db(video_id: int, segments: list[dict]) -> None:
+    """
+    Replace the stored segments of a video.
+
+    :param video_id: ID of the video.
+    :param segments: Output of rank_windows().
+    """
+    with Session(engine) as session:
+        session.exec(delete(VideoSegment).where(VideoSegment.video_id == video_id))
+        session.add_all(VideoSegment(video_id=video_id, **segment) for segment in segments)
+        session.commit()
+
+
+def analyze_videos(video_ids: list[int], workers: int = SEGMENT_WORKERS, job=None) -> list[dict]:
+    """
+    Analyze saved videos on a process pool and store their top segments.
+
+    :param video_ids: IDs of saved videos.
+    :param workers: Number of worker processes. Defaults to the CPU count.
+    :param job: Optional jobs.Job to report per-video progress to.
+    :return: One result dict per video, in the same order, with 'segments' or 'error'.
+    :raises HTTPException: 404 if a video is not saved.
+    """
+    with Session(engine) as session:
+        videos = {video.id: video for video in session.exec(select(Video).where(Video.id.in_(video_ids)))}
+    missing = [video_id for video_id in video_ids if video_id not in videos]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Videos not found: {', '.join(map(str, missing))}")
+
+    analysis_jobs = [{"video_id": video_id, "video_path": videos[video_id].file_path} for video_id in video_ids]
+    if not analysis_jobs:
+        return []
+
+    if job is not None:
+        job.report(stage="analyzing")
+        for analysis_job in analysis_jobs:
+            job.report(item=analysis_job["video_id"], status="queued")
+
+    results: list[Optional[dict]] = [None] * len(analysis_jobs)
+    # Spawned workers don't inherit the parent's threads, locks or DB connections.
+    context = multiprocessing.get_context("spawn")
+    workers = max(1, min(workers, len(analysis_jobs)))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {pool.submit(analyze_video, analysis_job): i for i, analysis_job in enumerate(analysis_jobs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            video_id = analysis_jobs[i]["video_id"]
+            try:
+                results[i] = future.result()
+            except Exception as ex:
+                logging.error("Analysis worker failed: %s", ex)
+                results[i] = {"video_id": video_id, "segments": [], "error": str(ex)}
+
+            if not results[i]["error"]:
+                save_segments_db(video_id, results[i]["segments"])
+            if job is not None:
+                job.report(
+                    item=video_id,
+                    status="failed" if results[i]["error"] else "analyzed",
+                    segments=len(results[i]["segments"]),
+                )
+    return results
+
+
+async def get_video_segments_db(video_id: int) -> list[VideoSegment]:
+    """
+    Retrieve the stored segments of a video, best first.
+
+    :param video_id: ID of the video.
+    :return: A list of VideoSegment objects; empty if not analyzed yet.
+    """
+    async with async_session() as session:
+        statement = select(VideoSegment).where(VideoSegment.video_id == video_id).order_by(VideoSegment.rank)
+        return (await session.exec(statement)).all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find and store the best segments of saved videos.")
+    parser.add_argument("video_ids", nargs="+", type=int, metavar="VIDEO_ID")
+    parser.add_argument("--workers", type=int, default=SEGMENT_WORKERS, help="Worker processes.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    for analysis in analyze_videos(args.video_ids, workers=args.workers):
+        starts = ", ".join(f"{segment['start']:.1f}s" for segment in analysis["segments"])
+        print(f"{analysis['video_id']}\t{starts or 'FAILED: ' + analysis['error']}")
@@ -0,0 +1,63 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Modules import config at import time, so the environment is set first.
+_DB_DIR = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}")
+for _name in ("REDDIT_CLIENT_ID", "REDDIT_CLIENT_SECRET", "REDDIT_USER_AGENT"):
+    os.environ.setdefault(_name, "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session, SQLModel  # noqa: E402
+
+from config import engine  # noqa: E402
+from response_cache import post_pages, video_pages  # noqa: E402
+from util import create_db_and_tables  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """The test database with every table emptied, and empty page caches."""
+    create_db_and_tables()
+    with Session(engine) as session:
+        for table in reversed(SQLModel.metadata.sorted_tables):
+            session.execute(table.delete())
+        session.commit()
+    post_pages.clear()
+    video_pages.clear()
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def client(db):
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def fake_reddit(monkeypatch):
+    """The shared Reddit client pointed at a local fake of Reddit's API."""
+    from bench.fakes import FakeServer
+    from reddit_client import RateGovernor, reddit_client
+    from reddit_posts import listing_cache
+
+    server = FakeServer().start()
+    monkeypatch.setattr(reddit_client, "governor", RateGovernor())
+    monkeypatch.setattr(reddit_client, "reddit", reddit_client.connect(
+        username="test_user",
+        password="test",
+        oauth_url=server.url,
+        reddit_url=server.url,
+    ))
+    listing_cache.invalidate()
+    yield server
+    listing_cache.invalidate()
+    server.stop()
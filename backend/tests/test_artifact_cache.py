@@ -0,0 +1,154 @@
+import os
+
+import pytest
+
+import bucket_upload
+import captions
+import video_generator
+from artifact_cache import ArtifactCache
+from bench.fakes import FakeStorageClient
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    client = FakeStorageClient(bandwidth=0)
+    monkeypatch.setattr(bucket_upload, "get_storage_client", lambda: client)
+    return client.bucket("bucket")
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ArtifactCache(root=str(tmp_path / "cache"), max_bytes=1024 ** 3)
+    monkeypatch.setattr(video_generator, "get_artifact_cache", lambda: cache)
+    monkeypatch.setattr(captions, "get_artifact_cache", lambda: cache)
+    return cache
+
+
+def _fake_ffmpeg(command: list[str]) -> None:
+    # Stands in for ffmpeg: the output is the inputs, concatenated.
+    inputs = [command[i + 1] for i, arg in enumerate(command) if arg == "-i"]
+    with open(command[-1], "wb") as output:
+        for path in inputs:
+            with open(path, "rb") as source:
+                output.write(source.read())
+
+
+def _read(entry) -> bytes:
+    with entry as path, open(path, "rb") as source:
+        return source.read()
+
+
+def _writer(data: bytes):
+    def produce(tmp_path: str) -> None:
+        with open(tmp_path, "wb") as output:
+            output.write(data)
+    return produce
+
+
+def _files(cache: ArtifactCache, suffix: str) -> list[str]:
+    return sorted(
+        name
+        for directory, _, files in os.walk(cache.root)
+        if directory != cache.root
+        for name in files
+        if name.endswith(suffix)
+    )
+
+
+def test_blob_version_follows_content(bucket):
+    bucket.store("audio/a1.wav", b"first take")
+    first = bucket_upload.blob_version("gs://bucket/audio/a1.wav")
+    assert first.startswith("md5:")
+    assert bucket_upload.blob_version("gs://bucket/audio/a1.wav") == first
+
+    bucket.store("audio/a1.wav", b"second take")
+    assert bucket_upload.blob_version("gs://bucket/audio/a1.wav") != first
+
+    with pytest.raises(FileNotFoundError):
+        bucket_upload.blob_version("gs://bucket/audio/missing.wav")
+
+
+def test_cached_source_refetches_rewritten_object(bucket, cache):
+    bucket.store("audio/a1.wav", b"first take")
+    assert _read(video_generator.cached_source(cache, "gs://bucket/audio/a1.wav")) == b"first take"
+
+    bucket.store("audio/a1.wav", b"second take")
+    assert _read(video_generator.cached_source(cache, "gs://bucket/audio/a1.wav")) == b"second take"
+
+
+def test_render_uses_new_narration(bucket, cache, monkeypatch):
+    monkeypatch.setattr(video_generator, "run_ffmpeg", _fake_ffmpeg)
+    monkeypatch.setattr(video_generator, "GCS_BUCKET_NAME", "bucket")
+    bucket.store("videos/v1.mp4", b"[video]")
+    bucket.store("audio/a1.wav", b"[first take]")
+    job = {"post_id": "a1", "video_id": 1, "video_path": "gs://bucket/videos/v1.mp4", "audio_path": "gs://bucket/audio/a1.wav"}
+
+    assert video_generator.render_reel(job)["error"] is None
+    assert bucket.objects["reels/a1_1.mp4"] == b"[video][first take]"
+
+    bucket.store("audio/a1.wav", b"[second take]")
+    assert video_generator.render_reel(job)["error"] is None
+    assert bucket.objects["reels/a1_1.mp4"] == b"[video][second take]"
+
+
+def test_caption_audio_follows_new_narration(bucket, cache):
+    bucket.store("audio/a1.wav", b"first take")
+    assert _read(captions._cached_pcm("gs://bucket/audio/a1.wav")) == b"first take"
+
+    bucket.store("audio/a1.wav", b"second take")
+    assert _read(captions._cached_pcm("gs://bucket/audio/a1.wav")) == b"second take"
+
+
+def test_eviction_keeps_cache_within_max_bytes(cache):
+    cache.max_bytes = 250
+    for index in range(5):
+        cache.get_or_create("blob", str(index), {}, _writer(b"x" * 100))
+        assert cache.stats()["bytes"] <= 250
+
+    # Only the two most recently used entries remain.
+    assert cache.stats()["entries"] == 2
+    assert _read(cache.entry("blob", "4", {}, _writer(b"new"))) == b"x" * 100
+
+
+def test_eviction_skips_held_entries(cache):
+    cache.max_bytes = 250
+    with cache.entry("blob", "held", {}, _writer(b"x" * 100)) as held:
+        for index in range(4):
+            cache.get_or_create("blob", str(index), {}, _writer(b"x" * 100))
+        assert os.path.exists(held)
+        assert cache.stats()["bytes"] <= 250
+
+    cache.get_or_create("blob", "after", {}, _writer(b"x" * 100))
+    assert not os.path.exists(held)
+
+
+def test_lock_files_are_removed_with_entries(cache):
+    cache.max_bytes = 250
+    for index in range(5):
+        cache.get_or_create("blob", str(index), {}, _writer(b"x" * 100))
+
+    assert cache.stats()["entries"] == 2
+    assert len(_files(cache, ".lock")) == 2
+
+
+def test_failed_producer_leaves_no_lock_file(cache):
+    def fail(tmp_path: str) -> None:
+        raise RuntimeError("ffmpeg failed")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_create("blob", "broken", {}, fail)
+
+    assert _files(cache, "") == []
+
+
+def test_counts_are_flushed_in_batches(cache):
+    stats_path = os.path.join(cache.root, "stats.json")
+    cache.get_or_create("blob", "a", {}, _writer(b"a"))
+    cache.get_or_create("blob", "a", {}, _writer(b"a"))
+    assert not os.path.exists(stats_path)
+
+    # Another process sharing the cache sees the counts once they're flushed.
+    other = ArtifactCache(root=cache.root)
+    assert other.counts() == {"hits": 0, "misses": 0}
+    assert cache.counts() == {"hits": 1, "misses": 1}
+    assert other.counts() == {"hits": 1, "misses": 1}
@@ -0,0 +1,151 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+
+import bucket_upload
+from bench.fakes import FakeStorageClient
+from bucket_upload import upload_downloaded_files, upload_file_to_bucket, upload_stream_to_bucket
+
+
+class RecordingStorageClient(FakeStorageClient):
+    """FakeStorageClient recording each transfer's size and the peak number in flight."""
+
+    def __init__(self, transfer_seconds: float = 0.0):
+        super().__init__(bandwidth=0)
+        self.transfer_seconds = transfer_seconds
+        self.transfers = []
+        self.peak = 0
+        self._active = 0
+        self._active_lock = threading.Lock()
+
+    def transfer(self, size: int) -> None:
+        with self._active_lock:
+            self._active += 1
+            self.peak = max(self.peak, self._active)
+            self.transfers.append(size)
+        time.sleep(self.transfer_seconds)
+        with self._active_lock:
+            self._active -= 1
+
+
+@pytest.fixture
+def storage_client(monkeypatch):
+    client = RecordingStorageClient()
+    monkeypatch.setattr(bucket_upload, "get_storage_client", lambda: client)
+    return client
+
+
+def _write(directory, name: str, data: bytes) -> None:
+    with open(os.path.join(directory, name), "wb") as out:
+        out.write(data)
+
+
+def test_storage_client_is_shared_per_process(monkeypatch):
+    created = []
+
+    def make_client():
+        created.append(object())
+        return created[-1]
+
+    monkeypatch.setattr(bucket_upload.storage, "Client", make_client)
+    monkeypatch.setattr(bucket_upload, "_client", None)
+    monkeypatch.setattr(bucket_upload, "_client_pid", None)
+
+    first = bucket_upload.get_storage_client()
+    assert bucket_upload.get_storage_client() is first
+    assert len(created) == 1
+
+    # As seen by a forked child: the parent's client must not be reused.
+    monkeypatch.setattr(bucket_upload, "_client_pid", os.getpid() + 1)
+    assert bucket_upload.get_storage_client() is not first
+    assert len(created) == 2
+
+
+def test_upload_skips_identical_blob(storage_client, tmp_path):
+    _write(tmp_path, "clip.mp4", b"footage")
+    path = upload_file_to_bucket("clip.mp4", bucket_name="bucket", local_dir=str(tmp_path))
+    assert path == "gs://bucket/videos/clip.mp4"
+    assert storage_client.bucket("bucket").objects["videos/clip.mp4"] == b"footage"
+    assert not os.path.exists(tmp_path / "clip.mp4")
+    assert len(storage_client.transfers) == 1
+
+    _write(tmp_path, "clip.mp4", b"footage")
+    assert upload_file_to_bucket("clip.mp4", bucket_name="bucket", local_dir=str(tmp_path)) == path
+    assert len(storage_client.transfers) == 1
+    assert not os.path.exists(tmp_path / "clip.mp4")
+
+    _write(tmp_path, "clip.mp4", b"new footage")
+    upload_file_to_bucket("clip.mp4", bucket_name="bucket", local_dir=str(tmp_path))
+    assert len(storage_client.transfers) == 2
+    assert storage_client.bucket("bucket").objects["videos/clip.mp4"] == b"new footage"
+
+
+def test_upload_uses_chunk_size(storage_client, tmp_path, monkeypatch):
+    blobs = []
+    bucket = storage_client.bucket("bucket")
+    make_blob = bucket.blob
+
+    def record_blob(*args, **kwargs):
+        blobs.append(make_blob(*args, **kwargs))
+        return blobs[-1]
+
+    monkeypatch.setattr(bucket, "blob", record_blob)
+
+    _write(tmp_path, "clip.mp4", b"footage")
+    upload_file_to_bucket("clip.mp4", bucket_name="bucket", local_dir=str(tmp_path), chunk_size=256 * 1024)
+
+    assert [blob.chunk_size for blob in blobs] == [256 * 1024]
+
+
+def test_stream_upload_sends_resumable_chunks(storage_client):
+    chunk_size = 256 * 1024
+    data = os.urandom(2 * chunk_size + 1000)
+
+    path = upload_stream_to_bucket(io.BytesIO(data), "clip.mp4", bucket_name="bucket", chunk_size=chunk_size, read_size=64 * 1024)
+
+    assert path == "gs://bucket/videos/clip.mp4"
+    assert storage_client.bucket("bucket").objects["videos/clip.mp4"] == data
+    assert storage_client.transfers == [chunk_size, chunk_size, 1000]
+
+
+def test_stream_upload_cancelled_when_source_fails(storage_client):
+    class FailingSource:
+        def __init__(self):
+            self.reads = 0
+
+        def read(self, size: int) -> bytes:
+            self.reads += 1
+            if self.reads > 2:
+                raise OSError("download failed")
+            return b"x" * size
+
+    with pytest.raises(OSError):
+        upload_stream_to_bucket(FailingSource(), "clip.mp4", bucket_name="bucket", chunk_size=256 * 1024)
+
+    assert storage_client.bucket("bucket").objects == {}
+
+
+def test_concurrent_uploads_are_capped(storage_client, tmp_path):
+    storage_client.transfer_seconds = 0.05
+    for index in range(6):
+        _write(tmp_path, f"clip{index}.mp4", f"footage {index}".encode())
+
+    paths = upload_downloaded_files(download_dir=str(tmp_path), bucket_name="bucket", max_workers=2)
+
+    assert paths == [f"gs://bucket/videos/clip{index}.mp4" for index in range(6)]
+    assert storage_client.peak == 2
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_upload_is_left_out(storage_client, tmp_path, monkeypatch):
+    def fail_transfer(size: int) -> None:
+        raise ConnectionError("connection reset")
+
+    _write(tmp_path, "clip.mp4", b"footage")
+    monkeypatch.setattr(storage_client, "transfer", fail_transfer)
+
+    assert upload_downloaded_files(download_dir=str(tmp_path), bucket_name="bucket") == []
+    assert os.listdir(tmp_path) == ["clip.mp4"]
@@ -0,0 +1,22 @@
+import io
+
+import pyarrow.parquet
+
+from models import Post
+
+
+def test_parquet_export_round_trips(client, db):
+    db.add(Post(id="a1", title="t", url="u", content="c", subreddit="AITA", used=True))
+    db.commit()
+
+    exported = client.get("/posts/export", params={"format": "parquet"})
+    assert exported.status_code == 200
+    assert pyarrow.parquet.read_table(io.BytesIO(exported.content)).to_pylist()[0]["id"] == "a1"
+
+    db.delete(db.get(Post, "a1"))
+    db.commit()
+    imported = client.post("/posts/import", params={"format": "parquet"}, content=exported.content)
+    assert imported.json()["imported"] == 1
+
+    db.expire_all()
+    assert db.get(Post, "a1").used is True
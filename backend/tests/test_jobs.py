@@ -0,0 +1,59 @@
+import threading
+import time
+
+from jobs import JobStore
+
+
+def _wait_for(job, *statuses: str, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while job.status not in statuses and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert job.status in statuses
+
+
+def test_busy_kind_does_not_hold_up_others():
+    store = JobStore(max_concurrent=2, limits={"render_reels": 1})
+    release = threading.Event()
+    try:
+        renders = [store.submit("render_reels", lambda job: release.wait(5)) for _ in range(2)]
+        _wait_for(renders[0], "running")
+        scrapes = [store.submit("scrape_videos", lambda job, game: game, game=game) for game in ("Minecraft", "Terraria")]
+
+        for scrape in scrapes:
+            _wait_for(scrape, "succeeded")
+        assert [scrape.result for scrape in scrapes] == ["Minecraft", "Terraria"]
+        # The render cap is one, so the second render still waits its turn.
+        assert [render.status for render in renders] == ["running", "queued"]
+    finally:
+        release.set()
+        for render in renders:
+            _wait_for(render, "succeeded")
+        store.shutdown()
+
+
+def test_kind_limit_caps_running_jobs():
+    store = JobStore(max_concurrent=3)
+    release = threading.Event()
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def work(job):
+        with lock:
+            running.append(job.id)
+            peak.append(len(running))
+        release.wait(5)
+        with lock:
+            running.remove(job.id)
+
+    try:
+        jobs = [store.submit("narrate_posts", work) for _ in range(5)]
+        threading.Timer(0.1, release.set).start()
+        for job in jobs:
+            _wait_for(job, "succeeded", "failed")
+    finally:
+        release.set()
+        store.shutdown()
+
+    assert all(job.status == "succeeded" for job in jobs)
+    assert max(peak) == 3
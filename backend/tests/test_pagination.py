@@ -0,0 +1,111 @@
+from sqlmodel import select
+
+from ingest import get_candidates_db
+from models import Post, PostCandidate, Video
+from reddit_posts import get_saved_posts_db
+from youtube_scrapper import get_videos_db
+
+
+def _walk(client, list_page, limit: int, cursor=None, **filters) -> list[list]:
+    """Follow next_cursor from `cursor` to the last page, returning each page's rows."""
+    pages = []
+    while True:
+        rows, cursor = client.portal.call(lambda: list_page(limit=limit, cursor=cursor, **filters))
+        pages.append(rows)
+        if cursor is None:
+            return pages
+        assert len(pages) < 50, "pagination did not terminate"
+
+
+def _post(post_id: str, **fields) -> Post:
+    values = {"title": "same", "url": "u", "content": "c", "subreddit": "AITA"}
+    return Post(id=post_id, **{**values, **fields})
+
+
+def test_post_pages_cover_identical_rows_once(client, db):
+    # Every column but the id ties, and rows are inserted out of order.
+    ids = ["p05", "p01", "p07", "p03", "p02", "p06", "p04"]
+    db.add_all(_post(post_id) for post_id in ids)
+    db.commit()
+
+    pages = _walk(client, get_saved_posts_db, limit=3)
+
+    assert [[post.id for post in page] for page in pages] == [["p01", "p02", "p03"], ["p04", "p05", "p06"], ["p07"]]
+
+
+def test_post_last_full_page_has_no_next_cursor(client, db):
+    db.add_all(_post(f"p{index}") for index in range(4))
+    db.commit()
+
+    posts, next_cursor = client.portal.call(lambda: get_saved_posts_db(limit=2, cursor="p1"))
+
+    assert [post.id for post in posts] == ["p2", "p3"]
+    assert next_cursor is None
+
+
+def test_post_cursor_is_stable_across_inserts(client, db):
+    db.add_all(_post(f"p{index}") for index in (1, 3, 5, 7))
+    db.commit()
+
+    first, cursor = client.portal.call(lambda: get_saved_posts_db(limit=2))
+    # A post sorting before the cursor and one after it arrive between pages.
+    db.add_all([_post("p0"), _post("p4")])
+    db.commit()
+    rest = _walk(client, get_saved_posts_db, limit=2, cursor=cursor)
+
+    assert [post.id for post in first] == ["p1", "p3"]
+    assert [post.id for page in rest for post in page] == ["p4", "p5", "p7"]
+
+
+def test_post_filters_apply_with_cursor(client, db):
+    db.add_all([
+        _post("p1"),
+        _post("p2", used=True),
+        _post("p3", subreddit="TIFU"),
+        _post("p4"),
+        _post("p5", used=True),
+        _post("p6"),
+        _post("p7"),
+    ])
+    db.commit()
+
+    pages = _walk(client, get_saved_posts_db, limit=2, used=False, subreddit="AITA")
+
+    assert [[post.id for post in page] for page in pages] == [["p1", "p4"], ["p6", "p7"]]
+    posts, next_cursor = client.portal.call(lambda: get_saved_posts_db(limit=2, cursor="p4", used=False, subreddit="AITA"))
+    assert [post.id for post in posts] == ["p6", "p7"]
+    assert next_cursor is None
+
+
+def test_video_pages_cover_every_video_once(client, db):
+    db.add_all(Video(title="same", file_path=f"gs://b/{index}.mp4", video_url=f"v{index}") for index in range(5))
+    db.commit()
+    ids = db.exec(select(Video.id).order_by(Video.id)).all()
+
+    pages = _walk(client, get_videos_db, limit=2)
+
+    assert [[video.id for video in page] for page in pages] == [ids[0:2], ids[2:4], ids[4:]]
+
+
+def test_video_last_full_page_has_no_next_cursor(client, db):
+    db.add_all(Video(title="same", file_path=f"gs://b/{index}.mp4", video_url=f"v{index}") for index in range(4))
+    db.commit()
+
+    pages = _walk(client, get_videos_db, limit=2)
+
+    assert [len(page) for page in pages] == [2, 2]
+    videos, next_cursor = client.portal.call(lambda: get_videos_db(limit=2, cursor=pages[-1][-1].id))
+    assert videos == [] and next_cursor is None
+
+
+def test_candidate_cursor_breaks_created_utc_ties_by_id(client, db):
+    created = {"c1": 300.0, "c2": 200.0, "c3": 200.0, "c4": 200.0, "c5": 200.0, "c6": 100.0}
+    db.add_all(
+        PostCandidate(id=post_id, multireddit="Stories", title="t", url="u", content="c", subreddit="AITA", created_utc=created_utc)
+        for post_id, created_utc in created.items()
+    )
+    db.commit()
+
+    pages = _walk(client, get_candidates_db, limit=2)
+
+    assert [[candidate.id for candidate in page] for page in pages] == [["c1", "c5"], ["c4", "c3"], ["c2", "c6"]]
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from reddit_client import SingleFlight, reddit_client
+from reddit_posts import get_posts_from_subreddit, listing_cache
+
+
+def _wait_for(condition, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert condition()
+
+
+def test_async_callers_share_a_sync_flight():
+    flights = SingleFlight()
+    release = threading.Event()
+    runs = []
+    leader_result = []
+
+    def fn():
+        runs.append(1)
+        release.wait(5)
+        return {"posts": 3}
+
+    leader = threading.Thread(target=lambda: leader_result.append(flights.do("hot", fn)))
+    leader.start()
+    _wait_for(lambda: flights.calls == 1)
+
+    async def waiters():
+        joined = asyncio.gather(flights.do_async("hot", fn), flights.do_async("hot", fn))
+        await asyncio.sleep(0)
+        release.set()
+        return await joined
+
+    results = asyncio.run(waiters())
+    leader.join()
+
+    assert results == leader_result * 2 == [{"posts": 3}, {"posts": 3}]
+    assert runs == [1]
+    assert (flights.calls, flights.shared) == (1, 2)
+
+
+def test_async_leader_error_reaches_every_caller():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise ValueError("listing failed")
+
+    async def callers():
+        first = asyncio.ensure_future(flights.do_async("hot", fn))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(flights.do_async("hot", fn))
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(first, second, return_exceptions=True)
+
+    results = asyncio.run(callers())
+
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert flights.calls == 1
+    assert flights._running == {}
+
+
+def test_cancelled_caller_leaves_the_flight_running():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    async def callers():
+        first = asyncio.ensure_future(flights.do_async("hot", lambda: release.wait(5) and "listing"))
+        second = asyncio.ensure_future(flights.do_async("hot", lambda: "unused"))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        return await second, first.cancelled()
+
+    assert asyncio.run(callers()) == ("listing", True)
+    assert (flights.calls, flights.shared) == (1, 1)
+
+
+def test_async_listing_goes_through_the_shared_governor(fake_reddit):
+    assert reddit_client.governor.status()["remaining"] is None
+
+    async def listings():
+        return await asyncio.gather(
+            get_posts_from_subreddit("Stories", limit=3),
+            asyncio.to_thread(reddit_client.call, lambda reddit: "sync", None),
+        )
+
+    posts, sync_result = asyncio.run(listings())
+
+    assert len(json.loads(posts)) == 3
+    assert sync_result == "sync"
+    status = reddit_client.governor.status()
+    assert status["remaining"] == pytest.approx(996.0)
+    assert status["in_flight"] == 0
+
+
+def test_reddit_route_serves_cached_listing(client, fake_reddit):
+    first = client.get("/reddit", params={"subreddit": "Stories", "limit": 2})
+    hits = listing_cache.hits
+    second = client.get("/reddit", params={"subreddit": "Stories", "limit": 2})
+
+    assert first.status_code == 200
+    assert len(json.loads(first.json()["posts"])) == 2
+    assert second.json() == first.json()
+    assert listing_cache.hits == hits + 1
@@ -0,0 +1,56 @@
+import tts
+from models import Post
+
+
+def _seed(db, *posts: Post) -> None:
+    for post in posts:
+        db.add(post)
+    db.commit()
+
+
+def test_narration_invalidates_filtered_page(client, db, monkeypatch):
+    _seed(
+        db,
+        Post(id="a1", title="t", url="u", content="One. Two.", subreddit="AITA"),
+        Post(id="a2", title="t", url="u", content="One.", subreddit="AITA", audio_file_url="gs://b/audio/a2.wav"),
+    )
+    monkeypatch.setattr(tts, "narrate_post", lambda post, pool: f"gs://b/audio/{post.id}.wav")
+
+    params = {"used": "false", "has_audio": "true"}
+    page = client.get("/posts", params=params)
+    assert [post["id"] for post in page.json()["posts"]] == ["a2"]
+
+    result = tts.narrate_posts(["a1"])
+    assert result == {"narrated": {"a1": "gs://b/audio/a1.wav"}, "failed": {}}
+
+    refreshed = client.get("/posts", params=params, headers={"If-None-Match": page.headers["etag"]})
+    assert refreshed.status_code == 200
+    assert [post["id"] for post in refreshed.json()["posts"]] == ["a1", "a2"]
+
+
+def test_unchanged_page_revalidates(client, db):
+    _seed(db, Post(id="a1", title="t", url="u", content="c", subreddit="AITA"))
+
+    page = client.get("/posts")
+    assert page.headers["cache-control"] == "no-cache"
+
+    cached = client.get("/posts", headers={"If-None-Match": page.headers["etag"]})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+
+def test_write_keeps_unrelated_pages(client, db):
+    _seed(
+        db,
+        Post(id="a1", title="t", url="u", content="c", subreddit="AITA"),
+        Post(id="t1", title="t", url="u", content="c", subreddit="TIFU"),
+    )
+    aita = client.get("/posts", params={"subreddit": "AITA"})
+    tifu = client.get("/posts", params={"subreddit": "TIFU"})
+
+    assert client.patch("/posts/t1/use").status_code == 200
+
+    headers = {"If-None-Match": aita.headers["etag"]}
+    assert client.get("/posts", params={"subreddit": "AITA"}, headers=headers).status_code == 304
+    headers = {"If-None-Match": tifu.headers["etag"]}
+    assert client.get("/posts", params={"subreddit": "TIFU"}, headers=headers).status_code == 200
@@ -0,0 +1,59 @@
+from sqlmodel import select
+
+from models import Post
+from reddit_client import reddit_client
+from reddit_posts import save_posts_batch_db
+
+
+def test_batch_reports_saved_duplicate_and_not_found(db, fake_reddit):
+    db.add(Post(id="b00003", title="kept", url="u", content="c", subreddit="AITA"))
+    db.commit()
+
+    result = save_posts_batch_db(["t3_b00001", "b00002", " b00001 ", "b00003", "zzzzz", "  "])
+
+    assert result == {"saved": ["b00001", "b00002"], "duplicate": ["b00003"], "not_found": ["zzzzz"]}
+    # Already saved posts aren't looked up again.
+    assert fake_reddit.info_requests == [["t3_b00001", "t3_b00002", "t3_zzzzz"]]
+    db.expire_all()
+    assert db.get(Post, "b00003").title == "kept"
+    assert db.get(Post, "b00001").title == "AITA for benchmark post 1?"
+
+
+def test_post_saved_during_lookup_is_a_duplicate(db, fake_reddit, monkeypatch):
+    call = reddit_client.call
+
+    def call_after_concurrent_save(fn, key=None):
+        # Another request saves b00002 while this one waits on Reddit.
+        db.add(Post(id="b00002", title="first", url="u", content="c", subreddit="AITA"))
+        db.commit()
+        return call(fn, key)
+
+    monkeypatch.setattr(reddit_client, "call", call_after_concurrent_save)
+
+    result = save_posts_batch_db(["b00001", "b00002"])
+
+    assert result == {"saved": ["b00001"], "duplicate": ["b00002"], "not_found": []}
+    db.expire_all()
+    assert db.get(Post, "b00002").title == "first"
+    assert len(db.exec(select(Post)).all()) == 2
+
+
+def test_batch_route_looks_up_fullnames_in_hundreds(client, db, fake_reddit):
+    post_ids = [f"b{index:05x}" for index in range(250)]
+
+    response = client.post("/posts/batch", json={"post_ids": post_ids})
+
+    assert response.status_code == 200
+    assert response.json()["saved"] == post_ids
+    assert [len(names) for names in fake_reddit.info_requests] == [100, 100, 50]
+    assert [name for names in fake_reddit.info_requests for name in names] == [f"t3_{post_id}" for post_id in post_ids]
+    assert len(db.exec(select(Post)).all()) == 250
+
+
+def test_batch_route_rejects_invalid_payloads(client, db, fake_reddit):
+    assert client.post("/posts/batch", json={"post_ids": "b00001"}).status_code == 422
+    assert client.post("/posts/batch", json={"post_ids": ["b00001"] * 1001}).status_code == 422
+
+    response = client.post("/posts/batch", json={"post_ids": ["", "   "]})
+    assert response.json() == {"saved": [], "duplicate": [], "not_found": []}
+    assert fake_reddit.info_requests == []
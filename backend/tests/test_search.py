@@ -0,0 +1,43 @@
+from sqlalchemy import text
+
+from models import Post
+
+
+def _search(client, query: str) -> list[str]:
+    response = client.get("/posts/search", params={"q": query})
+    assert response.status_code == 200
+    return [result["post"]["id"] for result in response.json()["results"]]
+
+
+def test_search_follows_edits_and_deletes(client, db):
+    db.add(Post(id="a1", title="Dragons at dawn", url="u", content="c", subreddit="AITA"))
+    db.add(Post(id="a2", title="Quiet evening", url="u", content="No dragons here", subreddit="AITA"))
+    db.commit()
+    assert _search(client, "dragons") == ["a1", "a2"]
+
+    post = db.get(Post, "a1")
+    post.title = "Knights at dawn"
+    db.commit()
+    assert _search(client, "dragons") == ["a2"]
+    assert _search(client, "knights") == ["a1"]
+
+    # Renaming a post keeps its index row.
+    db.execute(text("UPDATE post SET id = 'a3' WHERE id = 'a1'"))
+    db.commit()
+    assert _search(client, "knights") == ["a3"]
+
+    db.delete(db.get(Post, "a2"))
+    db.commit()
+    assert _search(client, "dragons") == []
+    assert db.execute(text("SELECT count(*) FROM post_fts")).scalar() == 1
+
+
+def test_import_reindexes_upserted_posts(client, db):
+    db.add(Post(id="a1", title="Dragons", url="u", content="c", subreddit="AITA"))
+    db.commit()
+
+    body = '{"id": "a1", "title": "Castles", "url": "u", "content": "c", "subreddit": "AITA"}\n'
+    assert client.post("/posts/import", content=body).json()["imported"] == 1
+
+    assert _search(client, "dragons") == []
+    assert _search(client, "castles") == ["a1"]
@@ -0,0 +1,34 @@
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from models import Post
+from util import upsert_rows
+
+
+@pytest.fixture(params=["sqlite", "generic"])
+def session(request):
+    engine = create_engine("sqlite://")
+    if request.param == "generic":
+        # Takes the portable path used on backends without ON CONFLICT.
+        engine.dialect.name = "generic"
+    SQLModel.metadata.create_all(engine, tables=[Post.__table__])
+    with Session(engine) as session:
+        yield session
+
+
+def test_upsert_rows_inserts_and_updates(session):
+    upsert_rows(session, Post, [
+        {"id": "a1", "title": "old", "url": "u", "content": "c", "subreddit": "AITA"},
+        {"id": "a2", "title": "t", "url": "u", "content": "c", "subreddit": "AITA"},
+    ], ["id"])
+    session.commit()
+
+    upsert_rows(session, Post, [
+        {"id": "a1", "title": "new", "url": "u", "content": "c", "subreddit": "AITA"},
+        {"id": "a3", "title": "t", "url": "u", "content": "c", "subreddit": "TIFU"},
+    ], ["id"])
+    session.commit()
+
+    posts = session.exec(select(Post).order_by(Post.id)).all()
+    assert [(post.id, post.title) for post in posts] == [("a1", "new"), ("a2", "t"), ("a3", "t")]
+
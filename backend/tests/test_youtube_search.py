@@ -0,0 +1,124 @@
+import os
+from contextlib import contextmanager
+
+import pytest
+
+import youtube_scrapper
+import youtube_search
+from bench.fakes import FIXTURES_DIR
+from youtube_search import extract_initial_data, parse_search_results, search_videos_http
+
+
+with open(os.path.join(FIXTURES_DIR, "youtube_search.html")) as fixture:
+    SEARCH_PAGE = fixture.read()
+
+CONSENT_PAGE = "<html><body><form action='https://consent.youtube.com/save'></form></body></html>"
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+        self.content = text.encode()
+
+    def raise_for_status(self) -> None:
+        pass
+
+
+class FakeSession:
+    def __init__(self, text: str):
+        self.text = text
+        self.requests = []
+
+    def get(self, url, **kwargs):
+        self.requests.append((url, kwargs))
+        return FakeResponse(self.text)
+
+
+def test_extract_initial_data():
+    data = extract_initial_data(SEARCH_PAGE)
+    assert "contents" in data
+
+    with pytest.raises(ValueError):
+        extract_initial_data(CONSENT_PAGE)
+
+
+def test_extract_initial_data_window_marker():
+    page = SEARCH_PAGE.replace("var ytInitialData = ", 'window["ytInitialData"] = ')
+    assert extract_initial_data(page) == extract_initial_data(SEARCH_PAGE)
+
+
+def test_parse_search_results():
+    videos = parse_search_results(SEARCH_PAGE)
+
+    assert [video["video_id"] for video in videos] == [f"bench{index:06d}" for index in range(7)]
+    assert videos[0] == {
+        "title": "Minecraft Gameplay (No Commentary)",
+        "link": "https://www.youtube.com/watch?v=bench000000",
+        "video_id": "bench000000",
+    }
+
+
+def test_search_keeps_gameplay_titles_up_to_limit():
+    session = FakeSession(SEARCH_PAGE)
+
+    videos = search_videos_http("minecraft gameplay no copyright", session=session)
+    assert [video["video_id"] for video in videos] == [
+        "bench000000", "bench000001", "bench000003", "bench000004", "bench000006",
+    ]
+    assert all("gameplay" in video["title"].lower() for video in videos)
+    assert session.requests[0][1]["params"] == {"search_query": "minecraft gameplay no copyright"}
+
+    videos = search_videos_http("minecraft gameplay no copyright", limit=2, session=session)
+    assert [video["video_id"] for video in videos] == ["bench000000", "bench000001"]
+
+
+def test_search_without_results_raises():
+    with pytest.raises(ValueError):
+        search_videos_http("minecraft", session=FakeSession(CONSENT_PAGE))
+
+
+class FakeDriverPool:
+    def __init__(self, page_source: str):
+        self.page_source = page_source
+        self.urls = []
+
+    @contextmanager
+    def checkout(self):
+        pool = self
+
+        class Browser:
+            page_source = pool.page_source
+
+            def get(self, url):
+                pool.urls.append(url)
+
+        yield Browser()
+
+
+def test_search_falls_back_to_selenium(monkeypatch):
+    monkeypatch.setattr(youtube_search.requests, "get", FakeSession(CONSENT_PAGE).get)
+    pool = FakeDriverPool(
+        '<div id="contents">'
+        '<a id="video-title" title="Minecraft Gameplay" href="/watch?v=sel1&pp=abc"></a>'
+        '<a id="video-title" title="Minecraft Trailer" href="/watch?v=sel2"></a>'
+        "</div>"
+    )
+    monkeypatch.setattr(youtube_scrapper, "driver_pool", pool)
+
+    videos = youtube_scrapper.search_gameplay_videos("Minecraft", backend="http")
+
+    assert len(pool.urls) == 1
+    assert videos == [
+        {"title": "Minecraft Gameplay", "link": "https://www.youtube.com/watch?v=sel1", "video_id": "sel1"},
+    ]
+
+
+def test_http_backend_skips_selenium_when_parsing_succeeds(monkeypatch):
+    monkeypatch.setattr(youtube_search.requests, "get", FakeSession(SEARCH_PAGE).get)
+    pool = FakeDriverPool("")
+    monkeypatch.setattr(youtube_scrapper, "driver_pool", pool)
+
+    videos = youtube_scrapper.search_gameplay_videos("Minecraft", backend="http")
+
+    assert len(videos) == 5
+    assert pool.urls == []
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded cache with time-based expiry and
+    stale-while-revalidate.
+
+    Entries younger than `ttl` are fresh. Entries older than `ttl` but
+    younger than `ttl + stale_ttl` are served as-is while a background
+    refresh runs. Older entries are reloaded inline. Once more than
+    `max_entries` are cached, the least recently used entry is evicted.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0, max_entries: int = 128):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._refreshing: set[Hashable] = set()
+        self._lock = threading.Lock()
+        self._refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+        # Running async refreshes, referenced so they aren't collected mid-flight.
+        self._refresh_tasks: set[asyncio.Task] = set()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], bypass: bool = False) -> Any:
+        """
+        Return the cached value for `key`, calling `loader` when needed.
+
+        :param key: Cache key.
+        :param loader: Zero-argument callable producing a fresh value.
+        :param bypass: Skip the cached value and reload, storing the result.
+        :return: The cached or freshly loaded value.
+        """
+        if not bypass:
+            found, value = self._lookup(key, lambda: self._refresh_pool.submit(self._refresh, key, loader))
+            if found:
+                return value
+
+        value = loader()
+        self._store(key, value)
+        return value
+
+    async def get_or_load_async(self, key: Hashable, loader: Callable[[], Awaitable[Any]], bypass: bool = False) -> Any:
+        """
+        get_or_load() for the event loop; background refreshes run as tasks.
+
+        :param key: Cache key.
+        :param loader: Zero-argument coroutine function producing a fresh value.
+        :param bypass: Skip the cached value and reload, storing the result.
+        :return: The cached or freshly loaded value.
+        """
+        if not bypass:
+            found, value = self._lookup(key, lambda: self._spawn_refresh(key, loader))
+            if found:
+                return value
+
+        value = await loader()
+        self._store(key, value)
+        return value
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        """Drop one key, or every entry when `key` is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _lookup(self, key: Hashable, refresh: Callable[[], Any]) -> tuple[bool, Any]:
+        """Return (True, value) on a hit, calling `refresh` once when the value is stale."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry[0]
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    if age >= self.ttl and key not in self._refreshing:
+                        self._refreshing.add(key)
+                        refresh()
+                    return True, entry[1]
+            self.misses += 1
+        return False, None
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]) -> None:
+        try:
+            self._store(key, loader())
+        except Exception as ex:
+            # Keep serving the stale value; the next request retries.
+            logging.warning("Background refresh of %r failed: %s", key, ex)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _spawn_refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> None:
+        task = asyncio.get_running_loop().create_task(self._refresh_async(key, loader))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _refresh_async(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            self._store(key, await loader())
+        except Exception as ex:
+            logging.warning("Background refresh of %r failed: %s", key, ex)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,181 @@
+import hashlib
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from fastapi import HTTPException
+from sqlmodel import Session, select
+
+from artifact_cache import get_artifact_cache
+from bucket_upload import upload_file_to_bucket
+from config import GCS_BUCKET_NAME, TTS_COMMAND, TTS_RATE, TTS_VOICE, TTS_WORKERS, engine
+from models import Post
+from response_cache import post_pages
+
+
+# Pause inserted between sentences when joining, in seconds.
+SENTENCE_GAP = 0.25
+
+# Sentence end: whitespace after terminal punctuation (optionally closed by a
+# quote or bracket), or a line break.
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|(?<=[.!?][\"')\]])\s+|\s*\n+\s*")
+
+
+def split_sentences(text: str) -> list[str]:
+    """
+    Split post text into sentences for synthesis.
+
+    :param text: Post title or body.
+    :return: Non-empty sentences, in order.
+    """
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence and sentence.strip()]
+
+
+def _sentence_artifact(sentence: str) -> dict:
+    # Artifact cache arguments for one sentence's audio.
+    def produce(tmp_path: str) -> None:
+        command = [TTS_COMMAND, "-v", TTS_VOICE, "-s", str(TTS_RATE), "-w", tmp_path, "--stdin"]
+        completed = subprocess.run(command, input=sentence, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"{TTS_COMMAND} exited {completed.returncode}: {completed.stderr.strip()}")
+
+    return {
+        "kind": "tts",
+        "source": hashlib.sha256(sentence.encode()).hexdigest(),
+        "params": {"engine": TTS_COMMAND, "voice": TTS_VOICE, "rate": TTS_RATE},
+        "producer": produce,
+        "suffix": ".wav",
+    }
+
+
+def synthesize_sentence(sentence: str) -> str:
+    """
+    Synthesize one sentence to WAV, reusing the cached audio when the same
+    text was voiced before with the same engine settings.
+
+    :param sentence: Text to speak.
+    :return: Path to the cached WAV file.
+    """
+    return get_artifact_cache().get_or_create(**_sentence_artifact(sentence))
+
+
+def sentence_audio(sentence: str):
+    """
+    synthesize_sentence() that keeps the WAV from being evicted until the
+    `with` block exits.
+
+    :param sentence: Text to speak.
+    :return: Context manager yielding the path to the cached WAV file.
+    """
+    return get_artifact_cache().entry(**_sentence_artifact(sentence))
+
+
+def join_wavs(paths: list[str], output_path: str, gap: float = SENTENCE_GAP) -> None:
+    """
+    Concatenate WAV files with `gap` seconds of silence between them.
+
+    :param paths: Input WAVs; must share channels, sample width and rate.
+    :param output_path: Destination WAV path.
+    :param gap: Silence between inputs, in seconds.
+    :raises ValueError: If the inputs have different formats.
+    """
+    with wave.open(output_path, "wb") as output:
+        params = None
+        for i, path in enumerate(paths):
+            with wave.open(path, "rb") as chunk:
+                chunk_params = (chunk.getnchannels(), chunk.getsampwidth(), chunk.getframerate())
+                if params is None:
+                    params = chunk_params
+                    output.setnchannels(params[0])
+                    output.setsampwidth(params[1])
+                    output.setframerate(params[2])
+                elif chunk_params != params:
+                    raise ValueError(f"WAV format mismatch in '{path}'")
+                if i:
+                    output.writeframes(b"\0" * int(gap * params[2]) * params[0] * params[1])
+                output.writeframes(chunk.readframes(chunk.getnframes()))
+
+
+def narrate_post(post: Post, pool: ThreadPoolExecutor) -> str:
+    """
+    Voice a post's title and body, upload the audio, and return its GCS path.
+
+    :param post: The saved post.
+    :param pool: Executor running the per-sentence synthesis.
+    :return: GCS path of the narration.
+    """
+    sentences = split_sentences(post.title) + split_sentences(post.content)
+    if not sentences:
+        raise ValueError(f"Post {post.id} has no text to narrate.")
+
+    # Each synthesis is its own TTS process, so threads spread work across cores.
+    list(pool.map(synthesize_sentence, sentences))
+
+    with ExitStack() as held, tempfile.TemporaryDirectory(prefix="tts-") as workdir:
+        # Now all cache hits; held so eviction can't remove them mid-join.
+        chunk_paths = [held.enter_context(sentence_audio(sentence)) for sentence in sentences]
+        file_name = f"{post.id}.wav"
+        join_wavs(chunk_paths, os.path.join(workdir, file_name))
+        return upload_file_to_bucket(
+            file_name=file_name,
+            bucket_name=GCS_BUCKET_NAME,
+            local_dir=workdir,
+            gcs_subdir="audio",
+        )
+
+
+def narrate_posts(post_ids: list[str], workers: int = TTS_WORKERS, job=None) -> dict:
+    """
+    Generate narration for saved posts and store it in `audio_file_url`.
+
+    Sentences are synthesized in parallel and cached by text, so a rerun
+    after an edit only voices the sentences that changed.
+
+    :param post_ids: IDs of saved posts.
+    :param workers: Concurrent TTS processes.
+    :param job: Optional jobs.Job to report per-post progress to.
+    :return: Dict mapping post ID to its audio GCS path under 'narrated',
+        and post ID to error message under 'failed'.
+    :raises HTTPException: 404 if any post is not saved.
+    """
+    with Session(engine) as session:
+        posts = session.exec(select(Post).where(Post.id.in_(post_ids))).all()
+    missing = set(post_ids) - {post.id for post in posts}
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Posts not found: {', '.join(sorted(missing))}")
+
+    narrated = {}
+    failed = {}
+    if job is not None:
+        job.report(stage="narrating")
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts") as pool:
+        for post in posts:
+            if job is not None:
+                job.report(item=post.id, status="narrating")
+            try:
+                narrated[post.id] = narrate_post(post, pool)
+            except Exception as ex:
+                logging.error("Failed to narrate post %s: %s", post.id, ex)
+                failed[post.id] = str(ex)
+                if job is not None:
+                    job.report(item=post.id, status="failed", error=str(ex))
+                continue
+
+            with Session(engine) as session:
+                saved_post = session.get(Post, post.id)
+                if saved_post is not None:
+                    before = saved_post.model_dump()
+                    saved_post.audio_file_url = narrated[post.id]
+                    session.add(saved_post)
+                    session.commit()
+                    session.refresh(saved_post)
+                    post_pages.invalidate(post.id, before=before, after=saved_post.model_dump())
+            if job is not None:
+                job.report(item=post.id, status="narrated", audio_file_url=narrated[post.id])
+
+    return {"narrated": narrated, "failed": failed}
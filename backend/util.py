@@ -1,9 +1,95 @@
-from sqlmodel import SQLModel, create_engine
-from config import DATABASE_URL
-
-engine = create_engine(DATABASE_URL, echo=True)
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, SQLModel
+from config import engine
+from migrations import run_migrations
 
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    run_migrations(engine)
+
+
+def insert_ignore_duplicates(session: Session, model: type[SQLModel], rows: list[dict]) -> set:
+    """
+    Bulk insert `rows`, skipping any whose primary key already exists.
+    Does not commit.
+
+    :param session: Open session to run the insert in.
+    :param model: Table model to insert into. Must have a single-column primary key.
+    :param rows: Column values, one dict per row.
+    :return: Primary keys of the rows that were inserted.
+    """
+    if not rows:
+        return set()
+
+    table = model.__table__
+    pk = list(table.primary_key.columns)[0]
+    dialect = session.get_bind().dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = (
+            dialect_insert(table)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=[pk])
+            .returning(pk)
+        )
+        return set(session.execute(statement).scalars().all())
+
+    # Other backends: filter out existing keys, then insert the rest.
+    keys = [row[pk.name] for row in rows]
+    existing = set(session.execute(select(pk).where(pk.in_(keys))).scalars())
+    new_rows = [row for row in rows if row[pk.name] not in existing]
+    if new_rows:
+        session.execute(insert(table), new_rows)
+    return {row[pk.name] for row in new_rows}
+
+
+def upsert_rows(session: Session, model: type[SQLModel], rows: list[dict], conflict_columns: list[str]) -> None:
+    """
+    Bulk insert `rows`, updating the other given columns of rows that
+    conflict on `conflict_columns`. Does not commit.
+
+    :param session: Open session to run the upsert in.
+    :param model: Table model to write to.
+    :param rows: Column values, one dict per row; all with the same keys.
+    :param conflict_columns: Primary key or unique columns identifying a row.
+    """
+    if not rows:
+        return
+
+    table = model.__table__
+    dialect = session.get_bind().dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = dialect_insert(table).values(rows)
+        updates = {name: statement.excluded[name] for name in rows[0] if name not in conflict_columns}
+        if updates:
+            statement = statement.on_conflict_do_update(index_elements=conflict_columns, set_=updates)
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=conflict_columns)
+        session.execute(statement)
+        return
+
+    # Other backends: find the rows that exist, update those and insert the rest.
+    key_columns = [table.c[name] for name in conflict_columns]
+    keys = [tuple(row[name] for name in conflict_columns) for row in rows]
+    if len(key_columns) == 1:
+        condition = key_columns[0].in_([key[0] for key in keys])
+    else:
+        condition = tuple_(*key_columns).in_(keys)
+    existing = set(session.execute(select(*key_columns).where(condition)).tuples())
 
+    new_rows = []
+    for key, row in zip(keys, rows):
+        if key not in existing:
+            new_rows.append(row)
+            continue
+        updates = {name: value for name, value in row.items() if name not in conflict_columns}
+        if updates:
+            match = [column == value for column, value in zip(key_columns, key)]
+            session.execute(update(table).where(*match).values(updates))
+    if new_rows:
+        session.execute(insert(table), new_rows)
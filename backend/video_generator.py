@@ -0,0 +1,305 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from fastapi import HTTPException
+from sqlmodel import Session, select
+
+from artifact_cache import ArtifactCache, get_artifact_cache
+from bucket_upload import blob_version, download_from_bucket, upload_file_to_bucket
+from config import (
+    FFMPEG_BIN,
+    GCS_BUCKET_NAME,
+    RENDER_MAX_SECONDS,
+    RENDER_PRESET,
+    RENDER_WORKERS,
+    engine,
+)
+from models import Post, Video, VideoSegment
+
+
+REEL_WIDTH = 1080
+REEL_HEIGHT = 1920
+
+# Center-crop to 9:16 whatever the source aspect, then scale to 1080x1920.
+_VIDEO_FILTER = (
+    "crop='min(iw,ih*9/16)':'min(ih,iw*16/9)',"
+    f"scale={REEL_WIDTH}:{REEL_HEIGHT},setsar=1,fps=30"
+)
+# EBU R128 loudness normalization to the usual short-form target.
+_AUDIO_FILTER = "loudnorm=I=-14:TP=-1.5:LRA=11"
+
+
+def build_segment_command(
+    video_path: str,
+    output_path: str,
+    start: float = 0.0,
+    max_seconds: float = RENDER_MAX_SECONDS,
+    threads: int = 1,
+) -> list[str]:
+    """
+    Build the ffmpeg command cutting a silent 9:16 segment from the
+    gameplay video. Uses only the CPU encoder (libx264).
+
+    :param video_path: Local gameplay video.
+    :param output_path: Destination .mp4 path.
+    :param start: Offset into the gameplay video, in seconds.
+    :param max_seconds: Segment length.
+    :param threads: Encoder threads for this ffmpeg process.
+    :return: The argument list for subprocess.
+    """
+    return [
+        FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-y",
+        # Input seeking jumps to the nearest keyframe instead of decoding up to `start`.
+        "-ss", f"{start:.3f}", "-t", f"{max_seconds:.3f}", "-i", video_path,
+        "-map", "0:v:0", "-an",
+        "-vf", _VIDEO_FILTER,
+        "-c:v", "libx264", "-preset", RENDER_PRESET, "-crf", "23", "-pix_fmt", "yuv420p",
+        "-threads", str(threads),
+        "-f", "mp4",
+        output_path,
+    ]
+
+
+def build_audio_command(audio_path: str, output_path: str) -> list[str]:
+    """
+    Build the ffmpeg command normalizing narration loudness to AAC.
+
+    :param audio_path: Local narration audio.
+    :param output_path: Destination .m4a path.
+    :return: The argument list for subprocess.
+    """
+    return [
+        FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-y",
+        "-i", audio_path,
+        "-map", "0:a:0", "-af", _AUDIO_FILTER, "-ar", "48000", "-ac", "2",
+        "-c:a", "aac", "-b:a", "160k",
+        "-f", "mp4",
+        output_path,
+    ]
+
+
+def build_mux_command(segment_path: str, audio_path: str, output_path: str) -> list[str]:
+    """
+    Build the ffmpeg command combining a segment and narration into the
+    final reel. Both streams are already encoded, so they are copied.
+
+    :param segment_path: Cached 9:16 video segment.
+    :param audio_path: Cached normalized narration.
+    :param output_path: Destination .mp4 path.
+    :return: The argument list for subprocess.
+    """
+    return [
+        FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-y",
+        "-i", segment_path, "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c", "copy", "-shortest",
+        "-movflags", "+faststart",
+        output_path,
+    ]
+
+
+def run_ffmpeg(command: list[str]) -> None:
+    """Run an ffmpeg command, raising RuntimeError with its stderr on failure."""
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited {completed.returncode}: {completed.stderr.strip()[-500:]}")
+
+
+@contextmanager
+def cached_source(cache: ArtifactCache, gcs_path: str, version: Optional[str] = None) -> Iterator[str]:
+    """
+    Local path of a GCS object, downloaded through the artifact cache and
+    held there until the `with` block exits.
+
+    Keyed by the object's content, so rewriting an object in place (as
+    narration is on every rerun) fetches the new version.
+
+    :param cache: The artifact cache.
+    :param gcs_path: Full "gs://bucket/blob" path.
+    :param version: The object's blob_version(), if the caller already has it.
+    :return: Context manager yielding the path to the cached file.
+    """
+    extension = os.path.splitext(gcs_path)[1]
+    with cache.entry(
+        "source",
+        version or blob_version(gcs_path),
+        {"extension": extension},
+        lambda tmp_path: download_from_bucket(gcs_path, tmp_path),
+        suffix=extension,
+    ) as path:
+        yield path
+
+
+def render_reel(job: dict) -> dict:
+    """
+    Render and upload a single reel. Runs inside a worker process.
+
+    The fetched sources, the cropped segment and the normalized narration
+    all go through the artifact cache, so reels sharing a gameplay video
+    or a post only pay for those steps once. Entries are keyed by the
+    sources' content, so new narration for a post is picked up.
+
+    :param job: Dict with 'post_id', 'video_id', 'audio_path' and
+        'video_path' (GCS paths), plus optional 'start' and 'threads'.
+    :return: Dict with 'gcs_path' set on success or 'error' on failure.
+    """
+    result = {"post_id": job["post_id"], "video_id": job["video_id"], "gcs_path": None, "error": None}
+    cache = get_artifact_cache()
+    start = job.get("start", 0.0)
+    threads = job.get("threads", 1)
+    try:
+        video_version = blob_version(job["video_path"])
+        audio_version = blob_version(job["audio_path"])
+
+        def cut_segment(tmp_path: str) -> None:
+            with cached_source(cache, job["video_path"], video_version) as video_path:
+                run_ffmpeg(build_segment_command(video_path=video_path, output_path=tmp_path, start=start, threads=threads))
+
+        def normalize_audio(tmp_path: str) -> None:
+            with cached_source(cache, job["audio_path"], audio_version) as audio_path:
+                run_ffmpeg(build_audio_command(audio_path=audio_path, output_path=tmp_path))
+
+        segment_params = {"start": start, "seconds": RENDER_MAX_SECONDS, "filter": _VIDEO_FILTER, "preset": RENDER_PRESET}
+        # Held while muxing so eviction can't remove them from under ffmpeg.
+        with (
+            cache.entry("segment", video_version, segment_params, cut_segment, suffix=".mp4") as segment,
+            cache.entry("audio", audio_version, {"filter": _AUDIO_FILTER}, normalize_audio, suffix=".m4a") as narration,
+            tempfile.TemporaryDirectory(prefix="reel-") as workdir,
+        ):
+            file_name = f"{job['post_id']}_{job['video_id']}.mp4"
+            run_ffmpeg(build_mux_command(segment, narration, os.path.join(workdir, file_name)))
+            result["gcs_path"] = upload_file_to_bucket(
+                file_name=file_name,
+                bucket_name=GCS_BUCKET_NAME,
+                local_dir=workdir,
+                gcs_subdir="reels",
+            )
+    except Exception as ex:
+        logging.error("Failed to render reel %s/%s: %s", job["post_id"], job["video_id"], ex)
+        result["error"] = str(ex)
+    return result
+
+
+def load_render_jobs(pairs: list[dict]) -> list[dict]:
+    """
+    Resolve (post_id, video_id) pairs to render jobs using the saved
+    Post audio and Video file paths. Pairs without a 'start' begin at the
+    video's best analyzed segment, or at 0 if it hasn't been analyzed.
+
+    :param pairs: List of dicts with 'post_id', 'video_id' and optional 'start'.
+    :return: List of render job dicts, in the same order.
+    :raises HTTPException: 404 if a post or video is missing, 400 if a post has no audio.
+    """
+    post_ids = {pair["post_id"] for pair in pairs}
+    video_ids = {pair["video_id"] for pair in pairs}
+    with Session(engine) as session:
+        posts = {post.id: post for post in session.exec(select(Post).where(Post.id.in_(post_ids)))}
+        videos = {video.id: video for video in session.exec(select(Video).where(Video.id.in_(video_ids)))}
+        best_starts = dict(session.exec(
+            select(VideoSegment.video_id, VideoSegment.start)
+            .where(VideoSegment.video_id.in_(video_ids), VideoSegment.rank == 0)
+        ).all())
+
+    jobs = []
+    for pair in pairs:
+        post = posts.get(pair["post_id"])
+        video = videos.get(pair["video_id"])
+        if post is None:
+            raise HTTPException(status_code=404, detail=f"Post {pair['post_id']} not found.")
+        if video is None:
+            raise HTTPException(status_code=404, detail=f"Video {pair['video_id']} not found.")
+        if not post.audio_file_url:
+            raise HTTPException(status_code=400, detail=f"Post {post.id} has no audio.")
+        jobs.append({
+            "post_id": post.id,
+            "video_id": video.id,
+            "audio_path": post.audio_file_url,
+            "video_path": video.file_path,
+            "start": pair.get("start") if pair.get("start") is not None else best_starts.get(video.id, 0.0),
+        })
+    return jobs
+
+
+def render_reels(pairs: list[dict], workers: int = RENDER_WORKERS, job=None) -> list[dict]:
+    """
+    Render many reels concurrently on a process pool, one ffmpeg process
+    per worker.
+
+    :param pairs: List of dicts with 'post_id' and 'video_id'.
+    :param workers: Number of worker processes. Defaults to the CPU count.
+    :param job: Optional jobs.Job to report per-reel progress to.
+    :return: One result dict per pair, in the same order, with 'gcs_path' or 'error'.
+    """
+    render_jobs = load_render_jobs(pairs)
+    if not render_jobs:
+        return []
+
+    workers = max(1, min(workers, len(render_jobs)))
+    # Split the cores between concurrent encodes so they don't oversubscribe.
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    for render_job in render_jobs:
+        render_job["threads"] = threads
+
+    def report(render_job: dict, **fields) -> None:
+        if job is not None:
+            job.report(item=f"{render_job['post_id']}:{render_job['video_id']}", **fields)
+
+    if job is not None:
+        job.report(stage="rendering")
+    for render_job in render_jobs:
+        report(render_job, status="queued")
+
+    results: list[Optional[dict]] = [None] * len(render_jobs)
+    # Spawned workers don't inherit the parent's threads, locks or DB connections.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {pool.submit(render_reel, render_job): i for i, render_job in enumerate(render_jobs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as ex:
+                logging.error("Render worker failed: %s", ex)
+                results[i] = {
+                    "post_id": render_jobs[i]["post_id"],
+                    "video_id": render_jobs[i]["video_id"],
+                    "gcs_path": None,
+                    "error": str(ex),
+                }
+            report(
+                render_jobs[i],
+                status="failed" if results[i]["error"] else "rendered",
+                gcs_path=results[i]["gcs_path"],
+            )
+
+    stats = get_artifact_cache().stats()
+    logging.info(
+        "Rendered %d reels; artifact cache hit rate %.0f%% (%d hits, %d misses)",
+        len(results), stats["hit_rate"] * 100, stats["hits"], stats["misses"],
+    )
+    return results
+
+
+def _parse_pair(value: str) -> dict:
+    post_id, _, video_id = value.partition(":")
+    if not post_id or not video_id.isdigit():
+        raise argparse.ArgumentTypeError(f"Expected POST_ID:VIDEO_ID, got '{value}'")
+    return {"post_id": post_id, "video_id": int(video_id)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render reels from saved posts and videos.")
+    parser.add_argument("pairs", nargs="+", type=_parse_pair, metavar="POST_ID:VIDEO_ID")
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS, help="Worker processes.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    for reel in render_reels(args.pairs, workers=args.workers):
+        print(f"{reel['post_id']}:{reel['video_id']}\t{reel['gcs_path'] or 'FAILED: ' + reel['error']}")
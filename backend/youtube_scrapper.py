@@ -1,108 +1,486 @@
 import logging
+import os
+import shlex
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import BinaryIO, Callable, Optional
+
 from selenium import webdriver  # type: ignore
 from selenium.webdriver.common.by import By  # type: ignore
-from selenium.webdriver.chrome.options import Options  # type: ignore
 from bs4 import BeautifulSoup  # type: ignore
 from yt_dlp import YoutubeDL  # type: ignore
 from fastapi import HTTPException
 from sqlmodel import Session, select
 from sqlalchemy.exc import IntegrityError, NoResultFound
 
-from bucket_upload import upload_downloaded_files
-from config import engine
+from bucket_upload import upload_file_to_bucket, upload_stream_to_bucket
+from config import (
+    GCS_BUCKET_NAME,
+    SCRAPE_DOWNLOAD_WORKERS,
+    SCRAPE_SEARCH_WORKERS,
+    SCRAPE_STREAM_FORMAT,
+    SCRAPE_STREAM_UPLOADS,
+    SCRAPE_TRANSFER_LIMIT,
+    SCRAPE_UPLOAD_WORKERS,
+    VIDEOGAMES_FILE,
+    YOUTUBE_SEARCH_BACKEND,
+    YTDLP_BIN,
+    async_session,
+    engine,
+)
+from driver_pool import driver_pool
+from games import read_games
+from metrics import in_context, record_bytes, stage, timed
 from models import Video
+from response_cache import video_pages
+from youtube_search import (
+    filter_gameplay_videos,
+    search_videos_http,
+    video_id_from_href,
+    youtube_link,
+)
+
+
+DOWNLOAD_DIR = "./video_downloads"
+
+# Shared by every scrape, so concurrent requests and jobs together never
+# run more than SCRAPE_TRANSFER_LIMIT downloads and uploads at once.
+transfer_slots = threading.BoundedSemaphore(SCRAPE_TRANSFER_LIMIT)
+
+# Called as progress(stage=..., item=..., **fields); see jobs.Job.report.
+ProgressCallback = Callable[..., None]
+
 
+def _no_progress(**_) -> None:
+    pass
+
+
+def load_games(path: str = VIDEOGAMES_FILE) -> list[str]:
+    """
+    Games listed in the games file; see games.read_games.
+
+    :param path: Path of the games file.
+    :return: Game names, without duplicates, in file order.
+    """
+    try:
+        return read_games(path)
+    except OSError as ex:
+        logging.error("load_games error reading '%s': %s", path, ex)
+        raise HTTPException(status_code=500, detail="Failed to read the games file.")
 
+
+@timed("youtube.grab_videos")
 def grab_videos(driver: webdriver.Chrome) -> list[dict]:
     """
     Extracts video metadata from the YouTube search results page.
     Filters by videos that contain 'gameplay' in the title.
 
     :param driver: Selenium WebDriver instance (Chrome).
-    :return: A list of dicts with 'title' and 'link'.
+    :return: A list of dicts with 'title', 'link' and 'video_id'.
     """
     page_soup = BeautifulSoup(driver.page_source, 'html.parser')
     video_soup = page_soup.find(id="contents")
     if not video_soup:
         return []
 
-    all_videos = video_soup.find_all(id="video-title")
-
-    # Filter by "gameplay" in the title.
-    gameplay_videos = []
-    for vid in all_videos:
+    all_videos = []
+    for vid in video_soup.find_all(id="video-title"):
         title = vid.get("title")
-        href = vid.get("href")
-        if title and href and "gameplay" in title.lower():
-            gameplay_videos.append({
-                "title": title,
-                "link": f"https://www.youtube.com/{href}"
-            })
+        video_id = video_id_from_href(vid.get("href") or "")
+        if title and video_id:
+            all_videos.append({"title": title, "link": youtube_link(video_id), "video_id": video_id})
 
-    # Limit to 5 videos.
-    return gameplay_videos[:5]
+    # Filter by "gameplay" in the title, limited to 5 videos.
+    return filter_gameplay_videos(all_videos, limit=5)
 
 
-def download_videos(videos: list[dict]) -> None:
+@timed("youtube.search")
+def search_gameplay_videos(game: str = "", backend: str = YOUTUBE_SEARCH_BACKEND) -> list[dict]:
     """
-    Downloads videos using yt-dlp.
+    Search YouTube for up to 5 gameplay videos of `game`.
 
-    :param videos: List of dicts with 'title' and 'link'.
-    :return: None
+    The "http" backend parses the results page without a browser and falls
+    back to a pooled Selenium driver if that fails.
+
+    :param game: Game to search footage for.
+    :param backend: "http" or "selenium".
+    :return: A list of dicts with 'title', 'link' and 'video_id'.
+    """
+    query = f"{game} gameplay no copyright"
+    if backend == "http":
+        try:
+            return search_videos_http(query, limit=5)
+        except Exception as ex:
+            logging.warning("HTTP search for '%s' failed, falling back to Selenium: %s", game, ex)
+
+    with driver_pool.checkout() as browser:
+        with stage("youtube.page_load"):
+            browser.get(f"https://www.youtube.com/results?search_query={game}+gameplay+no+copyright")
+        return grab_videos(driver=browser)
+
+
+@timed("ytdlp.download")
+def download_video(video: dict, download_dir: str = DOWNLOAD_DIR) -> str:
+    """
+    Downloads a single video using yt-dlp.
+
+    A fresh YoutubeDL instance is used per call since instances are not
+    safe to share between threads.
+
+    :param video: Dict with 'title' and 'link'.
+    :param download_dir: Local directory to download into.
+    :return: Local path of the downloaded file.
     """
     yt_opts = {
-        "paths": {"home": "./video_downloads"},
+        "paths": {"home": download_dir},
         "restrictfilenames": True,
+        "quiet": True,
     }
-    ydl = YoutubeDL(yt_opts)
+    with YoutubeDL(yt_opts) as ydl:
+        info = ydl.extract_info(video["link"], download=True)
+        # Merged formats can end with a different extension than the template.
+        downloads = info.get("requested_downloads") or []
+        if downloads and downloads[0].get("filepath"):
+            path = downloads[0]["filepath"]
+        else:
+            path = ydl.prepare_filename(info)
+    record_bytes("ytdlp.download", os.path.getsize(path))
+    return path
+
+
+class _ProcessOutput:
+    """
+    Reads a subprocess's stdout, raising at EOF if the process failed so a
+    truncated download is never committed as a complete upload.
+    """
+
+    def __init__(self, process: subprocess.Popen, stderr: BinaryIO):
+        self._process = process
+        self._stderr = stderr
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._process.stdout.read(size)
+        if not data:
+            returncode = self._process.wait()
+            if returncode != 0:
+                self._stderr.seek(0)
+                stderr = self._stderr.read().decode(errors="replace").strip()
+                raise RuntimeError(f"yt-dlp exited {returncode}: {stderr[-500:]}")
+        return data
+
 
-    for video in videos:
+@timed("ytdlp.stream")
+def stream_video_to_bucket(
+    video: dict,
+    bucket_name: str = GCS_BUCKET_NAME,
+    video_format: str = SCRAPE_STREAM_FORMAT,
+) -> str:
+    """
+    Pipe a yt-dlp download straight into a resumable GCS upload, so no
+    part of the video touches the local disk.
+
+    :param video: Dict with 'title' and 'link'.
+    :param bucket_name: Name of the GCS bucket.
+    :param video_format: yt-dlp format selector; must pick a single file,
+        since merging separate streams needs a seekable local file.
+    :return: The GCS path of the uploaded video.
+    """
+    yt_opts = {"format": video_format, "restrictfilenames": True, "quiet": True}
+    with stage("ytdlp.extract_info"), YoutubeDL(yt_opts) as ydl:
+        info = ydl.extract_info(video["link"], download=False)
+        file_name = os.path.basename(ydl.prepare_filename(info))
+
+    command = shlex.split(YTDLP_BIN) + [
+        "--quiet", "--no-warnings", "--no-part",
+        "-f", info.get("format_id") or video_format,
+        "-o", "-",
+        video["link"],
+    ]
+    # stderr goes to a file so a chatty yt-dlp can't block on a full pipe.
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr)
         try:
-            ydl.download([video["link"]])
-            logging.info("Downloaded: %s", video["title"])
-        except Exception:
-            logging.error("Failed to download: %s", video["link"])
+            return upload_stream_to_bucket(
+                source=_ProcessOutput(process, stderr),
+                file_name=file_name,
+                bucket_name=bucket_name,
+            )
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+
+def _stream_videos(videos: list[dict], results: list[dict], workers: int, progress: ProgressCallback) -> None:
+    def _stream(vid: dict) -> str:
+        with transfer_slots:
+            progress(item=vid["link"], status="streaming")
+            return stream_video_to_bucket(vid)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stream") as pool:
+        futures = {pool.submit(in_context(_stream), vid): i for i, vid in enumerate(videos)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i]["gcs_path"] = future.result()
+                progress(item=videos[i]["link"], status="uploaded", gcs_path=results[i]["gcs_path"])
+            except Exception as ex:
+                logging.error("Failed to stream %s: %s", videos[i]["link"], ex)
+                progress(item=videos[i]["link"], status="failed", error="stream failed")
+
+
+def download_and_upload_videos(
+    videos: list[dict],
+    download_workers: int = SCRAPE_DOWNLOAD_WORKERS,
+    upload_workers: int = SCRAPE_UPLOAD_WORKERS,
+    progress: Optional[ProgressCallback] = None,
+    stream: Optional[bool] = None,
+) -> list[dict]:
+    """
+    Downloads videos in parallel and uploads each one to GCS as soon as
+    its download finishes, while the remaining downloads keep running.
+    Transfers also count against the process-wide SCRAPE_TRANSFER_LIMIT.
 
+    In stream mode each download is piped directly into its upload
+    instead, with `download_workers` transfers at a time and nothing
+    written to local disk.
 
-def scrape_videos(game: str = "") -> list[dict]:
+    :param videos: List of dicts with 'title' and 'link'.
+    :param download_workers: Max concurrent yt-dlp downloads.
+    :param upload_workers: Max concurrent GCS uploads.
+    :param progress: Optional callback receiving per-video status updates.
+    :param stream: Stream instead of staging files. Defaults to SCRAPE_STREAM_UPLOADS.
+    :return: List of dicts with 'title', 'link', and 'gcs_path' (None on failure),
+        in the same order as `videos`.
     """
-    Uses Selenium to search YouTube for up to 5 gameplay videos,
+    progress = progress or _no_progress
+    results = [
+        {"title": vid["title"], "link": vid["link"], "gcs_path": None}
+        for vid in videos
+    ]
+    if not videos:
+        return results
+
+    for vid in videos:
+        progress(item=vid["link"], title=vid["title"], status="queued")
+
+    if SCRAPE_STREAM_UPLOADS if stream is None else stream:
+        _stream_videos(videos, results, download_workers, progress)
+        return results
+
+    # Each transfer holds a shared slot only while it runs, so a finished
+    # download never waits for an upload slot while holding its own.
+    def _download(vid: dict) -> str:
+        with transfer_slots:
+            progress(item=vid["link"], status="downloading")
+            return download_video(vid)
+
+    def _upload(vid: dict, local_path: str) -> str:
+        with transfer_slots:
+            progress(item=vid["link"], status="uploading")
+            return upload_file_to_bucket(
+                file_name=os.path.basename(local_path),
+                bucket_name=GCS_BUCKET_NAME,
+                local_dir=os.path.dirname(local_path),
+            )
+
+    with ThreadPoolExecutor(max_workers=upload_workers, thread_name_prefix="upload") as upload_pool:
+        upload_futures = {}
+
+        with ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix="download") as download_pool:
+            download_futures = {
+                download_pool.submit(in_context(_download), vid): i
+                for i, vid in enumerate(videos)
+            }
+
+            # Hand each finished download straight to the upload pool.
+            for future in as_completed(download_futures):
+                i = download_futures[future]
+                try:
+                    local_path = future.result()
+                    logging.info("Downloaded: %s", videos[i]["title"])
+                except Exception as ex:
+                    logging.error("Failed to download %s: %s", videos[i]["link"], ex)
+                    progress(item=videos[i]["link"], status="failed", error="download failed")
+                    continue
+
+                progress(item=videos[i]["link"], status="downloaded")
+                upload_future = upload_pool.submit(in_context(_upload), videos[i], local_path)
+                upload_futures[upload_future] = i
+
+        for future in as_completed(upload_futures):
+            i = upload_futures[future]
+            try:
+                results[i]["gcs_path"] = future.result()
+                progress(item=videos[i]["link"], status="uploaded", gcs_path=results[i]["gcs_path"])
+            except Exception as ex:
+                logging.error("Failed to upload %s: %s", videos[i]["link"], ex)
+                progress(item=videos[i]["link"], status="failed", error="upload failed")
+
+    return results
+
+
+def search_games(
+    games: list[str],
+    workers: int = SCRAPE_SEARCH_WORKERS,
+) -> tuple[list[dict], dict[str, dict]]:
+    """
+    Search gameplay videos for several games concurrently and deduplicate
+    the results by video ID.
+
+    :param games: Games to search footage for.
+    :param workers: Max concurrent searches.
+    :return: The unique videos, each with 'game' set to the first game in
+        `games` that found it, and a summary per game of videos 'found',
+        'duplicates' already found for an earlier game, and search 'error'.
+    :raises Exception: The search error, if every search failed.
+    """
+    found: list[list[dict]] = [[] for _ in games]
+    errors: list[Optional[Exception]] = [None] * len(games)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(games))), thread_name_prefix="search") as pool:
+        futures = {pool.submit(in_context(search_gameplay_videos), game=game): i for i, game in enumerate(games)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                found[i] = future.result()
+            except Exception as ex:
+                logging.error("Search for '%s' failed: %s", games[i], ex)
+                errors[i] = ex
+
+    if games and all(errors):
+        raise errors[0]
+
+    videos = []
+    seen = set()
+    summary = {}
+    for game, results, error in zip(games, found, errors):
+        summary[game] = {"found": len(results), "duplicates": 0, "error": str(error) if error else None}
+        for vid in results:
+            if vid["video_id"] in seen:
+                summary[game]["duplicates"] += 1
+                continue
+            seen.add(vid["video_id"])
+            videos.append({**vid, "game": game})
+    return videos, summary
+
+
+def scrape_videos(
+    games: list[str],
+    download_workers: int = SCRAPE_DOWNLOAD_WORKERS,
+    upload_workers: int = SCRAPE_UPLOAD_WORKERS,
+    progress: Optional[ProgressCallback] = None,
+) -> tuple[list[dict], dict[str, dict]]:
+    """
+    Searches YouTube for up to 5 gameplay videos per game,
     downloads them locally, uploads them to GCS, and returns
-    a list of dicts with the actual title, link, and gcs_path.
+    a list of dicts with the actual title, link, game and gcs_path.
+
+    All games are searched before any download starts, so a video found
+    for several games is only transferred once. Videos whose link is
+    already saved are not downloaded again; they are returned with
+    `already_had` set and the saved GCS path.
+
+    :param games: Games to search footage for.
+    :param download_workers: Max concurrent yt-dlp downloads.
+    :param upload_workers: Max concurrent GCS uploads.
+    :param progress: Optional callback receiving stage and per-video updates.
+    :return: The videos, and the per-game search summary from search_games().
+    """
+    progress = progress or _no_progress
+    progress(stage="searching")
+
+    videos, summary = search_games(games)  # list of {"title", "link", "video_id", "game"}
+
+    saved = get_saved_video_paths_db([vid["link"] for vid in videos])
+    new_videos = [vid for vid in videos if vid["link"] not in saved]
+    for vid in videos:
+        if vid["link"] in saved:
+            progress(item=vid["link"], title=vid["title"], status="already_had")
+
+    progress(stage="transferring")
+    transferred = download_and_upload_videos(
+        videos=new_videos,
+        download_workers=download_workers,
+        upload_workers=upload_workers,
+        progress=progress,
+    )
+    for vid, item in zip(new_videos, transferred):
+        item["game"] = vid["game"]
+        item["already_had"] = False
+
+    already_had = [
+        {"title": vid["title"], "link": vid["link"], "game": vid["game"], "gcs_path": saved[vid["link"]], "already_had": True}
+        for vid in videos
+        if vid["link"] in saved
+    ]
+    return transferred + already_had, summary
+
+
+def scrape_and_save_videos(games: list[str], job=None) -> dict:
+    """
+    Scrapes, downloads and uploads footage for `games`, then saves a Video
+    row for every successful upload.
+
+    :param games: Games to download footage of.
+    :param job: Optional jobs.Job to report progress to.
+    :return: Dict with the 'downloaded' GCS paths, the 'saved' videos, the
+        links of 'new' and 'already_had' videos, and the per-game search
+        summary under 'games'.
     """
-    option = Options()
-    option.add_argument("--disable-extensions")
-    option.add_argument("--disable-infobars")
-    option.add_argument("--start-maximized")
-    option.add_argument("--disable-notifications")
-    option.add_argument('--headless')
-    option.add_argument('--no-sandbox')
-    option.add_argument('--disable-dev-shm-usage')
+    progress = job.report if job is not None else _no_progress
+    combined_info, games_summary = scrape_videos(games=games, progress=progress)
 
-    browser = webdriver.Chrome(options=option)
-    browser.get(f"https://www.youtube.com/results?search_query={game}+gameplay+no+copyright")
+    progress(stage="saving")
+    created_videos = []
+    new_links = []
+    already_had = [item["link"] for item in combined_info if item["already_had"]]
+    for item in combined_info:
+        if item["already_had"] or not item["gcs_path"]:
+            continue
+        try:
+            video_json = save_video_to_db(
+                title=item["title"],
+                file_path=item["gcs_path"],
+                video_url=item["link"]
+            )
+        except HTTPException as err:
+            # A concurrent scrape saved the same link first.
+            if err.status_code != 400:
+                raise
+            already_had.append(item["link"])
+            progress(item=item["link"], status="already_had")
+            continue
+        created_videos.append(video_json)
+        new_links.append(item["link"])
+        progress(item=item["link"], status="saved")
 
-    videos = grab_videos(driver=browser)  # list of {"title", "link"}
-    if videos:
-        download_videos(videos=videos)
-    browser.quit()
+    return {
+        "downloaded": [x["gcs_path"] for x in combined_info if not x["already_had"]],
+        "saved": created_videos,
+        "new": new_links,
+        "already_had": already_had,
+        "games": games_summary,
+    }
 
-    # Upload local files and get list of GCS paths.
-    uploads = upload_downloaded_files()
 
-    # Pair each upload path with the corresponding video metadata.
-    combined_info = []
-    for i, vid in enumerate(videos):
-        item = {
-            "title": vid["title"],
-            "link": vid["link"],
-            "gcs_path": uploads[i] if i < len(uploads) else None,
-        }
-        combined_info.append(item)
+def get_saved_video_paths_db(video_urls: list[str]) -> dict[str, str]:
+    """
+    Look up which of `video_urls` are already saved, in one query.
 
-    return combined_info
+    :param video_urls: Canonical YouTube links.
+    :return: Mapping of saved link to its GCS path.
+    """
+    if not video_urls:
+        return {}
+    with Session(engine) as session:
+        statement = select(Video.video_url, Video.file_path).where(Video.video_url.in_(video_urls))
+        return dict(session.exec(statement).all())
 
 
+@timed("db.save_video")
 def save_video_to_db(title: str, file_path: str, video_url: str):
     """
     Saves a video record to the database.
@@ -122,6 +500,7 @@ def save_video_to_db(title: str, file_path: str, video_url: str):
             session.add(video_record)
             session.commit()
             session.refresh(video_record)
+            video_pages.invalidate(video_record.id, after=video_record.model_dump())
 
             return video_record.model_dump_json()
         except IntegrityError:
@@ -130,15 +509,25 @@ def save_video_to_db(title: str, file_path: str, video_url: str):
             logging.error("save_video_to_db error: %s", ex)
             raise HTTPException(status_code=500, detail="Failed to save video.")
 
-def get_videos_db(offset: int = 0, limit: int = 15) -> list[Video]:
+async def get_videos_db(
+    offset: int = 0,
+    limit: int = 15,
+    cursor: Optional[int] = None,
+) -> tuple[list[Video], Optional[int]]:
     """
-    Retrieves saved videos from the database with pagination.
+    Retrieves saved videos from the database with pagination, ordered by ID.
 
-    :param offset: Pagination offset.
+    :param offset: Pagination offset. Prefer `cursor`, which stays fast on deep pages.
     :param limit: Number of items to retrieve.
-    :return: A list of Video objects.
+    :param cursor: Return videos after this ID (the previous page's `next_cursor`).
+    :return: A list of Video objects, and the cursor for the next page (None on the last page).
     """
-    with Session(engine) as session:
-        statement = select(Video).offset(offset).limit(limit)
-        videos = session.exec(statement).all()
-        return videos
\ No newline at end of file
+    async with async_session() as session:
+        statement = select(Video)
+        if cursor is not None:
+            statement = statement.where(Video.id > cursor)
+        # Fetch one extra row to know whether another page exists.
+        statement = statement.order_by(Video.id).offset(offset).limit(limit + 1)
+        videos = (await session.exec(statement)).all()
+        next_cursor = videos[limit - 1].id if len(videos) > limit else None
+        return videos[:limit], next_cursor
@@ -0,0 +1,149 @@
+import json
+import logging
+from typing import Iterator
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from config import YOUTUBE_SEARCH_TIMEOUT
+from metrics import record_bytes, stage
+
+
+SEARCH_URL = "https://www.youtube.com/results"
+# YouTube assigns the initial page state with one of these prefixes.
+_INITIAL_DATA_MARKERS = ("var ytInitialData = ", 'window["ytInitialData"] = ')
+_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
+    ),
+    "Accept-Language": "en-US,en;q=0.9",
+}
+# Skips the EU consent interstitial, which has no search results.
+_COOKIES = {"CONSENT": "YES+cb", "SOCS": "CAI"}
+
+
+def youtube_link(video_id: str) -> str:
+    """Canonical watch URL for a video ID."""
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def video_id_from_href(href: str) -> str | None:
+    """
+    Extract the video ID from a result href like "/watch?v=ID&pp=..." or
+    "/shorts/ID". Full YouTube URLs are accepted too.
+    """
+    parsed = urlparse(href)
+    path = "/" + parsed.path.lstrip("/")
+    if path.startswith("/shorts/"):
+        return path.split("/")[2] or None
+    return parse_qs(parsed.query).get("v", [None])[0]
+
+
+def filter_gameplay_videos(videos: list[dict], limit: int = 5) -> list[dict]:
+    """
+    Keep videos with 'gameplay' in the title, up to `limit`.
+
+    :param videos: List of dicts with at least 'title'.
+    :param limit: Max videos to return.
+    :return: The filtered list.
+    """
+    gameplay_videos = [vid for vid in videos if "gameplay" in vid["title"].lower()]
+    return gameplay_videos[:limit]
+
+
+def extract_initial_data(html: str) -> dict:
+    """
+    Pull the ytInitialData JSON object out of a results page.
+
+    :param html: Results page HTML.
+    :return: The decoded initial data.
+    :raises ValueError: If the page has no initial data.
+    """
+    for marker in _INITIAL_DATA_MARKERS:
+        start = html.find(marker)
+        if start != -1:
+            # raw_decode stops at the end of the object, ignoring the trailing script.
+            data, _ = json.JSONDecoder().raw_decode(html, start + len(marker))
+            return data
+    raise ValueError("No ytInitialData found in search page.")
+
+
+def _iter_video_renderers(node) -> Iterator[dict]:
+    # Results are nested under several section/shelf renderers whose layout
+    # changes often, so search the tree instead of following a fixed path.
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            renderer = current.get("videoRenderer")
+            if isinstance(renderer, dict):
+                yield renderer
+            stack.extend(reversed(list(current.values())))
+        elif isinstance(current, list):
+            stack.extend(reversed(current))
+
+
+def _renderer_title(renderer: dict) -> str:
+    title = renderer.get("title", {})
+    if "simpleText" in title:
+        return title["simpleText"]
+    return "".join(run.get("text", "") for run in title.get("runs", []))
+
+
+def parse_search_results(html: str) -> list[dict]:
+    """
+    Parse every video result from a results page, in page order.
+
+    :param html: Results page HTML.
+    :return: A list of dicts with 'title', 'link' and 'video_id'.
+    """
+    videos = []
+    seen = set()
+    for renderer in _iter_video_renderers(extract_initial_data(html)):
+        video_id = renderer.get("videoId")
+        title = _renderer_title(renderer)
+        if not video_id or not title or video_id in seen:
+            continue
+        seen.add(video_id)
+        videos.append({"title": title, "link": youtube_link(video_id), "video_id": video_id})
+    return videos
+
+
+def search_videos_http(
+    query: str,
+    limit: int = 5,
+    session: requests.Session | None = None,
+    timeout: float = YOUTUBE_SEARCH_TIMEOUT,
+) -> list[dict]:
+    """
+    Search YouTube over plain HTTP, without a browser.
+
+    :param query: Search query.
+    :param limit: Max gameplay videos to return.
+    :param session: Optional requests session to reuse connections.
+    :param timeout: Request timeout in seconds.
+    :return: A list of dicts with 'title', 'link' and 'video_id'.
+    :raises ValueError: If the page has no parseable results.
+    """
+    http = session or requests
+    with stage("youtube.fetch"):
+        response = http.get(
+            SEARCH_URL,
+            params={"search_query": query},
+            headers=_HEADERS,
+            cookies=_COOKIES,
+            timeout=timeout,
+        )
+        response.raise_for_status()
+    record_bytes("youtube.fetch", len(response.content))
+
+    with stage("youtube.parse"):
+        videos = parse_search_results(response.text)
+    if not videos:
+        # A normal search always has results; an empty page means a
+        # consent wall or markup change, so let the caller fall back.
+        raise ValueError("Search page had no video results.")
+
+    logging.info("HTTP search for '%s' found %d videos", query, len(videos))
+    return filter_gameplay_videos(videos, limit=limit)